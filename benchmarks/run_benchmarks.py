@@ -0,0 +1,244 @@
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import typer
+
+from pyragify.processor import CHUNKER_VERSION, RepoContentProcessor, clean_html_content, compute_file_hash
+from synthetic_repo import generate_repo
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+app = typer.Typer()
+
+STAGES = (
+    "walk", "should_skip", "hashing", "chunk_python_file", "chunk_markdown_file",
+    "clean_html_content", "save_content", "process_repo",
+)
+
+def git_commit() -> str:
+    """
+    Return the commit of the pyragify checkout being benchmarked, or None outside a git checkout.
+    """
+
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=Path(__file__).parent, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def measure(stage, repeat: int) -> dict:
+    """
+    Time a benchmark stage and measure its peak memory.
+
+    Parameters
+    ----------
+    stage : callable
+        Runs the stage once and returns the number of files and bytes it handled.
+    repeat : int
+        The number of timed runs. The fastest run is reported, since it is the least disturbed by other processes.
+
+    Returns
+    -------
+    dict
+        The timings in seconds, the throughput in files/s and MB/s, and the peak memory allocated by Python
+        during one extra run traced with `tracemalloc`.
+    """
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        files, size = stage()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    stage()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(timings)
+    return {
+        "seconds": best,
+        "seconds_median": statistics.median(timings),
+        "files": files,
+        "bytes": size,
+        "files_per_s": files / best if best else None,
+        "mb_per_s": size / best / 1e6 if best else None,
+        "peak_memory_bytes": peak,
+    }
+
+def build_stages(repo_path: Path, scratch: Path, workers: int) -> dict:
+    """
+    Prepare the inputs of every stage and return a function per stage that runs it once.
+
+    Files are read before timing starts, so the chunking stages measure chunking only.
+    """
+
+    processor = RepoContentProcessor(repo_path, scratch / "setup")
+    file_processor = processor.file_processor
+    walked = [(file_path, entry.stat().st_size) for file_path, entry in processor.walk_repo()]
+    all_paths = []
+    for dir_path, dir_names, file_names in os.walk(repo_path):
+        for name in dir_names + file_names:
+            path = Path(dir_path) / name
+            all_paths.append((path, path.relative_to(repo_path).as_posix()))
+
+    def read_texts(suffix):
+        texts = []
+        for file_path, _ in walked:
+            if file_path.suffix == suffix:
+                texts.append((file_path, file_path.read_text(encoding="utf-8", errors="replace")))
+        return texts
+
+    python_texts = read_texts(".py")
+    markdown_texts = read_texts(".md")
+    chunked = [
+        (file_path, processor.get_file_type_subdir(file_path), file_processor.chunk_file(file_path, text))
+        for file_path, text in python_texts + markdown_texts
+    ]
+    text_bytes = lambda texts: sum(len(text.encode("utf-8")) for _, text in texts)
+
+    def walk():
+        files = list(processor.walk_repo())
+        return len(files), sum(entry.stat().st_size for _, entry in files)
+
+    def should_skip():
+        for path, relative_path in all_paths:
+            processor.should_skip(path, relative_path=relative_path)
+        return len(all_paths), 0
+
+    def hashing():
+        for file_path, _ in walked:
+            compute_file_hash(file_path, processor.hash_algorithm)
+        return len(walked), sum(size for _, size in walked)
+
+    def chunk_python_file():
+        for file_path, text in python_texts:
+            file_processor.chunk_python_file(file_path, text)
+        return len(python_texts), text_bytes(python_texts)
+
+    def chunk_markdown_file():
+        for file_path, text in markdown_texts:
+            file_processor.chunk_markdown_file(file_path, text)
+        return len(markdown_texts), text_bytes(markdown_texts)
+
+    def clean_html():
+        for _, text in markdown_texts:
+            clean_html_content(text)
+        return len(markdown_texts), text_bytes(markdown_texts)
+
+    def save_content():
+        output_dir = scratch / "save_content"
+        shutil.rmtree(output_dir, ignore_errors=True)
+        writer = RepoContentProcessor(repo_path, output_dir, chunk_cache_size=0)
+        for file_path, subdir, chunks in chunked:
+            for chunk in chunks:
+                writer.save_chunk(chunk, subdir, file_path)
+        writer.save_content(Path("remaining"))
+        writer.background_writer.close()
+        written = [path for path in output_dir.rglob("chunk_*") if path.is_file()]
+        return len(chunked), sum(path.stat().st_size for path in written)
+
+    def process_repo():
+        output_dir = scratch / "process_repo"
+        shutil.rmtree(output_dir, ignore_errors=True)
+        RepoContentProcessor(repo_path, output_dir, workers=workers).process_repo()
+        return len(walked), sum(size for _, size in walked)
+
+    return {
+        "walk": walk,
+        "should_skip": should_skip,
+        "hashing": hashing,
+        "chunk_python_file": chunk_python_file,
+        "chunk_markdown_file": chunk_markdown_file,
+        "clean_html_content": clean_html,
+        "save_content": save_content,
+        "process_repo": process_repo,
+    }
+
+@app.command()
+def main(
+    repo_dir: Path = typer.Option(None, help="Directory of the synthetic repository. Defaults to a temporary directory."),
+    reuse: bool = typer.Option(False, help="Reuse an existing repository in --repo-dir instead of generating it."),
+    files: int = typer.Option(1000, help="Number of regular source files."),
+    depth: int = typer.Option(4, help="Maximum directory depth of the source files."),
+    python_share: float = typer.Option(0.5, help="Fraction of source files that are Python."),
+    markdown_share: float = typer.Option(0.2, help="Fraction of source files that are Markdown."),
+    generated_modules: int = typer.Option(2, help="Number of large generated Python modules."),
+    generated_module_lines: int = typer.Option(50000, help="Lines per generated module."),
+    node_modules_files: int = typer.Option(500, help="Number of files in the node_modules tree."),
+    node_modules_depth: int = typer.Option(6, help="Depth of the node_modules tree."),
+    binary_blobs: int = typer.Option(10, help="Number of binary files."),
+    binary_size: int = typer.Option(1024 * 1024, help="Size of each binary file in bytes."),
+    seed: int = typer.Option(0, help="Random seed of the generator."),
+    repeat: int = typer.Option(3, help="Timed runs per stage; the fastest is reported."),
+    workers: int = typer.Option(1, help="Worker processes for the process_repo stage."),
+    stages: list[str] = typer.Option(None, help=f"Stages to run, among {', '.join(STAGES)}. Defaults to all."),
+    output: Path = typer.Option(None, help="Write the JSON report to this file instead of stdout."),
+):
+    """
+    Benchmark the stages of pyragify on a synthetic repository and report the results as JSON.
+
+    The repository is generated deterministically from its shape and seed, so reports from different
+    commits are comparable as long as the shape options are the same.
+    """
+
+    logging.disable(logging.INFO)
+    selected = stages or list(STAGES)
+    unknown = set(selected) - set(STAGES)
+    if unknown:
+        raise typer.BadParameter(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    with tempfile.TemporaryDirectory(prefix="pyragify-bench-") as scratch:
+        scratch = Path(scratch)
+        repo_path = (repo_dir or scratch / "repo").resolve()
+        shape_options = {
+            "files": files, "depth": depth, "python_share": python_share, "markdown_share": markdown_share,
+            "generated_modules": generated_modules, "generated_module_lines": generated_module_lines,
+            "node_modules_files": node_modules_files, "node_modules_depth": node_modules_depth,
+            "binary_blobs": binary_blobs, "binary_size": binary_size, "seed": seed,
+        }
+        if reuse and repo_path.is_dir():
+            shape = {"reused": str(repo_path)}
+        else:
+            shape = generate_repo(repo_path, **shape_options)
+
+        stage_functions = build_stages(repo_path, scratch, workers)
+        results = {}
+        for name in selected:
+            results[name] = measure(stage_functions[name], repeat)
+            typer.echo(f"{name}: {results[name]['seconds']:.3f}s", err=True)
+
+    report = {
+        "commit": git_commit(),
+        "chunker_version": CHUNKER_VERSION,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "workers": workers,
+        "repository": shape,
+        "stages": results,
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+        if resource is not None else None,
+    }
+    data = json.dumps(report, indent=2)
+    if output:
+        output.write_text(data + "\n", encoding="utf-8")
+    else:
+        typer.echo(data)
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,208 @@
+import random
+import shutil
+from pathlib import Path
+
+WORDS = (
+    "data value result config path file chunk index token cache stream buffer parse render request "
+    "response client server model field record batch queue worker thread process handle error state"
+).split()
+
+def random_identifier(rng: random.Random) -> str:
+    """
+    Build a random snake_case identifier.
+    """
+
+    return "_".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3)))
+
+def python_module(rng: random.Random, definitions: int) -> str:
+    """
+    Build a Python module with functions, classes, docstrings and comments.
+
+    Parameters
+    ----------
+    rng : random.Random
+        The random generator, so the module is reproducible from a seed.
+    definitions : int
+        The number of top-level functions and classes.
+
+    Returns
+    -------
+    str
+        The source of the module.
+    """
+
+    lines = ['"""Synthetic module generated for pyragify benchmarks."""', "import os", "import sys", ""]
+    for index in range(definitions):
+        name = f"{random_identifier(rng)}_{index}"
+        if rng.random() < 0.3:
+            lines.append(f"class {name.title().replace('_', '')}:")
+            lines.append(f'    """{" ".join(rng.choices(WORDS, k=12))}."""')
+            for method in range(rng.randint(1, 5)):
+                lines.append(f"    def {random_identifier(rng)}_{method}(self, {random_identifier(rng)}):")
+                lines.append(f"        # {' '.join(rng.choices(WORDS, k=6))}")
+                lines.append(f"        return {random_identifier(rng)} * {rng.randint(1, 100)}")
+                lines.append("")
+        else:
+            lines.append(f"def {name}({random_identifier(rng)}, {random_identifier(rng)}=None):")
+            lines.append(f'    """{" ".join(rng.choices(WORDS, k=10))}."""')
+            for _ in range(rng.randint(2, 12)):
+                lines.append(f"    {random_identifier(rng)} = {random_identifier(rng)!r}  # {rng.choice(WORDS)}")
+            lines.append("    return None")
+        lines.append("")
+        lines.append("")
+    return "\n".join(lines)
+
+def generated_module(rng: random.Random, lines: int) -> str:
+    """
+    Build a large generated-style Python module, such as protobuf output: long flat assignments and tiny functions.
+    """
+
+    parts = ["# Generated by a synthetic code generator. DO NOT EDIT.", ""]
+    for index in range(lines // 4):
+        parts.append(f"_{random_identifier(rng).upper()}_{index} = {rng.randint(0, 1 << 30)!r}")
+        parts.append(f"def _get_{index}():")
+        parts.append(f"    return _{index}")
+        parts.append("")
+    return "\n".join(parts)
+
+def markdown_document(rng: random.Random, sections: int) -> str:
+    """
+    Build a Markdown document with headers, inline HTML and fenced code blocks.
+    """
+
+    parts = [f"# {' '.join(rng.choices(WORDS, k=4)).title()}", ""]
+    for index in range(sections):
+        parts.append(f"## {' '.join(rng.choices(WORDS, k=3)).title()} {index}")
+        for _ in range(rng.randint(1, 4)):
+            parts.append(" ".join(rng.choices(WORDS, k=rng.randint(20, 80))) + ".")
+            parts.append("")
+        if rng.random() < 0.4:
+            parts.append(f'<div class="note"><p>{" ".join(rng.choices(WORDS, k=10))}</p></div>')
+            parts.append(f'<img src="{rng.choice(WORDS)}.png" alt="{rng.choice(WORDS)}">')
+            parts.append("")
+        if rng.random() < 0.4:
+            parts.append("```python")
+            parts.append(f"# {' '.join(rng.choices(WORDS, k=5))}")
+            parts.append(f"{random_identifier(rng)} = {rng.randint(0, 100)}")
+            parts.append("```")
+            parts.append("")
+    return "\n".join(parts)
+
+def other_file(rng: random.Random) -> tuple:
+    """
+    Build a non-Python, non-Markdown text file, returning its extension and content.
+    """
+
+    extension = rng.choice([".txt", ".json", ".yaml", ".js", ".toml"])
+    if extension == ".json":
+        content = "{" + ", ".join(f'"{random_identifier(rng)}": {rng.randint(0, 1000)}' for _ in range(rng.randint(5, 50))) + "}\n"
+    else:
+        content = "\n".join(" ".join(rng.choices(WORDS, k=rng.randint(3, 15))) for _ in range(rng.randint(5, 100))) + "\n"
+    return extension, content
+
+def generate_repo(
+    root: Path,
+    files: int = 1000,
+    depth: int = 4,
+    python_share: float = 0.5,
+    markdown_share: float = 0.2,
+    generated_modules: int = 2,
+    generated_module_lines: int = 50000,
+    node_modules_files: int = 500,
+    node_modules_depth: int = 6,
+    binary_blobs: int = 10,
+    binary_size: int = 1024 * 1024,
+    seed: int = 0,
+) -> dict:
+    """
+    Generate a synthetic repository of a given shape.
+
+    Parameters
+    ----------
+    root : pathlib.Path
+        The directory to create. It is deleted first if it exists.
+    files : int, optional
+        The number of regular source files, spread over the directory tree.
+    depth : int, optional
+        The maximum depth of the directory tree holding the source files.
+    python_share : float, optional
+        The fraction of source files that are Python modules.
+    markdown_share : float, optional
+        The fraction of source files that are Markdown documents. The rest are other text files.
+    generated_modules : int, optional
+        The number of large generated Python modules, in a `generated/` directory.
+    generated_module_lines : int, optional
+        The approximate number of lines of each generated module.
+    node_modules_files : int, optional
+        The number of files in a deep `node_modules` tree, which pyragify should prune without walking it.
+    node_modules_depth : int, optional
+        The depth of the `node_modules` tree.
+    binary_blobs : int, optional
+        The number of binary files.
+    binary_size : int, optional
+        The size of each binary file in bytes.
+    seed : int, optional
+        The random seed. The same arguments and seed always produce the same repository.
+
+    Returns
+    -------
+    dict
+        The shape of the generated repository: the arguments, plus the number of files and total bytes written.
+    """
+
+    shape = {
+        "files": files,
+        "depth": depth,
+        "python_share": python_share,
+        "markdown_share": markdown_share,
+        "generated_modules": generated_modules,
+        "generated_module_lines": generated_module_lines,
+        "node_modules_files": node_modules_files,
+        "node_modules_depth": node_modules_depth,
+        "binary_blobs": binary_blobs,
+        "binary_size": binary_size,
+        "seed": seed,
+    }
+    rng = random.Random(seed)
+    shutil.rmtree(root, ignore_errors=True)
+    root.mkdir(parents=True)
+    written = {"total_files": 0, "total_bytes": 0}
+
+    def write(path: Path, data):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        path.write_bytes(data)
+        written["total_files"] += 1
+        written["total_bytes"] += len(data)
+
+    write(root / ".gitignore", "*.log\nbuild/\n")
+    directories = [Path("src")]
+    for _ in range(max(1, files // 20)):
+        parent = rng.choice(directories)
+        if len(parent.parts) < depth:
+            directories.append(parent / f"{random_identifier(rng)}_{len(directories)}")
+
+    for index in range(files):
+        directory = root / rng.choice(directories)
+        kind = rng.random()
+        if kind < python_share:
+            write(directory / f"module_{index}.py", python_module(rng, rng.randint(1, 40)))
+        elif kind < python_share + markdown_share:
+            write(directory / f"doc_{index}.md", markdown_document(rng, rng.randint(1, 20)))
+        else:
+            extension, content = other_file(rng)
+            write(directory / f"file_{index}{extension}", content)
+
+    for index in range(generated_modules):
+        write(root / "generated" / f"service_{index}_pb2.py", generated_module(rng, generated_module_lines))
+
+    for index in range(node_modules_files):
+        parts = [f"pkg_{rng.randint(0, 20)}" for _ in range(rng.randint(1, node_modules_depth))]
+        write(root.joinpath("node_modules", *parts, f"index_{index}.js"), f"module.exports = {index};\n")
+
+    for index in range(binary_blobs):
+        write(root / "assets" / f"blob_{index}.bin", rng.randbytes(binary_size))
+
+    write(root / "build" / "output.log", "ignored\n")
+    return {**shape, **written}
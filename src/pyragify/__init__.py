@@ -1 +1,3 @@
+from pyragify.processor import FileProcessor, RepoContentProcessor, iter_repo_chunks, load_chunk
 
+__all__ = ["FileProcessor", "RepoContentProcessor", "iter_repo_chunks", "load_chunk"]
@@ -0,0 +1,126 @@
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from pyragify.cache import ChunkCache
+from pyragify.processor import RepoContentProcessor, save_json
+
+logger = logging.getLogger(__name__)
+
+def load_manifest(manifest_path: Path) -> list:
+    """
+    Read the repositories listed in a manifest file.
+
+    Parameters
+    ----------
+    manifest_path : pathlib.Path
+        A text file with one repository path per line. Blank lines and lines starting with '#' are ignored,
+        and relative paths are relative to the directory of the manifest.
+
+    Returns
+    -------
+    list of pathlib.Path
+        The repository paths, in manifest order.
+    """
+
+    repo_paths = []
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                repo_paths.append(manifest_path.parent / Path(line).expanduser())
+    return repo_paths
+
+def output_names(repo_paths) -> list:
+    """
+    Name the output directory of each repository after the repository, adding a suffix to repeated names.
+
+    Returns
+    -------
+    list of str
+        One name per repository, such as 'service' and 'service-2' for two repositories named 'service'.
+    """
+
+    names, counts = [], {}
+    for repo_path in repo_paths:
+        name = Path(repo_path).resolve().name
+        counts[name] = counts.get(name, 0) + 1
+        names.append(name if counts[name] == 1 else f"{name}-{counts[name]}")
+    return names
+
+def process_repos(repo_paths, output_root: Path, workers: int = 1, chunk_cache_size: int = 256 * 1024 * 1024, **options) -> dict:
+    """
+    Process many repositories in one process, with a shared worker pool and a shared chunk cache.
+
+    Parameters
+    ----------
+    repo_paths : iterable of pathlib.Path
+        The repositories to process, in order.
+    output_root : pathlib.Path
+        Every repository gets its own output directory below it, named by `output_names`, with its own output
+        files, `metadata.json` and `hashes.json`.
+    workers : int, optional
+        The number of worker processes, started once for the whole batch. Default is 1, no pool.
+    chunk_cache_size : int, optional
+        The maximum size in bytes of the chunk cache shared by all repositories, kept in `<output_root>/.cache/chunks`.
+        0 disables the cache, and with it the deduplication across repositories.
+    **options
+        Further arguments of `RepoContentProcessor`, applied to every repository.
+
+    Returns
+    -------
+    dict
+        The batch summary, also saved to `<output_root>/batch.json`: per repository its output directory, run time,
+        file counts and any error, and the totals of the batch.
+
+    Notes
+    -----
+    The chunk cache is keyed by file content, so a file that also occurs in a repository processed earlier,
+    such as a vendored library, is not parsed again: its chunks are loaded from the cache and it counts as a
+    cached file. Repositories are processed one after the other, each keeping a few tasks per worker in flight,
+    so the pool stays busy while the interpreter, the pool and the cache index are set up only once. A repository
+    that fails is logged and recorded with its error, and the batch carries on.
+    """
+
+    output_root = Path(output_root)
+    repo_paths = [Path(repo_path) for repo_path in repo_paths]
+    chunk_cache = ChunkCache(output_root / ".cache" / "chunks", chunk_cache_size) if chunk_cache_size else None
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    summary = {"repositories": [], "total_files_processed": 0, "cached_files": 0, "failed": 0}
+    started = time.perf_counter()
+    try:
+        for index, (repo_path, name) in enumerate(zip(repo_paths, output_names(repo_paths)), start=1):
+            logger.info(f"Processing repository {index}/{len(repo_paths)}: {repo_path}")
+            entry = {"path": str(repo_path), "output": name}
+            start = time.perf_counter()
+            try:
+                if not repo_path.is_dir():
+                    raise FileNotFoundError(f"Repository {repo_path} not found")
+                processor = RepoContentProcessor(
+                    repo_path, output_root / name, workers=workers, chunk_cache_size=chunk_cache_size,
+                    executor=executor, chunk_cache=chunk_cache, **options
+                )
+                processor.process_repo()
+            except Exception as e:
+                logger.error(f"Error processing repository {repo_path}: {e}")
+                entry["error"] = str(e)
+                summary["failed"] += 1
+            else:
+                repo_summary = processor.metadata["summary"]
+                entry["files_processed"] = repo_summary["total_files_processed"]
+                entry["cached_files"] = repo_summary["cached_files"]
+                summary["total_files_processed"] += repo_summary["total_files_processed"]
+                summary["cached_files"] += repo_summary["cached_files"]
+            entry["seconds"] = round(time.perf_counter() - start, 6)
+            summary["repositories"].append(entry)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        if chunk_cache is not None:
+            chunk_cache.save()
+
+    summary["wall_seconds"] = round(time.perf_counter() - started, 6)
+    output_root.mkdir(parents=True, exist_ok=True)
+    save_json(summary, output_root / "batch.json", "Batch summary")
+    return summary
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+from pyragify.chunk import Chunk
+
+logger = logging.getLogger(__name__)
+
+def chunk_cache_key(content_hash: str, algorithm: str, chunker_key: str, chunker_version: str) -> str:
+    """
+    Build the cache key for the chunks of a file.
+
+    Parameters
+    ----------
+    content_hash : str
+        The hash of the file content.
+    algorithm : str
+        The hashlib algorithm that produced `content_hash`.
+    chunker_key : str
+        Identifies how the file is chunked, such as its file type (see `FileProcessor.cache_key`).
+    chunker_version : str
+        The version of the chunking logic. Bumping it invalidates every cached entry.
+
+    Returns
+    -------
+    str
+        A hexadecimal key that is safe to use as a file name.
+    """
+
+    raw = f"{chunker_version}\0{algorithm}\0{content_hash}\0{chunker_key}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def entry_path(cache_dir: Path, key: str) -> Path:
+    """
+    Return the path of the cache entry for a key.
+
+    Entries are spread over 256 subdirectories named after the first two characters of the key.
+    """
+
+    return cache_dir / key[:2] / f"{key}.json"
+
+def load_entry(cache_dir: Path, key: str) -> dict:
+    """
+    Read a cache entry without updating the cache index.
+
+    Parameters
+    ----------
+    cache_dir : pathlib.Path
+        The cache directory.
+    key : str
+        The key of the entry, as returned by `chunk_cache_key`.
+
+    Returns
+    -------
+    dict or None
+        The cached entry with the keys 'chunks', 'size', 'lines' and 'encoding', or None on a miss. The chunks are
+        `Chunk` records with the word and token counts stored with them.
+
+    Notes
+    -----
+    This function only reads from disk, so it is safe to call from worker processes while the
+    parent process owns the `ChunkCache` index.
+    """
+
+    try:
+        with open(entry_path(cache_dir, key), "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        entry["chunks"] = [Chunk.from_dict(chunk) for chunk in entry["chunks"]]
+        return entry
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable chunk cache entry {key}: {e}")
+        return None
+
+class ChunkCache:
+    """
+    Persistent, content-addressed cache of file chunks with a size cap and LRU eviction.
+
+    Attributes
+    ----------
+    cache_dir : pathlib.Path
+        The directory holding the cache entries and `index.json`.
+    max_size : int
+        The maximum total size of the cache entries in bytes.
+    index : dict
+        Maps each key to its entry size in bytes and the time it was last used in nanoseconds.
+
+    Methods
+    -------
+    get(key)
+        Load a cached entry and mark it as recently used.
+    put(key, entry)
+        Store an entry.
+    touch(key)
+        Mark an entry as recently used.
+    save()
+        Evict the least recently used entries above `max_size` and write the index.
+    """
+
+    def __init__(self, cache_dir: Path, max_size: int):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.index = self.load_index()
+
+    def load_index(self) -> dict:
+        """
+        Load `index.json`, rebuilding it from the entries on disk if it is missing or unreadable.
+        """
+
+        index_path = self.cache_dir / "index.json"
+        if index_path.exists():
+            try:
+                with open(index_path, "r", encoding="utf-8") as f:
+                    return json.load(f)["entries"]
+            except Exception as e:
+                logger.warning(f"Rebuilding chunk cache index: {e}")
+
+        index = {}
+        if self.cache_dir.is_dir():
+            for path in self.cache_dir.glob("*/*.json"):
+                stat_result = path.stat()
+                index[path.stem] = {"size": stat_result.st_size, "used_ns": stat_result.st_mtime_ns}
+        return index
+
+    def get(self, key: str) -> dict:
+        """
+        Load a cached entry and mark it as recently used.
+
+        Returns
+        -------
+        dict or None
+            The cached entry, or None on a miss.
+        """
+
+        if key not in self.index:
+            return None
+        entry = load_entry(self.cache_dir, key)
+        if entry is None:
+            del self.index[key]
+        else:
+            self.touch(key)
+        return entry
+
+    def put(self, key: str, entry: dict):
+        """
+        Store an entry, replacing any previous entry with the same key.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry, as returned by `chunk_cache_key`.
+        entry : dict
+            The entry to cache, with the keys 'chunks', 'size', 'lines' and 'encoding'.
+        """
+
+        path = entry_path(self.cache_dir, key)
+        try:
+            chunks = [chunk.as_dict(counts=True) if isinstance(chunk, Chunk) else chunk for chunk in entry["chunks"]]
+            data = json.dumps({**entry, "chunks": chunks}, separators=(",", ":"))
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(data)
+        except Exception as e:
+            logger.warning(f"Error writing chunk cache entry {key}: {e}")
+            return
+        self.index[key] = {"size": len(data.encode("utf-8")), "used_ns": time.time_ns()}
+
+    def touch(self, key: str):
+        """
+        Mark an entry as recently used.
+
+        Entries read by worker processes through `load_entry` are added to the index if it lost track of them.
+        """
+
+        if key in self.index:
+            self.index[key]["used_ns"] = time.time_ns()
+            return
+        try:
+            size = entry_path(self.cache_dir, key).stat().st_size
+        except OSError:
+            return
+        self.index[key] = {"size": size, "used_ns": time.time_ns()}
+
+    def save(self):
+        """
+        Evict the least recently used entries until the cache fits in `max_size`, then write the index.
+        """
+
+        total_size = sum(item["size"] for item in self.index.values())
+        if total_size > self.max_size:
+            evicted = 0
+            for key in sorted(self.index, key=lambda k: self.index[k]["used_ns"]):
+                if total_size <= self.max_size:
+                    break
+                try:
+                    os.remove(entry_path(self.cache_dir, key))
+                except FileNotFoundError:
+                    pass
+                total_size -= self.index.pop(key)["size"]
+                evicted += 1
+            logger.info(f"Evicted {evicted} entries from the chunk cache")
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(self.cache_dir / "index.json", "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "entries": self.index}, f)
+        except Exception as e:
+            logger.error(f"Error saving chunk cache index: {e}")
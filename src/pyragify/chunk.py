@@ -0,0 +1,86 @@
+def approximate_token_count(text: str) -> int:
+    """
+    Estimate the number of LLM tokens in a text without tokenizing it.
+
+    Parameters
+    ----------
+    text : str
+        The text to measure.
+
+    Returns
+    -------
+    int
+        About one token per four characters, which is close to common BPE tokenizers for English prose and code.
+    """
+
+    return (len(text) + 3) // 4
+
+class Chunk(dict):
+    """
+    A chunk of a source file, with its word and token counts computed once when it is created.
+
+    Chunks are plain dicts with the keys that were set, such as 'type', 'name' and 'code', so they can be
+    serialized with `json.dumps`, copied and modified like the dicts that pyragify used to produce. The counts
+    are attributes and are not part of the dict.
+
+    Attributes
+    ----------
+    word_count : int
+        The number of whitespace-separated words in the chunk's code, content or comment texts.
+    token_count : int
+        The approximate number of tokens in the same text, see `approximate_token_count`.
+
+    Methods
+    -------
+    from_dict(data)
+        Build a chunk from a plain dict, reusing counts stored in it.
+    as_dict(counts)
+        Convert the chunk to a plain dict, optionally including its counts.
+
+    Notes
+    -----
+    The counts are not updated when the chunk is modified after it was created.
+    """
+
+    __slots__ = ("word_count", "token_count")
+
+    def __init__(self, word_count: int = None, token_count: int = None, **fields):
+        super().__init__(fields)
+        if word_count is None or token_count is None:
+            chunk_type = fields.get("type")
+            if chunk_type == "comments":
+                texts = [comment["text"] for comment in fields.get("comments", [])]
+            elif chunk_type == "function" or chunk_type == "class":
+                texts = [fields.get("code", "")]
+            elif chunk_type == "file" or chunk_type == "markdown" or chunk_type == "duplicate":
+                texts = [fields.get("content", "")]
+            else:
+                texts = []
+            word_count = sum(len(text.split()) for text in texts)
+            token_count = sum(approximate_token_count(text) for text in texts)
+        self.word_count = word_count
+        self.token_count = token_count
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Chunk":
+        """
+        Build a chunk from a plain dict, such as a chunk cache entry, reusing the counts stored in it.
+        """
+
+        return cls(**data)
+
+    def as_dict(self, counts: bool = False) -> dict:
+        """
+        Convert the chunk to a plain dict with the keys that were set.
+
+        Parameters
+        ----------
+        counts : bool, optional
+            If true, 'word_count' and 'token_count' are included so that `from_dict` does not recompute them.
+        """
+
+        data = dict(self)
+        if counts:
+            data["word_count"] = self.word_count
+            data["token_count"] = self.token_count
+        return data
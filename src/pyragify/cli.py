@@ -1,8 +1,13 @@
 import typer
 import logging
+import sys
 from pathlib import Path
 from omegaconf import OmegaConf
+from typer.core import TyperGroup
+from pyragify.batch import load_manifest, process_repos
+from pyragify.pack import find_members, load_pack_index, read_member
 from pyragify.processor import RepoContentProcessor
+from pyragify.watch import watch_repo
 
 # Configure logging
 logging.basicConfig(
@@ -12,7 +17,24 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = typer.Typer(help="A tool to process repositories and output text files for NotebookLM.")
+class DefaultCommandGroup(TyperGroup):
+    """
+    A command group that runs `process-repo` when no command is named.
+
+    Before `watch`, `extract` and `batch` were added, the app had a single command and was invoked as
+    `pyragify --config-file config.yaml`. Arguments that do not start with a command name or an option of the
+    group itself, such as `--help`, are passed to `process-repo`, so that form keeps working.
+    """
+
+    default_command = "process-repo"
+
+    def parse_args(self, ctx, args):
+        group_options = {option for param in self.get_params(ctx) for option in param.opts + param.secondary_opts}
+        if not args or (args[0] not in self.commands and args[0] not in group_options):
+            args = [self.default_command, *args]
+        return super().parse_args(ctx, args)
+
+app = typer.Typer(cls=DefaultCommandGroup, help="A tool to process repositories and output text files for NotebookLM.")
 
 @app.command()
 def process_repo(
@@ -20,10 +42,31 @@ def process_repo(
     repo_path: Path = typer.Option(None, help="Override: Path to the repository to process."),
     output_dir: Path = typer.Option(None, help="Override: Directory to save output files."),
     max_words: int = typer.Option(None, help="Override: Maximum number of words per output file."),
+    max_tokens: int = typer.Option(None, help="Override: Maximum approximate number of tokens per output file, 0 to disable (default: 0)."),
     max_file_size: int = typer.Option(None, help="Override: Maximum file size to process (in bytes)."),
     skip_patterns: list[str] = typer.Option(None, help="Override: List of file patterns to skip."),
     skip_dirs: list[str] = typer.Option(None, help="Override: List of directories to skip."),
     split_on_files: bool = typer.Option(None, help="If true, output each file as a separate chunk (default: false)."),
+    workers: int = typer.Option(None, help="Override: Number of worker processes used to hash and chunk files (default: 1)."),
+    hash_algorithm: str = typer.Option(None, help="Override: Hash algorithm for change detection: md5, sha1, sha256, blake2b or blake2s (default: md5)."),
+    paranoid: bool = typer.Option(None, help="If true, hash every file even when its size, mtime and inode are unchanged (default: false)."),
+    chunk_cache_size: int = typer.Option(None, help="Override: Maximum size of the chunk cache in bytes, 0 to disable (default: 256 MB)."),
+    stable_output: bool = typer.Option(None, help="If true, keep source files in the same output files across runs and only rewrite changed ones (default: false)."),
+    fast_python_threshold: int = typer.Option(None, help="Override: Python files larger than this many characters are chunked by indentation instead of AST, 0 to disable (default: 1 MB)."),
+    generated_patterns: list[str] = typer.Option(None, help="Override: Patterns of generated Python files that are always chunked by indentation."),
+    max_section_words: int = typer.Option(None, help="Override: Split Markdown sections longer than this many words into parts, 0 to disable (default: 0)."),
+    output_format: str = typer.Option(None, help="Override: Output format, 'text' or 'jsonl' with a chunk_index.json of byte offsets (default: text)."),
+    profile: bool = typer.Option(None, help="If true, profile the run with cProfile and save profile.pstats in the output directory (default: false)."),
+    git_rev: str = typer.Option(None, help="Override: Read files from this git revision instead of the working tree, no checkout needed."),
+    git_base_rev: str = typer.Option(None, help="Override: With --git-rev, only process files changed since this revision."),
+    binary_extensions: list[str] = typer.Option(None, help="Override: Extensions of binary files skipped without being read (default: a built-in list of images, archives, compiled and data files)."),
+    fallback_encoding: str = typer.Option(None, help="Override: Encoding for text files that are not UTF-8, e.g. latin-1 or cp1252; also enables UTF-16/32 files with a byte order mark (default: none, such files are skipped)."),
+    mmap_threshold: int = typer.Option(None, help="Override: Files of at least this many bytes are memory-mapped instead of read, 0 to disable (default: 256 KB)."),
+    write_queue_size: int = typer.Option(None, help="Override: Maximum number of 64 KB output batches queued for the writer thread, 0 to write synchronously (default: 64)."),
+    fsync_output: bool = typer.Option(None, help="If true, fsync every output file once at the end of the run (default: false)."),
+    pack_output: bool = typer.Option(None, help="If true, write all output files as members of a single pack file with a member index (default: false)."),
+    pack_compression: str = typer.Option(None, help="Override: Compression of the pack members: none, gzip or lzma (default: gzip)."),
+    deduplicate: bool = typer.Option(None, help="If true, replace files and functions or classes identical to ones already emitted by a short reference (default: false)."),
     verbose: bool = typer.Option(None, help="Override: Enable verbose output.")
 ):
     """
@@ -42,6 +85,9 @@ def process_repo(
         Override for the directory where output files will be saved. Defaults to the value in the configuration file.
     max_words : int, optional
         Override for the maximum number of words allowed per output file. Defaults to the value in the configuration file.
+    max_tokens : int, optional
+        Override for the maximum approximate number of tokens (about four characters each) per output file,
+        checked alongside `max_words`. 0 disables the token budget. Defaults to the value in the configuration file or 0.
     max_file_size : int, optional
         Override for the maximum file size (in bytes) to process. Defaults to the value in the configuration file.
     skip_patterns : list of str, optional
@@ -50,6 +96,81 @@ def process_repo(
         Override for the list of directory names to skip (e.g., "node_modules", "__pycache__"). Defaults to the value in the configuration file.
     split_on_files : bool, optional
         If true, output each file as a separate chunk. Defaults to the value in the configuration file or false if not set.
+    workers : int, optional
+        Override for the number of worker processes used to hash and chunk files. Output is identical to a serial run.
+        Defaults to the value in the configuration file or 1 if not set.
+    hash_algorithm : str, optional
+        Override for the hash algorithm used to detect changed files. Changing it invalidates the existing `hashes.json`.
+        Defaults to the value in the configuration file or "md5" if not set.
+    paranoid : bool, optional
+        If true, every file is hashed even when its stat signature matches the previous run.
+        Defaults to the value in the configuration file or false if not set.
+    chunk_cache_size : int, optional
+        Override for the maximum size in bytes of the chunk cache under `<output_dir>/.cache/chunks`. Unchanged files are
+        emitted from the cache instead of being parsed again; 0 disables the cache and leaves unchanged files out of the output.
+        Defaults to the value in the configuration file or 256 MB if not set.
+    stable_output : bool, optional
+        If true, files are walked in sorted order and assigned to output files through `assignments.json`. Incremental runs
+        rewrite only the output files whose source files changed. Defaults to the value in the configuration file or false if not set.
+    fast_python_threshold : int, optional
+        Override for the size in characters above which Python files are chunked into top-level definitions by indentation,
+        without building an AST. 0 disables the threshold. Files that fail to parse are always chunked this way.
+        Defaults to the value in the configuration file or 1 MB if not set.
+    generated_patterns : list of str, optional
+        Override for the patterns (e.g. "*_pb2.py") of generated Python files that are always chunked by indentation.
+        Defaults to the value in the configuration file or an empty list.
+    max_section_words : int, optional
+        Override for the number of words above which a Markdown section is split into parts, at a blank line outside code blocks.
+        0 disables splitting. Defaults to the value in the configuration file or 0 if not set.
+    output_format : str, optional
+        Override for the output format: "text" for formatted chunk_N.txt files, or "jsonl" for one JSON chunk record
+        per line plus a chunk_index.json giving the file and byte offset of every chunk. Defaults to the value in the
+        configuration file or "text" if not set.
+    profile : bool, optional
+        If true, run the processing under cProfile and save the statistics to profile.pstats in the output directory,
+        for use with `python -m pstats`. Per-stage timings are always saved in metadata.json. Defaults to the value
+        in the configuration file or false.
+    git_rev : str, optional
+        Override for the git revision (branch, tag or commit) to process. Files are listed and read from the git object
+        database, so the repository path may be a bare mirror and nothing is checked out. Git blob ids replace the
+        content hashes in hashes.json. Defaults to the value in the configuration file, or the working tree if not set.
+    git_base_rev : str, optional
+        Override for a base revision: with `git_rev`, only files added or modified between the two revisions are
+        processed. Defaults to the value in the configuration file.
+    binary_extensions : list of str, optional
+        Override for the extensions of binary files, such as ".png" or ".pkl", which are skipped without being opened.
+        Defaults to the value in the configuration file, or a built-in list of image, archive, compiled and data formats.
+    fallback_encoding : str, optional
+        Override for the encoding of text files that are not valid UTF-8. Every file is sniffed from its first 8 KB
+        before it is read in full: files with NUL bytes are skipped as binary, and other non-UTF-8 files are decoded
+        with this encoding, or skipped if it is not set. Files with a UTF-16 or UTF-32 byte order mark are decoded
+        accordingly when it is set. Defaults to the value in the configuration file.
+    mmap_threshold : int, optional
+        Override for the size in bytes from which files are memory-mapped rather than read, so they are hashed and
+        decoded without being copied into memory first. 0 disables memory mapping, e.g. for files that may be
+        truncated while they are processed. Defaults to the value in the configuration file, or 256 KB.
+    write_queue_size : int, optional
+        Override for the number of output batches that may wait for the writer thread. Output files and metadata are
+        written on a separate thread so that chunking overlaps with disk writes, and chunking waits when the queue is
+        full. 0 writes synchronously. Defaults to the value in the configuration file, or 64.
+    fsync_output : bool, optional
+        Override for fsyncing every output file, and the directories containing them, once at the end of the run.
+        Defaults to the value in the configuration file or false.
+    pack_output : bool, optional
+        Override for packing the output. When enabled, output files are not created one by one but streamed as members
+        of `chunks.pack` (`.gz` or `.xz` when compressed) in the output directory, and `pack_index.json` records the
+        offset, length and source files of every member. Use `pyragify extract` to read members back. Defaults to the
+        value in the configuration file or false.
+    pack_compression : str, optional
+        Override for the compression of the pack: 'none', 'gzip' or 'lzma'. Each member is compressed separately, so
+        it can be extracted without decompressing the rest of the pack. Defaults to the value in the configuration
+        file, or 'gzip'.
+    deduplicate : bool, optional
+        Override for deduplication. When enabled, a file whose content was already emitted in the run is output as a
+        single reference to the first file with that content, and so are functions and classes whose code is
+        identical to an earlier one, which saves words towards `max_words`. The number of replaced files and
+        definitions and the words and tokens saved are reported in the summary of `metadata.json`. Not supported
+        with `stable_output`. Defaults to the value in the configuration file or false.
     verbose : bool, optional
         Override for enabling verbose output. When enabled, the logging level is set to DEBUG. Defaults to the value in the configuration file.
 
@@ -72,49 +193,334 @@ def process_repo(
         $ python -m yourmodule.cli process-repo --config-file custom_config.yaml
     """
 
-    # Load configuration from YAML
-    if config_file.exists():
-        config = OmegaConf.load(config_file)
-        logger.info(f"Loaded configuration from {config_file}")
-    else:
-        logger.error(f"Configuration file {config_file} not found.")
-        raise typer.Exit(code=1)
-
-    # Apply CLI overrides
-    overrides = {
+    config = load_config(config_file, {
         "repo_path": repo_path,
         "output_dir": output_dir,
         "max_words": max_words,
+        "max_tokens": max_tokens,
         "max_file_size": max_file_size,
         "skip_patterns": skip_patterns,
         "skip_dirs": skip_dirs,
         "split_on_files": split_on_files,
+        "workers": workers,
+        "hash_algorithm": hash_algorithm,
+        "paranoid": paranoid,
+        "chunk_cache_size": chunk_cache_size,
+        "stable_output": stable_output,
+        "fast_python_threshold": fast_python_threshold,
+        "generated_patterns": generated_patterns,
+        "max_section_words": max_section_words,
+        "output_format": output_format,
+        "profile": profile,
+        "git_rev": git_rev,
+        "git_base_rev": git_base_rev,
+        "binary_extensions": binary_extensions,
+        "fallback_encoding": fallback_encoding,
+        "mmap_threshold": mmap_threshold,
+        "write_queue_size": write_queue_size,
+        "fsync_output": fsync_output,
+        "pack_output": pack_output,
+        "pack_compression": pack_compression,
+        "deduplicate": deduplicate,
         "verbose": verbose,
-    }
-    for key, value in overrides.items():
-        if value is not None:
-            config[key] = value
-
-    if config.verbose:
-        logger.setLevel(logging.DEBUG)
-        logger.debug("Verbose mode enabled. Setting logging level to DEBUG.")
+    })
 
     # Initialize and run the processor
     try:
-        processor = RepoContentProcessor(
-            repo_path=Path(config.repo_path),
-            output_dir=Path(config.output_dir),
-            max_words=config.max_words,
-            max_file_size=config.max_file_size,
-            skip_patterns=config.skip_patterns,
-            skip_dirs=config.skip_dirs,
-            split_on_files=getattr(config, "split_on_files", False)
-        )
+        processor = create_processor(config)
         processor.process_repo()
         logger.info("Repository processing completed successfully!")
     except Exception as e:
         logger.error(f"An error occurred during repository processing: {e}")
         raise typer.Exit(code=1)
 
+@app.command()
+def watch(
+    config_file: Path = typer.Option("config.yaml", help="Path to the configuration YAML file."),
+    repo_path: Path = typer.Option(None, help="Override: Path to the repository to watch."),
+    output_dir: Path = typer.Option(None, help="Override: Directory to save output files."),
+    debounce: float = typer.Option(0.2, help="Seconds without new changes before the output is updated."),
+    poll_interval: float = typer.Option(0.5, help="Seconds between two scans of the repository when polling."),
+    polling: bool = typer.Option(False, help="If true, poll the repository for changes instead of using inotify."),
+    verbose: bool = typer.Option(None, help="Override: Enable verbose output.")
+):
+    """
+    Process a repository, then keep its output up to date as files are changed, added and deleted.
+
+    Parameters
+    ----------
+    config_file : pathlib.Path, optional
+        Path to the configuration YAML file. All processing settings are read from it. Defaults to "config.yaml".
+    repo_path : pathlib.Path, optional
+        Override for the path to the repository to watch. Defaults to the value in the configuration file.
+    output_dir : pathlib.Path, optional
+        Override for the directory where output files will be saved. Defaults to the value in the configuration file.
+    debounce : float, optional
+        Changes are applied once no new change arrived for this many seconds, so bursts such as a git checkout
+        cause a single update. Defaults to 0.2.
+    poll_interval : float, optional
+        The time between two scans of the repository when inotify is not available or `polling` is set. Defaults to 0.5.
+    polling : bool, optional
+        If true, detect changes by comparing file sizes, modification times and inodes between scans instead of
+        using inotify. Defaults to false.
+    verbose : bool, optional
+        Override for enabling verbose output. Defaults to the value in the configuration file.
+
+    Notes
+    -----
+    - Watch mode always uses stable packing (`stable_output`), so a change only rewrites the output files that
+      contain the changed source files. `hashes.json` and `metadata.json` are updated in place after each change.
+      Deduplication is turned off, as it would make output files depend on which copy of a file was seen first.
+    - Stop watching with Ctrl+C.
+
+    Examples
+    --------
+    Watch the repository configured in config.yaml:
+        $ pyragify watch --config-file config.yaml
+    """
+
+    config = load_config(config_file, {"repo_path": repo_path, "output_dir": output_dir, "verbose": verbose})
+    if not getattr(config, "stable_output", False):
+        logger.info("Watch mode uses stable packing so that only affected output files are rewritten.")
+    try:
+        processor = create_processor(config, stable_output=True, git_rev=None, git_base_rev=None, deduplicate=False)
+        watch_repo(processor, debounce=debounce, poll_interval=poll_interval, polling=polling)
+    except KeyboardInterrupt:
+        logger.info("Stopped watching.")
+    except Exception as e:
+        logger.error(f"An error occurred while watching the repository: {e}")
+        raise typer.Exit(code=1)
+
+@app.command()
+def batch(
+    config_file: Path = typer.Option("config.yaml", help="Path to the configuration YAML file."),
+    manifest: Path = typer.Option(None, help="File listing the repositories to process, one path per line."),
+    repo_path: list[Path] = typer.Option(None, help="A repository to process, in addition to the manifest. May be repeated."),
+    output_dir: Path = typer.Option(None, help="Override: Directory holding one output directory per repository."),
+    workers: int = typer.Option(None, help="Override: Number of worker processes shared by all repositories (default: 1)."),
+    verbose: bool = typer.Option(None, help="Override: Enable verbose output.")
+):
+    """
+    Process many repositories in a single run, sharing one worker pool and one chunk cache.
+
+    Parameters
+    ----------
+    config_file : pathlib.Path, optional
+        Path to the configuration YAML file. All processing settings are read from it and apply to every repository;
+        its `repo_path` is ignored. Defaults to "config.yaml".
+    manifest : pathlib.Path, optional
+        A text file with one repository path per line, relative to the manifest's directory. Blank lines and lines
+        starting with '#' are ignored.
+    repo_path : list of pathlib.Path, optional
+        Repositories to process after those of the manifest.
+    output_dir : pathlib.Path, optional
+        Override for the output directory. Each repository gets a subdirectory named after it, with its own output
+        files, metadata.json and hashes.json, and batch.json summarizes the batch. Defaults to the value in the
+        configuration file.
+    workers : int, optional
+        Override for the number of worker processes. The pool is started once and used for all repositories.
+        Defaults to the value in the configuration file.
+    verbose : bool, optional
+        Override for enabling verbose output. Defaults to the value in the configuration file.
+
+    Notes
+    -----
+    - The chunk cache in `<output_dir>/.cache/chunks` is shared and keyed by file content, so files that occur in
+      several repositories, such as vendored libraries, are parsed once and their chunks reused.
+    - A repository that fails is reported and skipped; the command exits with an error code once all others are done.
+
+    Examples
+    --------
+    Process the repositories listed in repos.txt with 8 workers:
+        $ pyragify batch --manifest repos.txt --output-dir /data/chunks --workers 8
+    """
+
+    config = load_config(config_file, {"output_dir": output_dir, "workers": workers, "verbose": verbose})
+    repo_paths = (load_manifest(manifest) if manifest is not None else []) + list(repo_path or [])
+    if not repo_paths:
+        logger.error("No repositories to process, pass --manifest or --repo-path.")
+        raise typer.Exit(code=1)
+    try:
+        summary = process_repos(repo_paths, Path(config.output_dir), **processor_options(config))
+    except Exception as e:
+        logger.error(f"An error occurred during batch processing: {e}")
+        raise typer.Exit(code=1)
+    logger.info(
+        f"Processed {len(repo_paths) - summary['failed']} of {len(repo_paths)} repositories, "
+        f"{summary['cached_files']} of {summary['total_files_processed']} files reused from the chunk cache."
+    )
+    if summary["failed"]:
+        raise typer.Exit(code=1)
+
+@app.command()
+def extract(
+    config_file: Path = typer.Option("config.yaml", help="Path to the configuration YAML file, read for the output directory."),
+    output_dir: Path = typer.Option(None, help="Override: Output directory holding the pack."),
+    path: list[str] = typer.Option(None, help="Source path, relative to the repository, whose output members are extracted. May be repeated."),
+    member: list[str] = typer.Option(None, help="Name of a member to extract, e.g. python/chunk_0.txt. May be repeated."),
+    destination: Path = typer.Option(None, help="Write the members as files under this directory instead of printing them."),
+    list_members: bool = typer.Option(False, help="List the members of the pack with their source files instead of extracting them.")
+):
+    """
+    Extract output files from the pack written with `pack_output`, without decompressing the whole pack.
+
+    Parameters
+    ----------
+    config_file : pathlib.Path, optional
+        Path to the configuration YAML file, only read if `output_dir` is not given. Defaults to "config.yaml".
+    output_dir : pathlib.Path, optional
+        Override for the output directory of the run. Defaults to the value in the configuration file.
+    path : list of str, optional
+        Source files whose chunks are wanted. Every member holding chunks of one of them is extracted; with
+        `split_on_files`, that is exactly one member per source file.
+    member : list of str, optional
+        Members to extract by name, the path the output file would have in the output directory.
+    destination : pathlib.Path, optional
+        Directory where the members are written as files, under their names. By default, they are printed.
+    list_members : bool, optional
+        If true, print the name, size and source files of every member instead of extracting.
+
+    Notes
+    -----
+    Every member is compressed on its own and located with `pack_index.json`, so extracting one member reads and
+    decompresses only that member.
+
+    Examples
+    --------
+    Print the output for one source file:
+        $ pyragify extract --output-dir output --path src/app.py
+
+    Unpack two members into a directory:
+        $ pyragify extract --output-dir output --member python/chunk_0.txt --member markdown/chunk_0.txt --destination unpacked
+    """
+
+    if output_dir is None:
+        output_dir = Path(load_config(config_file, {}).output_dir)
+    try:
+        index = load_pack_index(output_dir)
+    except FileNotFoundError:
+        logger.error(f"No pack found in {output_dir}, run process-repo with --pack-output first.")
+        raise typer.Exit(code=1)
+
+    if list_members:
+        for name, info in index["members"].items():
+            typer.echo(f"{name}\t{info['size']}\t{', '.join(info['sources'])}")
+        return
+
+    names = list(member or [])
+    if path:
+        found = find_members(index, path)
+        if not found:
+            logger.error(f"No member holds chunks of {', '.join(path)}")
+            raise typer.Exit(code=1)
+        names.extend(name for name in found if name not in names)
+    if not names:
+        logger.error("Nothing to extract, pass --path or --member.")
+        raise typer.Exit(code=1)
+
+    for name in names:
+        try:
+            data = read_member(output_dir, name, index)
+        except KeyError:
+            logger.error(f"The pack has no member {name}")
+            raise typer.Exit(code=1)
+        if destination is None:
+            sys.stdout.buffer.write(data)
+        else:
+            file_path = destination / name
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            file_path.write_bytes(data)
+            logger.info(f"Extracted {name} to {file_path}")
+
+def load_config(config_file: Path, overrides: dict):
+    """
+    Load the configuration file and apply the command-line overrides that were given.
+
+    Parameters
+    ----------
+    config_file : pathlib.Path
+        Path to the configuration YAML file.
+    overrides : dict
+        Command-line values keyed by configuration name. None means the option was not given.
+
+    Returns
+    -------
+    omegaconf.DictConfig
+        The resolved configuration.
+
+    Raises
+    ------
+    typer.Exit
+        If the configuration file does not exist.
+    """
+
+    # Load configuration from YAML
+    if config_file.exists():
+        config = OmegaConf.load(config_file)
+        logger.info(f"Loaded configuration from {config_file}")
+    else:
+        logger.error(f"Configuration file {config_file} not found.")
+        raise typer.Exit(code=1)
+
+    # Apply CLI overrides
+    for key, value in overrides.items():
+        if value is not None:
+            config[key] = value
+
+    if getattr(config, "verbose", False):
+        logger.setLevel(logging.DEBUG)
+        logger.debug("Verbose mode enabled. Setting logging level to DEBUG.")
+    return config
+
+def create_processor(config, **settings) -> RepoContentProcessor:
+    """
+    Create a `RepoContentProcessor` from a resolved configuration.
+
+    Parameters
+    ----------
+    config : omegaconf.DictConfig
+        The configuration, as returned by `load_config`.
+    **settings
+        Processor arguments that take precedence over the configuration.
+    """
+
+    arguments = dict(repo_path=Path(config.repo_path), output_dir=Path(config.output_dir), **processor_options(config))
+    arguments.update(settings)
+    return RepoContentProcessor(**arguments)
+
+def processor_options(config) -> dict:
+    """
+    Get the `RepoContentProcessor` arguments of a resolved configuration, other than the repository and output paths.
+    """
+
+    return dict(
+        max_words=config.max_words,
+        max_tokens=getattr(config, "max_tokens", 0),
+        max_file_size=config.max_file_size,
+        skip_patterns=config.skip_patterns,
+        skip_dirs=config.skip_dirs,
+        split_on_files=getattr(config, "split_on_files", False),
+        workers=getattr(config, "workers", 1),
+        hash_algorithm=getattr(config, "hash_algorithm", "md5"),
+        paranoid=getattr(config, "paranoid", False),
+        chunk_cache_size=getattr(config, "chunk_cache_size", 256 * 1024 * 1024),
+        stable_output=getattr(config, "stable_output", False),
+        fast_python_threshold=getattr(config, "fast_python_threshold", 1024 * 1024),
+        generated_patterns=getattr(config, "generated_patterns", None),
+        max_section_words=getattr(config, "max_section_words", 0),
+        output_format=getattr(config, "output_format", "text"),
+        profile=getattr(config, "profile", False),
+        git_rev=getattr(config, "git_rev", None),
+        git_base_rev=getattr(config, "git_base_rev", None),
+        binary_extensions=getattr(config, "binary_extensions", None),
+        fallback_encoding=getattr(config, "fallback_encoding", None),
+        mmap_threshold=getattr(config, "mmap_threshold", 256 * 1024),
+        write_queue_size=getattr(config, "write_queue_size", 64),
+        fsync_output=getattr(config, "fsync_output", False),
+        pack_output=getattr(config, "pack_output", False),
+        pack_compression=getattr(config, "pack_compression", "gzip"),
+        deduplicate=getattr(config, "deduplicate", False)
+    )
+
 if __name__ == "__main__":
     app()
@@ -0,0 +1,157 @@
+import os
+import subprocess
+from pathlib import Path
+
+# The tree entry modes of regular and executable files. Symbolic links (120000) and submodules (160000) are left out.
+GIT_FILE_MODES = (b"100644", b"100755")
+
+class GitRepository:
+    """
+    Read files straight from the object database of a git repository, without a checkout.
+
+    Parameters
+    ----------
+    repo_path : pathlib.Path
+        A working tree, a subdirectory of one, or a bare repository. Paths are listed and read relative to
+        this directory, so pointing it at a subdirectory of a working tree restricts the run to that subdirectory.
+
+    Raises
+    ------
+    ValueError
+        If `repo_path` is not inside a git repository.
+    RuntimeError
+        If git is not installed.
+
+    Notes
+    -----
+    Listing uses `git ls-tree` and `git diff`, and blob contents are streamed through a single long-lived
+    `git cat-file --batch` process, so reading many small files costs one pipe round trip each rather than
+    one process each.
+    """
+
+    def __init__(self, repo_path: Path):
+        self.repo_path = repo_path
+        self.cat_file = None
+        try:
+            # The path of repo_path inside the working tree, empty at its root and in bare repositories
+            self.prefix = os.fsdecode(self.run("rev-parse", "--show-prefix")).strip()
+        except RuntimeError:
+            raise ValueError(f"{repo_path} is not a git repository")
+
+    def run(self, *args) -> bytes:
+        """
+        Run a git command in the repository and return its standard output.
+
+        Raises
+        ------
+        RuntimeError
+            If git is not installed or the command fails.
+        """
+
+        try:
+            completed = subprocess.run(["git", *args], cwd=self.repo_path, capture_output=True, check=True)
+        except FileNotFoundError:
+            raise RuntimeError("git executable not found")
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"git {args[0]} failed: {os.fsdecode(e.stderr).strip()}")
+        return completed.stdout
+
+    def resolve_revision(self, rev: str) -> str:
+        """
+        Resolve a branch, tag or other revision to the full id of its commit.
+
+        Raises
+        ------
+        ValueError
+            If the revision does not name a commit.
+        """
+
+        try:
+            return self.run("rev-parse", "--verify", "--quiet", f"{rev}^{{commit}}").decode().strip()
+        except RuntimeError:
+            raise ValueError(f"Unknown git revision {rev!r}")
+
+    def list_files(self, rev: str) -> list:
+        """
+        List the files of a revision.
+
+        Parameters
+        ----------
+        rev : str
+            The revision to list.
+
+        Returns
+        -------
+        list of tuple of (str, str, int)
+            The POSIX path relative to `repo_path`, blob id and size of every regular file, in git's tree order.
+        """
+
+        files = []
+        for record in self.run("ls-tree", "-r", "-z", "--long", rev).split(b"\0"):
+            if not record:
+                continue
+            info, path = record.split(b"\t", 1)
+            mode, object_type, blob_id, size = info.split()
+            if object_type == b"blob" and mode in GIT_FILE_MODES:
+                files.append((os.fsdecode(path), blob_id.decode(), int(size)))
+        return files
+
+    def changed_paths(self, base_rev: str, rev: str) -> set:
+        """
+        Get the paths that were added, modified or deleted between two revisions.
+
+        Returns
+        -------
+        set of str
+            POSIX paths relative to `repo_path`. Renames are reported as a deletion and an addition.
+        """
+
+        output = self.run("diff", "--name-only", "-z", "--no-renames", "--relative", base_rev, rev)
+        return {os.fsdecode(path) for path in output.split(b"\0") if path}
+
+    def read_blob(self, name: str) -> bytes:
+        """
+        Read the content of a blob.
+
+        Parameters
+        ----------
+        name : str
+            A blob id, or `<rev>:<path>` with a path relative to the repository root.
+
+        Returns
+        -------
+        bytes or None
+            The content of the blob, or None if the object is missing or is not a blob.
+        """
+
+        if self.cat_file is None or self.cat_file.poll() is not None:
+            self.cat_file = subprocess.Popen(
+                ["git", "cat-file", "--batch"], cwd=self.repo_path, stdin=subprocess.PIPE, stdout=subprocess.PIPE
+            )
+        self.cat_file.stdin.write(os.fsencode(name) + b"\n")
+        self.cat_file.stdin.flush()
+        header = self.cat_file.stdout.readline()
+        if not header or header.endswith(b" missing\n") or header.endswith(b" ambiguous\n"):
+            return None
+        _, object_type, size = header.split()
+        data = self.cat_file.stdout.read(int(size))
+        self.cat_file.stdout.read(1)  # The newline after the content
+        return data if object_type == b"blob" else None
+
+    def read_file(self, rev: str, path: str) -> bytes:
+        """
+        Read a file of a revision by its path relative to `repo_path`, or return None if it does not exist.
+        """
+
+        return self.read_blob(f"{rev}:{self.prefix}{path}")
+
+    def close(self):
+        """
+        Stop the `git cat-file` process, if it was started.
+        """
+
+        if self.cat_file is not None:
+            self.cat_file.stdin.close()
+            self.cat_file.wait()
+            self.cat_file.stdout.close()
+            self.cat_file = None
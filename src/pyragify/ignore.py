@@ -0,0 +1,203 @@
+import logging
+import os
+import re
+from pathlib import Path
+
+import pathspec
+
+logger = logging.getLogger(__name__)
+
+# pathspec names a group in every pattern's regex; the names must go for the regexes to be combined.
+NAMED_GROUP_PATTERN = re.compile(r"\(\?P<\w+>")
+
+class IgnoreSpec:
+    """
+    The patterns of one ignore file, matched against paths relative to the directory of the file.
+
+    Parameters
+    ----------
+    lines : list of str
+        The lines of the ignore file, in gitignore syntax.
+
+    Notes
+    -----
+    A `pathspec.PathSpec` tries its patterns one by one. When no pattern is negated, only whether any pattern
+    matches matters, so all patterns are combined into a single regular expression and a path is matched
+    in one pass, however long the ignore file is.
+    """
+
+    def __init__(self, lines):
+        self.spec = pathspec.PathSpec.from_lines("gitwildmatch", lines)
+        patterns = [pattern for pattern in self.spec.patterns if pattern.include is not None]
+        self.combined = None
+        if patterns and all(pattern.include for pattern in patterns):
+            try:
+                self.combined = re.compile("|".join(
+                    f"(?:{NAMED_GROUP_PATTERN.sub('(?:', pattern.regex.pattern)})" for pattern in patterns
+                ))
+            except (AttributeError, re.error):
+                self.combined = None
+        self.empty = not patterns
+
+    def check(self, relative_path: str) -> bool:
+        """
+        Match a path against the patterns.
+
+        Parameters
+        ----------
+        relative_path : str
+            The POSIX path relative to the directory of the ignore file, with a trailing slash for directories.
+
+        Returns
+        -------
+        bool or None
+            True if the last matching pattern ignores the path, False if it is negated (`!pattern`), and
+            None if no pattern matches.
+        """
+
+        if self.empty:
+            return None
+        if self.combined is not None:
+            return True if self.combined.search(relative_path) else None
+        return self.spec.check_file(relative_path).include
+
+class IgnoreRules:
+    """
+    Hierarchical ignore rules of a directory tree, with git's precedence.
+
+    Parameters
+    ----------
+    root : pathlib.Path
+        The root directory of the tree.
+    root_lines : list of str
+        Patterns that apply from the root, such as the top-level `.gitignore` and `.dockerignore`.
+    override_lines : list of str, optional
+        Patterns checked before all ignore files, which a negation in an ignore file cannot undo.
+    nested : bool, optional
+        If true, the `.gitignore` file of every directory is loaded the first time a path below it is checked.
+
+    Attributes
+    ----------
+    specs : dict
+        The `IgnoreSpec` of each directory loaded so far, keyed by its relative path with a trailing slash
+        ('' for the root), or None for directories without an ignore file.
+    decisions : dict
+        Whether each directory checked so far is ignored, keyed by its relative path.
+    chains : dict
+        For each directory checked so far, the ignore specs that apply inside it, deepest first, with the
+        length of the prefix to strip from paths before matching them.
+
+    Notes
+    -----
+    As in git, the deepest ignore file with a matching pattern decides, and a path inside an ignored directory
+    is ignored whatever its own patterns say. Directory decisions are cached, so checking a path costs one
+    match per ignore file above it, and nothing more once its parent is known to be ignored.
+    """
+
+    def __init__(self, root: Path, root_lines, override_lines=None, nested: bool = True):
+        self.root = root
+        self.root_prefix = os.path.join(str(root), "")
+        self.nested = nested
+        self.override = IgnoreSpec(override_lines or [])
+        self.specs = {"": IgnoreSpec(root_lines)}
+        self.decisions = {}
+        self.chains = {}
+
+    def spec_for(self, prefix: str) -> IgnoreSpec:
+        """
+        Get the ignore spec of a directory, loading its `.gitignore` file on first use.
+        """
+
+        if prefix in self.specs:
+            return self.specs[prefix]
+        spec = None
+        if self.nested:
+            ignore_file = self.root_prefix + prefix + ".gitignore"
+            try:
+                with open(ignore_file, "r", encoding="utf-8", errors="replace") as f:
+                    spec = IgnoreSpec(f.readlines())
+                logger.info(f"Loading ignore patterns from {prefix}.gitignore")
+            except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+                pass
+            except OSError as e:
+                logger.warning(f"Error reading {ignore_file}: {e}")
+        self.specs[prefix] = spec
+        return spec
+
+    def chain(self, dir_path: str) -> tuple:
+        """
+        Get the ignore specs that apply to the entries of a directory, deepest first.
+
+        Parameters
+        ----------
+        dir_path : str
+            The relative path of the directory, '' for the root.
+
+        Returns
+        -------
+        tuple of tuple of (int, IgnoreSpec)
+            The length of the directory prefix of each spec and the spec itself.
+        """
+
+        chain = self.chains.get(dir_path)
+        if chain is None:
+            if dir_path:
+                prefix = dir_path + "/"
+                spec = self.spec_for(prefix)
+                parent_chain = self.chain(dir_path.rpartition("/")[0])
+                chain = ((len(prefix), spec),) + parent_chain if spec is not None and not spec.empty else parent_chain
+            else:
+                root = self.specs[""]
+                chain = ((0, root),) if not root.empty else ()
+            self.chains[dir_path] = chain
+        return chain
+
+    def is_ignored(self, relative_path: str, is_dir: bool = False) -> bool:
+        """
+        Check whether a path is ignored.
+
+        Parameters
+        ----------
+        relative_path : str
+            The POSIX path relative to the root, without a trailing slash.
+        is_dir : bool, optional
+            Whether the path is a directory, so that directory-only patterns such as `build/` apply.
+
+        Returns
+        -------
+        bool
+            True if the path or one of its parent directories is ignored.
+        """
+
+        if is_dir and relative_path in self.decisions:
+            return self.decisions[relative_path]
+        parent = relative_path.rpartition("/")[0]
+        if parent and self.is_ignored(parent, is_dir=True):
+            ignored = True
+        else:
+            ignored = self.match(relative_path, is_dir)
+        if is_dir:
+            self.decisions[relative_path] = ignored
+        return ignored
+
+    def match(self, relative_path: str, is_dir: bool = False) -> bool:
+        """
+        Match a path against the override patterns, then the ignore files from its directory up to the root.
+        """
+
+        candidate = relative_path + "/" if is_dir else relative_path
+        result = self.override.check(candidate)
+        if result is not None:
+            return result
+        for prefix_length, spec in self.chain(relative_path.rpartition("/")[0]):
+            result = spec.check(candidate[prefix_length:])
+            if result is not None:
+                return result
+        return False
+
+    def match_file(self, relative_path: str) -> bool:
+        """
+        Check a path given with a trailing slash for directories, like `pathspec.PathSpec.match_file`.
+        """
+
+        return self.is_ignored(relative_path.rstrip("/"), is_dir=relative_path.endswith("/"))
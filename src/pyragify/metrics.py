@@ -0,0 +1,128 @@
+import heapq
+import time
+
+class StageMetrics:
+    """
+    Cumulative timings, call counts and slowest files for each stage of a run.
+
+    Attributes
+    ----------
+    slowest : int
+        The number of slowest files kept per stage.
+    stages : dict
+        Maps each stage name to its cumulative time in seconds, call count and slowest files.
+    files : int
+        The number of files whose content was processed.
+    bytes : int
+        The total size of those files.
+    started : float
+        The `time.perf_counter` value when the metrics were created or reset.
+
+    Methods
+    -------
+    add(stage, seconds, path)
+        Record one call of a stage.
+    add_timings(timings, path)
+        Record the stage timings measured for a file, e.g. in a worker process.
+    as_dict()
+        Summarize the metrics for `metadata.json`.
+
+    Notes
+    -----
+    Consecutive calls for the same path, such as formatting the chunks of one file, are added up before the
+    path competes for the slowest list, so the list ranks files rather than individual calls.
+    """
+
+    def __init__(self, slowest: int = 10):
+        self.slowest = slowest
+        self.reset()
+
+    def reset(self):
+        """
+        Clear all measurements and restart the wall clock.
+        """
+
+        self.stages = {}
+        self.files = 0
+        self.bytes = 0
+        self.started = time.perf_counter()
+
+    def add(self, stage: str, seconds: float, path: str = None):
+        """
+        Record one call of a stage.
+
+        Parameters
+        ----------
+        stage : str
+            The name of the stage.
+        seconds : float
+            The duration of the call.
+        path : str, optional
+            The file or directory the call worked on, for the slowest list.
+        """
+
+        metrics = self.stages.get(stage)
+        if metrics is None:
+            metrics = self.stages[stage] = {"seconds": 0.0, "calls": 0, "slowest": [], "path": None, "current": 0.0}
+        metrics["seconds"] += seconds
+        metrics["calls"] += 1
+        if path is None:
+            return
+        if path != metrics["path"]:
+            self.push_slowest(metrics)
+            metrics["path"], metrics["current"] = path, 0.0
+        metrics["current"] += seconds
+
+    def add_timings(self, timings: dict, path: str = None):
+        """
+        Record the stage timings measured for a file, as returned by `analyze_file`.
+        """
+
+        for stage, seconds in (timings or {}).items():
+            self.add(stage, seconds, path)
+
+    def push_slowest(self, metrics: dict):
+        """
+        Offer the path accumulated in `metrics` to its slowest list, which is kept as a min-heap.
+        """
+
+        if metrics["path"] is None:
+            return
+        item = (metrics["current"], metrics["path"])
+        if len(metrics["slowest"]) < self.slowest:
+            heapq.heappush(metrics["slowest"], item)
+        elif item > metrics["slowest"][0]:
+            heapq.heapreplace(metrics["slowest"], item)
+        metrics["path"] = None
+
+    def as_dict(self) -> dict:
+        """
+        Summarize the metrics for `metadata.json`.
+
+        Returns
+        -------
+        dict
+            The wall time of the run, its throughput in files/s and MB/s, and per stage the cumulative
+            seconds, call count and slowest files, slowest first.
+        """
+
+        wall = time.perf_counter() - self.started
+        stages = {}
+        for stage, metrics in self.stages.items():
+            self.push_slowest(metrics)
+            stages[stage] = {
+                "seconds": round(metrics["seconds"], 6),
+                "calls": metrics["calls"],
+                "slowest": [
+                    {"path": path, "seconds": round(seconds, 6)}
+                    for seconds, path in sorted(metrics["slowest"], reverse=True)
+                ],
+            }
+        return {
+            "wall_seconds": round(wall, 6),
+            "files": self.files,
+            "bytes": self.bytes,
+            "files_per_s": round(self.files / wall, 3) if wall else None,
+            "mb_per_s": round(self.bytes / wall / 1e6, 3) if wall else None,
+            "stages": stages,
+        }
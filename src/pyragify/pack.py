@@ -0,0 +1,444 @@
+import json
+import logging
+import lzma
+import os
+import zlib
+from pathlib import Path
+
+from pyragify.writer import BackgroundWriter
+
+logger = logging.getLogger(__name__)
+
+# The supported compressions and the suffix they add to the pack file name.
+PACK_COMPRESSIONS = {"none": "", "gzip": ".gz", "lzma": ".xz"}
+
+PACK_INDEX_NAME = "pack_index.json"
+
+# Compaction only pays off once the pack holds at least this many bytes of replaced members.
+MIN_COMPACT_BYTES = 1024 * 1024
+
+def pack_file_name(compression: str) -> str:
+    """
+    Return the name of the pack file for a compression, such as 'chunks.pack.gz' for gzip.
+
+    Raises
+    ------
+    ValueError
+        If the compression is not one of `PACK_COMPRESSIONS`.
+    """
+
+    if compression not in PACK_COMPRESSIONS:
+        raise ValueError(f"Unsupported pack compression {compression!r}, expected one of {tuple(PACK_COMPRESSIONS)}")
+    return "chunks.pack" + PACK_COMPRESSIONS[compression]
+
+def new_compressor(compression: str):
+    """
+    Create a streaming compressor for one member, or return None without compression.
+
+    Every member is a complete gzip member or xz stream, so the pack as a whole can also be decompressed
+    with `zcat` or `xz -dc`.
+    """
+
+    if compression == "gzip":
+        return zlib.compressobj(6, zlib.DEFLATED, 31)
+    if compression == "lzma":
+        return lzma.LZMACompressor(format=lzma.FORMAT_XZ)
+    return None
+
+def decompress_member(data: bytes, compression: str) -> bytes:
+    """
+    Decompress the bytes of one member.
+    """
+
+    if compression == "gzip":
+        return zlib.decompress(data, 31)
+    if compression == "lzma":
+        return lzma.decompress(data, format=lzma.FORMAT_XZ)
+    return data
+
+def load_pack_index(output_dir: Path) -> dict:
+    """
+    Load the member index of a pack.
+
+    Parameters
+    ----------
+    output_dir : pathlib.Path
+        The output directory of a run with `pack_output`.
+
+    Returns
+    -------
+    dict
+        The index with the keys 'version', 'compression', 'pack' and 'members', which maps each member name
+        to its 'offset' and compressed 'length' in the pack, its uncompressed 'size' and its 'sources'.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the directory holds no pack.
+    """
+
+    with open(output_dir / PACK_INDEX_NAME, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def read_member(output_dir: Path, name: str, index: dict = None) -> bytes:
+    """
+    Read and decompress a single member of a pack with one seek, without decompressing any other member.
+
+    Parameters
+    ----------
+    output_dir : pathlib.Path
+        The output directory of a run with `pack_output`.
+    name : str
+        The name of the member, the path the output file would have in the output directory, e.g. 'python/chunk_0.txt'.
+    index : dict, optional
+        The pack index, as returned by `load_pack_index`. Pass it when reading many members to load it only once.
+
+    Returns
+    -------
+    bytes
+        The content of the member, UTF-8 encoded.
+
+    Raises
+    ------
+    KeyError
+        If the pack has no member of that name.
+    """
+
+    if index is None:
+        index = load_pack_index(output_dir)
+    member = index["members"][name]
+    with open(output_dir / index["pack"], "rb") as f:
+        f.seek(member["offset"])
+        data = f.read(member["length"])
+    return decompress_member(data, index["compression"])
+
+def find_members(index: dict, source_paths) -> list:
+    """
+    Find the members that contain chunks of the given source files.
+
+    Parameters
+    ----------
+    index : dict
+        The pack index, as returned by `load_pack_index`.
+    source_paths : iterable of str
+        POSIX paths of source files relative to the repository root.
+
+    Returns
+    -------
+    list of str
+        The names of the matching members, in pack order.
+    """
+
+    wanted = set(source_paths)
+    return [name for name, member in index["members"].items() if wanted.intersection(member["sources"])]
+
+class PackWriter:
+    """
+    Stream output files as members of a single pack file instead of writing one file each.
+
+    Every output file becomes a member, compressed on its own, appended to `chunks.pack` (`.gz` or `.xz` with
+    compression), and recorded in `pack_index.json` with its offset, compressed length, size and source files.
+    The interface is that of `pyragify.writer.ChunkWriter`, so the processor can use either.
+
+    Parameters
+    ----------
+    output_dir : pathlib.Path
+        The output directory, where the pack and its index are written.
+    compression : str, optional
+        'none', 'gzip' or 'lzma'. Default is 'gzip'.
+    append : bool, optional
+        If true, members of earlier runs are kept, and a member written again replaces the old one in the
+        index. Otherwise every run starts a new pack. Default is False.
+    background : pyragify.writer.BackgroundWriter, optional
+        Runs the file operations. By default they run synchronously.
+    buffer_size : int, optional
+        The size in characters of the batches handed to `background`.
+
+    Attributes
+    ----------
+    pack_path : pathlib.Path
+        The path of the pack file.
+    members : dict
+        The index entries of the members, keyed by name. Only the writer thread changes it.
+    size : int
+        The number of characters written since the last `commit` or `discard`.
+
+    Notes
+    -----
+    Members are compressed as they are streamed, so neither a whole member nor the pack is held in memory.
+    Because every member is compressed separately, one member can be read with a seek and decompressed on its
+    own (see `read_member`). In append mode, replaced members stay in the pack as dead bytes until they
+    outweigh the live members, at which point `close` copies the live members into a new pack, without
+    recompressing them.
+    """
+
+    def __init__(self, output_dir: Path, compression: str = "gzip", append: bool = False, background: BackgroundWriter = None, buffer_size: int = 64 * 1024):
+        self.output_dir = output_dir
+        self.compression = compression
+        self.pack_path = output_dir / pack_file_name(compression)
+        self.index_path = output_dir / PACK_INDEX_NAME
+        self.append = append
+        self.background = background if background is not None else BackgroundWriter(0)
+        self.buffer_size = buffer_size
+        self.file = None
+        self.compressor = None
+        self.member_start = None
+        self.member_size = 0
+        self.failed = False
+        self.size = 0
+        self.batch = []
+        self.batch_size = 0
+        self.stale_pack = None
+        self.members = self.load_members()
+
+    def load_members(self) -> dict:
+        """
+        Load the members of the existing pack in append mode, or return an empty dict if there is none to keep.
+
+        A pack written with another compression is noted in `stale_pack`, to be removed once the new one is saved.
+        """
+
+        try:
+            index = load_pack_index(self.output_dir)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable pack index {self.index_path}: {e}")
+            return {}
+        if index.get("pack") != self.pack_path.name or index.get("compression") != self.compression:
+            if index.get("pack"):
+                self.stale_pack = self.output_dir / index["pack"]
+            logger.info(f"Pack settings changed, {self.pack_path.name} will be rewritten.")
+            return {}
+        if not self.append:
+            return {}
+        try:
+            pack_size = self.pack_path.stat().st_size
+        except OSError:
+            return {}
+        members = index.get("members", {})
+        if any(member["offset"] + member["length"] > pack_size for member in members.values()):
+            logger.warning(f"{self.pack_path} is shorter than its index, it will be rewritten.")
+            return {}
+        return members
+
+    @property
+    def has_content(self) -> bool:
+        """
+        Whether any text was written since the last `commit` or `discard`.
+        """
+
+        return self.size > 0
+
+    def exists(self, file_path: Path) -> bool:
+        """
+        Whether the pack holds a member for the output file `file_path`.
+        """
+
+        return self.member_name(file_path) in self.members
+
+    def member_name(self, file_path: Path) -> str:
+        """
+        Return the member name of an output file, its POSIX path relative to the output directory.
+        """
+
+        return file_path.relative_to(self.output_dir).as_posix()
+
+    def write(self, text: str):
+        """
+        Append text to the current member, handing it to `background` once a batch is full.
+        """
+
+        self.batch.append(text)
+        self.batch_size += len(text)
+        self.size += len(text)
+        if self.batch_size >= self.buffer_size:
+            self.submit_batch()
+
+    def submit_batch(self):
+        """
+        Hand the text collected so far to `background`.
+        """
+
+        if self.batch:
+            self.background.submit(self.write_batch, "".join(self.batch))
+            self.batch = []
+            self.batch_size = 0
+
+    def open_pack(self):
+        """
+        Open the pack file for appending, or start a new one if there are no members to keep. Runs on the writer thread.
+        """
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if self.members and self.pack_path.exists():
+            self.file = open(self.pack_path, "r+b")
+            self.file.seek(0, os.SEEK_END)
+        else:
+            self.members = {}
+            self.file = open(self.pack_path, "w+b")
+
+    def write_batch(self, text: str):
+        """
+        Compress a batch and append it to the pack, starting a member if needed. Runs on the writer thread.
+        """
+
+        if self.failed:
+            return
+        try:
+            if self.file is None:
+                self.open_pack()
+            if self.member_start is None:
+                self.member_start = self.file.tell()
+                self.member_size = 0
+                self.compressor = new_compressor(self.compression)
+            data = text.encode("utf-8")
+            self.member_size += len(data)
+            self.file.write(self.compressor.compress(data) if self.compressor is not None else data)
+        except OSError:
+            self.failed = True
+            raise
+
+    def commit(self, file_path: Path, sources: list = None):
+        """
+        Finish the current member under the name of the output file `file_path`.
+
+        Parameters
+        ----------
+        file_path : pathlib.Path
+            The path the output file would have in the output directory.
+        sources : list of str, optional
+            The source files whose chunks the member holds, recorded in the index for `find_members`.
+        """
+
+        if not self.has_content:
+            return
+        self.submit_batch()
+        self.size = 0
+        self.background.submit(self.commit_member, self.member_name(file_path), list(sources or []))
+
+    def commit_member(self, name: str, sources: list):
+        """
+        Flush the compressor and record the current member in the index. Runs on the writer thread.
+
+        Raises
+        ------
+        OSError
+            If the member could not be written. It is discarded.
+        """
+
+        try:
+            if self.failed:
+                raise OSError(f"writing member {name} to {self.pack_path} failed")
+            if self.compressor is not None:
+                self.file.write(self.compressor.flush())
+            self.members[name] = {
+                "offset": self.member_start,
+                "length": self.file.tell() - self.member_start,
+                "size": self.member_size,
+                "sources": sources,
+            }
+            self.member_start = None
+            self.compressor = None
+        except OSError:
+            self.discard_member()
+            raise
+
+    def discard(self):
+        """
+        Drop anything written since the last `commit`.
+        """
+
+        self.batch = []
+        self.batch_size = 0
+        self.size = 0
+        self.background.submit(self.discard_member)
+
+    def discard_member(self):
+        """
+        Cut the current member off the end of the pack. Runs on the writer thread.
+        """
+
+        self.failed = False
+        self.compressor = None
+        if self.file is not None and self.member_start is not None:
+            try:
+                self.file.seek(self.member_start)
+                self.file.truncate()
+            except OSError as e:
+                logger.warning(f"Error truncating {self.pack_path}: {e}")
+        self.member_start = None
+
+    def remove(self, file_path: Path):
+        """
+        Drop the member of an output file from the index. Its bytes are reclaimed by the next compaction.
+        """
+
+        self.background.submit(self.remove_member, self.member_name(file_path))
+
+    def remove_member(self, name: str):
+        """
+        Drop a member from the index. Runs on the writer thread.
+        """
+
+        self.members.pop(name, None)
+
+    def close(self):
+        """
+        Compact the pack if needed, then save the index and close the pack file.
+        """
+
+        self.background.submit(self.close_pack, output_path=self.pack_path)
+        self.background.submit(self.save_index, output_path=self.index_path)
+
+    def close_pack(self):
+        """
+        Close the pack file, copying the live members into a new pack first if most of it is dead. Runs on the writer thread.
+        """
+
+        if self.file is None:
+            return
+        try:
+            pack_size = self.file.seek(0, os.SEEK_END)
+            live_size = sum(member["length"] for member in self.members.values())
+            if pack_size - live_size > max(live_size, MIN_COMPACT_BYTES):
+                self.compact()
+        finally:
+            self.file.close()
+            self.file = None
+
+    def compact(self):
+        """
+        Rewrite the pack with only the live members, in their current order. Runs on the writer thread.
+        """
+
+        temporary_path = self.pack_path.with_name(self.pack_path.name + ".tmp")
+        members = {}
+        with open(temporary_path, "wb") as f:
+            for name, member in self.members.items():
+                self.file.seek(member["offset"])
+                members[name] = {**member, "offset": f.tell()}
+                f.write(self.file.read(member["length"]))
+        self.file.close()
+        os.replace(temporary_path, self.pack_path)
+        self.file = open(self.pack_path, "rb")
+        logger.info(f"Compacted {self.pack_path} to {len(members)} members")
+        self.members = members
+
+    def save_index(self):
+        """
+        Write `pack_index.json` and remove a pack left behind with other settings. Runs on the writer thread.
+        """
+
+        temporary_path = self.index_path.with_name(self.index_path.name + ".tmp")
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": 1, "compression": self.compression, "pack": self.pack_path.name, "members": self.members},
+                f, indent=4
+            )
+        os.replace(temporary_path, self.index_path)
+        if self.stale_pack is not None and self.stale_pack != self.pack_path:
+            self.stale_pack.unlink(missing_ok=True)
+        self.stale_pack = None
+        if not self.append:
+            self.members = {}
@@ -0,0 +1,104 @@
+def assign_output_files(previous_groups: list, files: dict, max_words: int, split_on_files: bool = False, extension: str = "txt", max_tokens: int = 0) -> list:
+    """
+    Assign source files to output files, keeping the assignment of the previous run wherever possible.
+
+    Parameters
+    ----------
+    previous_groups : list of dict
+        The groups saved in `assignments.json` by the previous run. Each group has the keys 'id', 'subdir'
+        and 'members', a list of dicts with the keys 'path', 'hash', 'words' and 'tokens'.
+    files : dict
+        Maps the relative path of every source file of this run, in walk order, to a dict with the keys
+        'subdir', 'hash', 'words' and 'tokens'.
+    max_words : int
+        The maximum number of words per output file. A single file larger than this gets its own output file.
+    split_on_files : bool, optional
+        If true, every source file gets its own output file.
+    extension : str, optional
+        The extension of the output files, without the dot.
+    max_tokens : int, optional
+        The maximum approximate number of tokens per output file, checked alongside `max_words`. 0 disables it.
+
+    Returns
+    -------
+    list of dict
+        The groups of this run, each with the keys 'id', 'subdir', 'file', 'members', 'words', 'tokens' and 'dirty'.
+        'dirty' is true when the group's output file must be rewritten. Groups whose members were all
+        removed are returned with an empty member list so their output file can be deleted.
+
+    Notes
+    -----
+    - Files keep their previous output file as long as they still exist and it is not over budget.
+      If a group grows over `max_words` or `max_tokens`, its trailing members are moved out.
+    - New and moved files are appended, in walk order, to the last output file of their subdirectory
+      while it has room, then to new output files.
+    - A group is dirty only if its member list changed or one of its members changed content, so an
+      edit to one source file rewrites only the output file that contains it.
+    """
+
+    def over_budget(words, tokens):
+        return words > max_words or (max_tokens and tokens > max_tokens)
+
+    groups = []
+    assigned = set()
+    next_id = {}
+    open_groups = {}
+
+    for previous in sorted(previous_groups, key=lambda g: (g["subdir"], g["id"])):
+        subdir = previous["subdir"]
+        members = []
+        for member in previous["members"]:
+            path = member["path"]
+            info = files.get(path)
+            if info is None or info["subdir"] != subdir or path in assigned:
+                continue
+            members.append({"path": path, "hash": info["hash"], "words": info["words"], "tokens": info["tokens"]})
+
+        words = sum(member["words"] for member in members)
+        tokens = sum(member["tokens"] for member in members)
+        while len(members) > 1 and over_budget(words, tokens):
+            member = members.pop()
+            words -= member["words"]
+            tokens -= member["tokens"]
+        assigned.update(member["path"] for member in members)
+
+        group = {
+            "id": previous["id"],
+            "subdir": subdir,
+            "file": f"{subdir}/chunk_{previous['id']}.{extension}",
+            "members": members,
+            "words": words,
+            "tokens": tokens,
+            "dirty": members != previous["members"],
+        }
+        groups.append(group)
+        next_id[subdir] = max(next_id.get(subdir, 0), previous["id"] + 1)
+        open_groups[subdir] = group
+
+    for path, info in files.items():
+        if path in assigned:
+            continue
+        subdir = info["subdir"]
+        group = open_groups.get(subdir)
+        if group is None or split_on_files or (
+            group["members"] and over_budget(group["words"] + info["words"], group["tokens"] + info["tokens"])
+        ):
+            group_id = next_id.get(subdir, 0)
+            next_id[subdir] = group_id + 1
+            group = {
+                "id": group_id,
+                "subdir": subdir,
+                "file": f"{subdir}/chunk_{group_id}.{extension}",
+                "members": [],
+                "words": 0,
+                "tokens": 0,
+                "dirty": True,
+            }
+            groups.append(group)
+            open_groups[subdir] = group
+        group["members"].append({"path": path, "hash": info["hash"], "words": info["words"], "tokens": info["tokens"]})
+        group["words"] += info["words"]
+        group["tokens"] += info["tokens"]
+        group["dirty"] = True
+
+    return groups
@@ -1,13 +1,29 @@
 import ast
+import codecs
+import cProfile
 import hashlib
 import json
-import tokenize
+import os
 import pathspec
 import logging
+import mmap
 import re
+import time
+from bisect import bisect_left, bisect_right
 from io import StringIO
+from itertools import accumulate
 from pathlib import Path
-from collections import defaultdict
+from collections import defaultdict, deque
+from contextlib import nullcontext
+from concurrent.futures import Future, ProcessPoolExecutor
+from pyragify.chunk import Chunk
+from pyragify.metrics import StageMetrics
+from pyragify.cache import ChunkCache, chunk_cache_key, load_entry
+from pyragify.git import GitRepository
+from pyragify.ignore import IgnoreRules
+from pyragify.pack import PACK_INDEX_NAME, PackWriter, read_member
+from pyragify.packing import assign_output_files
+from pyragify.writer import BackgroundWriter, ChunkWriter
 from pyragify.utils import validate_directory
 
 # Configure logging
@@ -34,29 +50,56 @@ def save_json(data: dict, file_path: Path, description: str):
 
     Notes
     -----
-    This function logs both successful saves and any errors encountered.
+    This function logs both successful saves and any errors encountered. The data is written to a temporary
+    file that then replaces `file_path`, so readers never see a partially written file, e.g. in watch mode.
     """
 
     try:
-        with open(file_path, "w", encoding="utf-8") as f:
+        temporary_path = file_path.with_name(file_path.name + ".tmp")
+        with open(temporary_path, "w", encoding="utf-8") as f:
             json.dump(data, f, indent=4)
+        os.replace(temporary_path, file_path)
         logger.info(f"{description} saved to {file_path}")
     except Exception as e:
         logger.error(f"Error saving {description}: {e}")
 
-def compute_file_hash(file_path: Path) -> str:
+HASH_ALGORITHMS = ("md5", "sha1", "sha256", "blake2b", "blake2s")
+
+# Recorded as the algorithm of `hashes.json` when files are read from git and hashed by their blob ids.
+GIT_HASH_ALGORITHM = "git"
+
+# Files of at least this many bytes are memory-mapped instead of read into a bytes object. Below it, the cost
+# of setting up the mapping outweighs the copy it saves.
+MMAP_THRESHOLD = 256 * 1024
+
+def map_file(f) -> mmap.mmap:
+    """
+    Map an open file read-only, or return None if it is empty or cannot be mapped, e.g. a pipe or special file.
+    """
+
+    try:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+def compute_file_hash(file_path: Path, algorithm: str = "md5", mmap_threshold: int = MMAP_THRESHOLD) -> str:
     """
-    Compute the MD5 hash of a file.
+    Compute the hash of a file.
 
     Parameters
     ----------
     file_path : pathlib.Path
         The path to the file whose hash is to be computed.
+    algorithm : str, optional
+        The hashlib algorithm to use, one of `HASH_ALGORITHMS`. Default is "md5".
+    mmap_threshold : int, optional
+        Files of at least this many bytes are hashed through a memory map, smaller files with a single read.
+        0 disables memory mapping. Default is `MMAP_THRESHOLD`.
 
     Returns
     -------
     str or None
-        The MD5 hash of the file as a hexadecimal string, or None if an error occurs.
+        The hash of the file as a hexadecimal string, or None if an error occurs.
 
     Raises
     ------
@@ -66,17 +109,76 @@ def compute_file_hash(file_path: Path) -> str:
     Notes
     -----
     MD5 is not suitable for cryptographic purposes but is sufficient for file integrity checks.
+    BLAKE2b is usually faster than MD5 on 64-bit platforms.
     """
 
-    hash_md5 = hashlib.md5()
+    file_hash = hashlib.new(algorithm)
     try:
         with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
+            mapping = None
+            if mmap_threshold and os.fstat(f.fileno()).st_size >= mmap_threshold:
+                mapping = map_file(f)
+            if mapping is None:
+                file_hash.update(f.read())
+            else:
+                with mapping:
+                    file_hash.update(mapping)
     except Exception as e:
         logger.error(f"Error computing hash for {file_path}: {e}")
         return None
-    return hash_md5.hexdigest()
+    return file_hash.hexdigest()
+
+def stat_signature(stat_result: os.stat_result) -> dict:
+    """
+    Extract the fields used to detect file changes without reading the file.
+
+    Parameters
+    ----------
+    stat_result : os.stat_result
+        The result of `os.stat` or `os.DirEntry.stat` for the file.
+
+    Returns
+    -------
+    dict
+        A dictionary with the keys 'size', 'mtime_ns' and 'inode'.
+    """
+
+    return {"size": stat_result.st_size, "mtime_ns": stat_result.st_mtime_ns, "inode": stat_result.st_ino}
+
+def load_hash_manifest(file_path: Path, algorithm: str) -> tuple:
+    """
+    Load the hash manifest written by a previous run.
+
+    Parameters
+    ----------
+    file_path : pathlib.Path
+        The path to `hashes.json`.
+    algorithm : str
+        The hash algorithm of the current run.
+
+    Returns
+    -------
+    tuple of (dict, int)
+        A mapping of relative paths to entries with a 'hash' key and, when known, the stat signature keys
+        of `stat_signature`; and the start time of the previous run in nanoseconds (0 if unknown).
+
+    Notes
+    -----
+    Manifests written before stat signatures were recorded map paths directly to MD5 hashes; they are
+    still read, and their files are re-hashed once. Entries hashed with a different algorithm cannot be
+    compared and are discarded.
+    """
+
+    data = load_json(file_path, "hashes")
+    if "files" not in data:
+        manifest_algorithm, files, started_ns = "md5", {path: {"hash": h} for path, h in data.items()}, 0
+    else:
+        manifest_algorithm, files, started_ns = data.get("algorithm", "md5"), data["files"], data.get("started_ns", 0)
+    if manifest_algorithm != algorithm:
+        if files:
+            logger.info(f"Hash algorithm changed from {manifest_algorithm} to {algorithm}, all files will be re-hashed.")
+        return {}, 0
+    return files, started_ns
 
 def load_json(file_path: Path, description: str) -> dict:
     """
@@ -108,6 +210,48 @@ def load_json(file_path: Path, description: str) -> dict:
             logger.error(f"Error loading {description}: {e}")
     return {}
 
+OUTPUT_FORMATS = ("text", "jsonl")
+
+def load_chunk(output_dir: Path, chunk_id: str, index: dict = None) -> dict:
+    """
+    Read a single chunk record from JSONL output with one seek.
+
+    Parameters
+    ----------
+    output_dir : pathlib.Path
+        The output directory of a run with `output_format="jsonl"`.
+    chunk_id : str
+        The id of the chunk, `<relative path>#<n>` for the n-th chunk of a source file.
+    index : dict, optional
+        The contents of `chunk_index.json`. Pass it when reading many chunks to load the index only once.
+
+    Returns
+    -------
+    dict
+        The chunk record, as written to the output file.
+
+    Raises
+    ------
+    KeyError
+        If the chunk id is not in the index.
+
+    Notes
+    -----
+    With `pack_output`, the output file is a member of the pack. Only that member is decompressed, and the record
+    is sliced from it.
+    """
+
+    if index is None:
+        index = load_json(output_dir / "chunk_index.json", "chunk index")
+    location = index["chunks"][chunk_id]
+    file_path = output_dir / location["file"]
+    if not file_path.exists() and (output_dir / PACK_INDEX_NAME).exists():
+        data = read_member(output_dir, location["file"])
+        return json.loads(data[location["offset"]:location["offset"] + location["length"]])
+    with open(file_path, "rb") as f:
+        f.seek(location["offset"])
+        return json.loads(f.read(location["length"]))
+
 def is_documentation_file(file_path: Path) -> bool:
     """
     Check if a file is a documentation file based on its name.
@@ -130,6 +274,16 @@ def is_documentation_file(file_path: Path) -> bool:
     documentation_files = ["README.md", "README.rst", "CONTRIBUTING.md", "CHANGELOG.md"]
     return file_path.name in documentation_files
 
+# Bump whenever a change to the chunkers alters their output, to invalidate cached chunks.
+CHUNKER_VERSION = "5"
+
+# Matches Python string literals (so that '#' inside them is ignored) and comments, in a single pass.
+PYTHON_COMMENT_PATTERN = re.compile(
+    r"""(?P<string>[rRbBuUfF]{0,2}(?:'''(?:\\[\s\S]|[^\\])*?'''|\"\"\"(?:\\[\s\S]|[^\\])*?\"\"\""""
+    r"""|'(?:\\[\s\S]|[^'\\\n])*'|"(?:\\[\s\S]|[^"\\\n])*"))"""
+    r"|(?P<comment>#[^\n]*)"
+)
+
 FILE_TYPE_MAP = {
     ".py": "python",
     ".md": "markdown",
@@ -161,6 +315,236 @@ def read_file_in_chunks(file_path: Path, chunk_size: int = 4096):
         while chunk := file.read(chunk_size):
             yield chunk
 
+# Files with these extensions are rejected by `should_skip` without being opened.
+BINARY_EXTENSIONS = (
+    ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".webp", ".tif", ".tiff", ".psd",
+    ".pdf", ".zip", ".gz", ".tgz", ".bz2", ".xz", ".zst", ".7z", ".rar", ".tar", ".whl", ".egg", ".jar",
+    ".so", ".dll", ".dylib", ".exe", ".o", ".a", ".lib", ".pyc", ".pyo", ".pyd", ".class",
+    ".pkl", ".pickle", ".npy", ".npz", ".h5", ".hdf5", ".parquet", ".feather", ".arrow", ".pt", ".pth",
+    ".ckpt", ".onnx", ".safetensors", ".db", ".sqlite", ".sqlite3",
+    ".mp3", ".mp4", ".wav", ".flac", ".ogg", ".avi", ".mov", ".mkv", ".webm",
+    ".woff", ".woff2", ".ttf", ".otf", ".eot",
+)
+
+# The number of leading bytes inspected by `sniff_encoding`.
+SNIFF_SIZE = 8192
+
+# Byte order marks of the encodings used for charset fallback. UTF-32 LE must come before UTF-16 LE,
+# whose mark it starts with.
+BYTE_ORDER_MARKS = (
+    (codecs.BOM_UTF32_LE, "utf-32"), (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+# Control characters that do not occur in text, removed from a sample to count them.
+TEXT_BYTES = bytes(range(0x20, 0x7f)) + bytes(range(0x80, 0x100)) + b"\t\n\r\f\b\x1b"
+
+def sniff_encoding(sample: bytes, fallback_encoding: str = None, complete: bool = False) -> tuple:
+    """
+    Decide from the first bytes of a file whether it is text, and in which encoding.
+
+    Parameters
+    ----------
+    sample : bytes
+        The first `SNIFF_SIZE` bytes of the file, or all of it if it is shorter.
+    fallback_encoding : str, optional
+        The encoding used for text that is not valid UTF-8, such as "latin-1" or "cp1252". When set, files
+        starting with a UTF-16 or UTF-32 byte order mark are decoded accordingly as well. If omitted, only
+        UTF-8 text is accepted.
+    complete : bool, optional
+        Whether `sample` is the whole file, so a multi-byte character cut at its end is an error.
+
+    Returns
+    -------
+    tuple of (str, str)
+        The encoding to decode the file with and None, or None and the reason the file is rejected.
+
+    Notes
+    -----
+    As in git, a NUL byte marks a binary file. Samples that are not UTF-8 are only decoded with
+    `fallback_encoding` if at most one byte in 32 is a control character.
+    """
+
+    for mark, encoding in BYTE_ORDER_MARKS:
+        if sample.startswith(mark):
+            return (encoding, None) if fallback_encoding else (None, f"{encoding.upper()} text")
+    if b"\0" in sample:
+        return None, "Binary file"
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=complete)
+        return "utf-8", None
+    except UnicodeDecodeError:
+        pass
+    if len(sample.translate(None, TEXT_BYTES)) * 32 > len(sample):
+        return None, "Binary file"
+    if fallback_encoding:
+        return fallback_encoding, None
+    return None, "Not UTF-8 text"
+
+def decode_text(data: bytes, encoding: str = "utf-8") -> str:
+    """
+    Decode file bytes as text with universal newlines.
+
+    Parameters
+    ----------
+    data : bytes or buffer
+        The raw contents of a file, as bytes or any object supporting the buffer protocol, such as an `mmap.mmap`.
+    encoding : str, optional
+        The encoding of the file, as returned by `sniff_encoding`. Default is "utf-8".
+
+    Returns
+    -------
+    str
+        The decoded text, with '\\r\\n' and '\\r' line endings translated to '\\n'.
+
+    Raises
+    ------
+    UnicodeDecodeError
+        If the data is not valid in the encoding.
+
+    Notes
+    -----
+    The result is identical to reading the file with `open(file_path, encoding=encoding)`.
+    """
+
+    text = str(data, encoding)
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+def count_lines(text: str) -> int:
+    """
+    Count the lines of decoded text the way iterating over a text file would.
+
+    Parameters
+    ----------
+    text : str
+        Text with '\\n' line endings, as returned by `decode_text`.
+
+    Returns
+    -------
+    int
+        The number of lines, including a final line without a trailing newline.
+    """
+
+    return text.count("\n") + (1 if text and not text.endswith("\n") else 0)
+
+# Lines that start at column 0 with code, i.e. top-level statements when outside strings. Closing
+# brackets at column 0 end a multi-line statement rather than start a new one.
+PYTHON_TOP_LEVEL_PATTERN = re.compile(r"^(?=[^\s#)\]}])", re.MULTILINE)
+PYTHON_DEFINITION_PATTERN = re.compile(r"(?:async[ \t]+)?def[ \t]+(\w+)|class[ \t]+(\w+)")
+PYTHON_INDENTED_CODE_PATTERN = re.compile(r"^([ \t]+)[^\s#]", re.MULTILINE)
+PYTHON_INDENTED_DEF_PATTERN = re.compile(r"^([ \t]+)(?:async[ \t]+)?def[ \t]+(\w+)", re.MULTILINE)
+
+def line_offsets(text: str) -> list:
+    """
+    Compute the offset at which each line of a text starts.
+
+    Parameters
+    ----------
+    text : str
+        Text with newline line endings, as returned by `decode_text`.
+
+    Returns
+    -------
+    list of int
+        The offset of the first character of line `i + 1` at index `i`. A text ending with a newline has
+        one more offset than it has lines, pointing at the end of the text.
+    """
+
+    return list(accumulate((len(line) + 1 for line in text.split("\n")[:-1]), initial=0))
+
+def line_slice(text: str, offsets: list, start_line: int, end_line: int) -> str:
+    """
+    Slice the lines `start_line` to `end_line` (1-based, inclusive) out of a text, without the final newline.
+
+    Parameters
+    ----------
+    text : str
+        The full text.
+    offsets : list of int
+        The line offsets of `text`, as returned by `line_offsets`.
+    start_line : int
+        The first line to include.
+    end_line : int
+        The last line to include.
+
+    Returns
+    -------
+    str
+        The selected lines, exactly as they appear in `text`.
+    """
+
+    end = offsets[end_line] - 1 if end_line < len(offsets) else len(text)
+    return text[offsets[start_line - 1]:end]
+
+def extract_python_comments(text: str, offsets: list) -> list:
+    """
+    Extract the comments of Python source code.
+
+    Parameters
+    ----------
+    text : str
+        Python source code that parses without errors.
+    offsets : list of int
+        The line offsets of `text`, as returned by `line_offsets`.
+
+    Returns
+    -------
+    list of dict
+        One dictionary per comment with the keys 'type' (always 'comment'), 'line' and 'text', in source order.
+
+    Notes
+    -----
+    String literals and comments are matched by a single precompiled regular expression, so '#'
+    characters inside strings are not mistaken for comments. This gives the same comments as
+    `tokenize` at a fraction of the cost.
+    """
+
+    comments = []
+    for match in PYTHON_COMMENT_PATTERN.finditer(text):
+        comment = match.group("comment")
+        if comment is not None:
+            comments.append({
+                "type": "comment",
+                "line": bisect_right(offsets, match.start()),
+                "text": comment.lstrip("#").strip()
+            })
+    return comments
+
+# HTML rewriting rules applied in order by `clean_html_content`. Each rule only runs if its opening
+# and closing literals occur in the text, which is exactly when its pattern can match.
+HTML_CLEANUP_RULES = [
+    # Images
+    ("<img", None, re.compile(r'<img[^>]*src="([^"]*)"[^>]*alt="([^"]*)"[^>]*>'), r'[Image: \2 (\1)]'),
+    ("<img", None, re.compile(r'<img[^>]*src="([^"]*)"[^>]*>'), r'[Image: \1]'),
+    # Links
+    ("<a", "</a>", re.compile(r'<a[^>]*href="([^"]*)"[^>]*>(.*?)</a>'), r'[\2](\1)'),
+    # Basic formatting
+    ("<strong>", "</strong>", re.compile(r'<strong>(.*?)</strong>'), r'**\1**'),
+    ("<b>", "</b>", re.compile(r'<b>(.*?)</b>'), r'**\1**'),
+    ("<em>", "</em>", re.compile(r'<em>(.*?)</em>'), r'*\1*'),
+    ("<i>", "</i>", re.compile(r'<i>(.*?)</i>'), r'*\1*'),
+    # Headers
+    ("<h1", "</h1>", re.compile(r'<h1[^>]*>(.*?)</h1>'), r'# \1'),
+    ("<h2", "</h2>", re.compile(r'<h2[^>]*>(.*?)</h2>'), r'## \1'),
+    ("<h3", "</h3>", re.compile(r'<h3[^>]*>(.*?)</h3>'), r'### \1'),
+    ("<h4", "</h4>", re.compile(r'<h4[^>]*>(.*?)</h4>'), r'#### \1'),
+    ("<h5", "</h5>", re.compile(r'<h5[^>]*>(.*?)</h5>'), r'##### \1'),
+    ("<h6", "</h6>", re.compile(r'<h6[^>]*>(.*?)</h6>'), r'###### \1'),
+    # Paragraphs and divs
+    ("<p", "</p>", re.compile(r'<p[^>]*>(.*?)</p>', re.DOTALL), r'\1\n\n'),
+    ("<div", "</div>", re.compile(r'<div[^>]*>(.*?)</div>', re.DOTALL), r'\1\n'),
+    # Line breaks and horizontal rules
+    ("<br", None, re.compile(r'<br[^>]*>'), r'\n'),
+    ("<hr", None, re.compile(r'<hr[^>]*>'), r'---\n'),
+    # Any remaining HTML tags
+    ("<", None, re.compile(r'<[^>]+>'), ''),
+]
+# Opening or closing line of a fenced code block: the fence and whatever follows it.
+MARKDOWN_FENCE_PATTERN = re.compile(r" {0,3}(`{3,}|~{3,})(.*)")
+HTML_BLANK_LINES_PATTERN = re.compile(r'\n\s*\n\s*\n')
+
 def clean_html_content(content: str) -> str:
     """
     Clean HTML content to make it more readable in chunked output.
@@ -174,51 +558,27 @@ def clean_html_content(content: str) -> str:
     -------
     str
         Cleaned content with HTML tags replaced with readable equivalents
+
+    Notes
+    -----
+    The rules of `HTML_CLEANUP_RULES` are precompiled and skipped when the text cannot contain a
+    match, so sections without any '<' only go through the whitespace cleanup.
     """
     if not content:
         return content
-    
+
     # Replace common HTML elements with readable equivalents
     cleaned = content
-    
-    # Handle images
-    cleaned = re.sub(r'<img[^>]*src="([^"]*)"[^>]*alt="([^"]*)"[^>]*>', r'[Image: \2 (\1)]', cleaned)
-    cleaned = re.sub(r'<img[^>]*src="([^"]*)"[^>]*>', r'[Image: \1]', cleaned)
-    
-    # Handle links
-    cleaned = re.sub(r'<a[^>]*href="([^"]*)"[^>]*>(.*?)</a>', r'[\2](\1)', cleaned)
-    
-    # Handle basic formatting
-    cleaned = re.sub(r'<strong>(.*?)</strong>', r'**\1**', cleaned)
-    cleaned = re.sub(r'<b>(.*?)</b>', r'**\1**', cleaned)
-    cleaned = re.sub(r'<em>(.*?)</em>', r'*\1*', cleaned)
-    cleaned = re.sub(r'<i>(.*?)</i>', r'*\1*', cleaned)
-    
-    # Handle headers
-    cleaned = re.sub(r'<h1[^>]*>(.*?)</h1>', r'# \1', cleaned)
-    cleaned = re.sub(r'<h2[^>]*>(.*?)</h2>', r'## \1', cleaned)
-    cleaned = re.sub(r'<h3[^>]*>(.*?)</h3>', r'### \1', cleaned)
-    cleaned = re.sub(r'<h4[^>]*>(.*?)</h4>', r'#### \1', cleaned)
-    cleaned = re.sub(r'<h5[^>]*>(.*?)</h5>', r'##### \1', cleaned)
-    cleaned = re.sub(r'<h6[^>]*>(.*?)</h6>', r'###### \1', cleaned)
-    
-    # Handle paragraphs and divs
-    cleaned = re.sub(r'<p[^>]*>(.*?)</p>', r'\1\n\n', cleaned, flags=re.DOTALL)
-    cleaned = re.sub(r'<div[^>]*>(.*?)</div>', r'\1\n', cleaned, flags=re.DOTALL)
-    
-    # Handle line breaks
-    cleaned = re.sub(r'<br[^>]*>', r'\n', cleaned)
-    
-    # Handle horizontal rules
-    cleaned = re.sub(r'<hr[^>]*>', r'---\n', cleaned)
-    
-    # Remove any remaining HTML tags
-    cleaned = re.sub(r'<[^>]+>', '', cleaned)
-    
+    if "<" in cleaned:
+        for opening, closing, pattern, replacement in HTML_CLEANUP_RULES:
+            if opening in cleaned and (closing is None or closing in cleaned):
+                cleaned = pattern.sub(replacement, cleaned)
+
     # Clean up extra whitespace
-    cleaned = re.sub(r'\n\s*\n\s*\n', r'\n\n', cleaned)
+    if cleaned.count("\n") >= 3:
+        cleaned = HTML_BLANK_LINES_PATTERN.sub('\n\n', cleaned)
     cleaned = cleaned.strip()
-    
+
     return cleaned
 
 class FileProcessor:
@@ -231,83 +591,210 @@ class FileProcessor:
     ----------
     repo_path : pathlib.Path
         The path to the repository being processed.
-    output_dir : pathlib.Path
-        The directory where processed output will be saved.
+    output_dir : pathlib.Path or None
+        The directory where processed output will be saved, or None if nothing is written.
+    fast_python_threshold : int
+        Python files larger than this many characters are chunked with `chunk_python_fast`. 0 disables the threshold.
+    generated_patterns : list of str
+        Patterns of generated Python files, relative to the repository, that are always chunked with `chunk_python_fast`.
+    max_section_words : int
+        Markdown sections longer than this many words are split into parts. 0 disables splitting.
+    fallback_encoding : str or None
+        The encoding of text files that are not valid UTF-8, see `sniff_encoding`. None rejects them.
+    mmap_threshold : int
+        Files of at least this many bytes are memory-mapped by `analyze_file` instead of read. 0 disables memory mapping.
 
     Methods
     -------
     chunk_python_file(file_path)
         Chunk a Python file into semantic sections.
+    chunk_python_fast(file_content)
+        Chunk Python source into top-level definitions by indentation, without parsing it.
     chunk_markdown_file(file_path)
         Chunk a Markdown file into sections based on headers.
+    iter_markdown_chunks(lines)
+        Lazily split Markdown lines into sections, ignoring headers inside fenced code blocks.
     chunk_file(file_path)
         Chunk a file into semantic sections based on its type.
+    cache_key(file_path, content_hash, algorithm)
+        Build the chunk cache key for a file with the given content.
     """
 
-    def __init__(self, repo_path: Path, output_dir: Path):
+    def __init__(self, repo_path: Path, output_dir: Path, fast_python_threshold: int = 1024 * 1024, generated_patterns: list = None, max_section_words: int = 0, fallback_encoding: str = None, mmap_threshold: int = MMAP_THRESHOLD):
         self.repo_path = repo_path.resolve()
-        self.output_dir = output_dir.resolve()
-        validate_directory(self.output_dir)
+        self.output_dir = output_dir.resolve() if output_dir is not None else None
+        self.fast_python_threshold = fast_python_threshold or 0
+        self.generated_patterns = list(generated_patterns or [])
+        self.generated_spec = pathspec.PathSpec.from_lines("gitwildmatch", self.generated_patterns)
+        self.max_section_words = max_section_words or 0
+        self.fallback_encoding = fallback_encoding or None
+        self.mmap_threshold = mmap_threshold or 0
+        if self.output_dir is not None:
+            validate_directory(self.output_dir)
+
+    def is_generated(self, file_path: Path) -> bool:
+        """
+        Check whether a file matches `generated_patterns`.
+        """
+
+        if not self.generated_patterns:
+            return False
+        try:
+            relative_path = file_path.resolve().relative_to(self.repo_path).as_posix()
+        except ValueError:
+            relative_path = file_path.name
+        return self.generated_spec.match_file(relative_path)
 
-    def chunk_python_file(self, file_path: Path) -> list:
+    def chunk_python_file(self, file_path: Path, file_content: str = None) -> list:
         """
         Chunk a Python file into semantic sections, including code, functions, and comments.
+
+        If `file_content` is given it is used instead of reading the file. Functions (including async
+        functions) and classes are sliced out of the text through a line index built once per file, and
+        comments are extracted in a single regular expression pass.
+
+        Files larger than `fast_python_threshold`, files matching `generated_patterns`, and files that
+        cannot be parsed (e.g. Python 2 code or templates) are chunked with `chunk_python_fast` instead.
         """
         chunks = []
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                file_content = f.read()
+            if file_content is None:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    file_content = f.read()
+
+            if (self.fast_python_threshold and len(file_content) > self.fast_python_threshold) or self.is_generated(file_path):
+                return self.chunk_python_fast(file_content)
+            try:
+                tree = ast.parse(file_content)
+            except (SyntaxError, ValueError, RecursionError) as e:
+                logger.info(f"Falling back to fast chunking for Python file {file_path}: {e}")
+                return self.chunk_python_fast(file_content)
 
-            # Extract functions and classes using AST
-            tree = ast.parse(file_content)
+            # Extract functions and classes using AST, slicing their code out of the text with a line index
+            offsets = line_offsets(file_content)
             for node in ast.walk(tree):
-                if isinstance(node, ast.FunctionDef):
-                    func_name = node.name
-                    start_line, end_line = node.lineno, node.end_lineno
-                    code_snippet = "\n".join(file_content.splitlines()[start_line - 1:end_line])
-                    chunks.append({
-                        "type": "function",
-                        "name": func_name,
-                        "code": code_snippet
-                    })
+                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    chunks.append(Chunk(
+                        type="function",
+                        name=node.name,
+                        code=line_slice(file_content, offsets, node.lineno, node.end_lineno),
+                        start_line=node.lineno,
+                        end_line=node.end_lineno
+                    ))
                 elif isinstance(node, ast.ClassDef):
-                    class_name = node.name
-                    start_line, end_line = node.lineno, node.end_lineno
-                    code_snippet = "\n".join(file_content.splitlines()[start_line - 1:end_line])
-                    methods = []
-                    for class_node in node.body:
-                        if isinstance(class_node, ast.FunctionDef):
-                            method_name = class_node.name
-                            methods.append({
-                                "name": method_name,
-                            })
-                    chunks.append({
-                        "type": "class",
-                        "name": class_name,
-                        "methods": methods,
-                        "code": code_snippet
-                    })
-
-            # Extract inline comments using tokenize
-            tokens = tokenize.generate_tokens(StringIO(file_content).readline)
-            comments = []
-            for token in tokens:
-                if token.type == tokenize.COMMENT:
-                    line_number = token.start[0]
-                    comment_text = token.string.lstrip("#").strip()
-                    comments.append({
-                        "type": "comment",
-                        "line": line_number,
-                        "text": comment_text
-                    })
+                    methods = [
+                        {"name": class_node.name}
+                        for class_node in node.body
+                        if isinstance(class_node, (ast.FunctionDef, ast.AsyncFunctionDef))
+                    ]
+                    chunks.append(Chunk(
+                        type="class",
+                        name=node.name,
+                        methods=methods,
+                        code=line_slice(file_content, offsets, node.lineno, node.end_lineno),
+                        start_line=node.lineno,
+                        end_line=node.end_lineno
+                    ))
+
+            # Extract inline comments
+            comments = extract_python_comments(file_content, offsets)
             if comments:
-                chunks.append({"type": "comments", "comments": comments})
+                chunks.append(Chunk(type="comments", comments=comments))
 
         except Exception as e:
             logger.warning(f"Error chunking Python file {file_path}: {e}")
         return chunks
 
-    def chunk_markdown_file(self, file_path: Path) -> list:
+    def chunk_python_fast(self, file_content: str) -> list:
+        """
+        Chunk Python source into top-level functions and classes by scanning indentation, without an AST.
+
+        Parameters
+        ----------
+        file_content : str
+            The Python source code. It does not need to be valid Python.
+
+        Returns
+        -------
+        list of dict
+            Function, class and comments chunks with the same structure as `chunk_python_file`.
+
+        Notes
+        -----
+        - A definition starts at a `def`, `async def` or `class` at column 0 and extends to the last code
+          line before the next top-level statement. Trailing blank and comment lines are left out.
+        - Multi-line string literals are located first, so column-0 lines inside them are ignored.
+        - Unlike the AST chunker, nested functions and methods are not emitted as separate chunks. The methods
+          of a class are the `def`s at the smallest indentation found in its body.
+        """
+
+        offsets = line_offsets(file_content)
+        comments = []
+        string_spans = []
+        for match in PYTHON_COMMENT_PATTERN.finditer(file_content):
+            if match.group("comment") is not None:
+                comments.append({
+                    "type": "comment",
+                    "line": bisect_right(offsets, match.start()),
+                    "text": match.group("comment").lstrip("#").strip()
+                })
+            elif file_content.find("\n", match.start(), match.end()) != -1:
+                string_spans.append(match.span())
+        string_starts = [start for start, _ in string_spans]
+
+        def in_string(position):
+            index = bisect_left(string_starts, position) - 1
+            return index >= 0 and string_spans[index][1] > position
+
+        top_level = [
+            match.start() for match in PYTHON_TOP_LEVEL_PATTERN.finditer(file_content) if not in_string(match.start())
+        ]
+
+        chunks = []
+        for index, position in enumerate(top_level):
+            match = PYTHON_DEFINITION_PATTERN.match(file_content, position)
+            if not match:
+                continue
+            start_line = bisect_right(offsets, position)
+            block_end = top_level[index + 1] if index + 1 < len(top_level) else len(file_content)
+            end_line = bisect_right(offsets, block_end - 1)
+            while end_line > start_line:
+                last_line = file_content[offsets[end_line - 1]:block_end].strip()
+                if last_line and not last_line.startswith("#"):
+                    break
+                block_end = offsets[end_line - 1]
+                end_line -= 1
+            code = line_slice(file_content, offsets, start_line, end_line)
+
+            if match.group(1) is not None:
+                chunks.append(Chunk(
+                    type="function", name=match.group(1), code=code, start_line=start_line, end_line=end_line
+                ))
+            else:
+                block_start, block_end = offsets[start_line - 1], offsets[start_line - 1] + len(code)
+                body_indent = min(
+                    (
+                        len(line.group(1))
+                        for line in PYTHON_INDENTED_CODE_PATTERN.finditer(file_content, block_start, block_end)
+                        if not in_string(line.start())
+                    ),
+                    default=0
+                )
+                methods = [
+                    {"name": method.group(2)}
+                    for method in PYTHON_INDENTED_DEF_PATTERN.finditer(file_content, block_start, block_end)
+                    if len(method.group(1)) == body_indent and not in_string(method.start())
+                ]
+                chunks.append(Chunk(
+                    type="class", name=match.group(2), methods=methods, code=code,
+                    start_line=start_line, end_line=end_line
+                ))
+
+        if comments:
+            chunks.append(Chunk(type="comments", comments=comments))
+        return chunks
+
+    def chunk_markdown_file(self, file_path: Path, file_content: str = None) -> list:
         """
         Chunk a Markdown file into sections based on headers.
 
@@ -315,6 +802,9 @@ class FileProcessor:
         ----------
         file_path : pathlib.Path
             The path to the Markdown file to be chunked.
+        file_content : str, optional
+            The already decoded content of the file, as passed by `analyze_data`. If omitted, the file is read
+            line by line from disk, but the chunks are still returned as a list.
 
         Returns
         -------
@@ -327,32 +817,119 @@ class FileProcessor:
         - 'type': Always 'markdown'
         - 'header': The header text (e.g., '# Title').
         - 'content': The content under the header.
+        - 'start_line', 'end_line': The 1-based line span of the section, including its header.
+        - 'part': Only present when a section was split because of `max_section_words`; the 1-based part number.
+
+        See `iter_markdown_chunks` for how sections are delimited.
         """
 
         chunks = []
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-    
-            current_chunk = {"type": "markdown", "header": None, "content": ""}
-            for line in lines:
-                if line.startswith("#"):  # Header
-                    if current_chunk["header"] or current_chunk["content"]:
-                        # Clean HTML content before adding chunk
-                        current_chunk["content"] = clean_html_content(current_chunk["content"])
-                        chunks.append(current_chunk)
-                    current_chunk = {"type": "markdown", "header": line.strip(), "content": ""}
-                else:
-                    current_chunk["content"] += line
-            if current_chunk["header"] or current_chunk["content"]:
-                # Clean HTML content for the last chunk
-                current_chunk["content"] = clean_html_content(current_chunk["content"])
-                chunks.append(current_chunk)
+            if file_content is None:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    chunks = list(self.iter_markdown_chunks(f))
+            else:
+                chunks = list(self.iter_markdown_chunks(StringIO(file_content)))
         except Exception as e:
             logger.warning(f"Error chunking Markdown file {file_path}: {e}")
         return chunks
 
-    def chunk_file(self, file_path: Path) -> list:
+    def iter_markdown_chunks(self, lines):
+        """
+        Split Markdown lines into sections based on headers, lazily.
+
+        Parameters
+        ----------
+        lines : iterable of str
+            The lines of the document, with their line endings, e.g. an open file.
+
+        Yields
+        ------
+        dict
+            One chunk per section, as described in `chunk_markdown_file`.
+
+        Notes
+        -----
+        - Lines are consumed one at a time and each section body is collected in a list that is joined
+          once, so the cost is linear in the document size. Only the section builder is lazy: `chunk_markdown_file`
+          collects the chunks in a list, and `analyze_data` decodes the whole document before chunking it, so
+          the document and all its chunks are in memory at once and peak memory grows with the document size.
+        - Lines inside ``` or ~~~ fenced code blocks are never treated as headers, so comments in code
+          examples do not split sections.
+        - If `max_section_words` is set, a section is split into parts once it reaches that many words:
+          at the next blank line outside a code block, or unconditionally at twice the limit. A part split
+          inside a code block is closed with its fence, and the next part reopens it with the same fence line,
+          so every part stays valid Markdown. This bounds the size of each chunk, not the memory of the run.
+        """
+
+        header = None
+        body = []
+        body_words = 0
+        part = 0
+        fence = fence_line = reopen = None
+        start_line = line_number = 1
+        for line_number, line in enumerate(lines, 1):
+            fence_match = MARKDOWN_FENCE_PATTERN.match(line)
+            if fence is None:
+                if fence_match:
+                    fence, fence_line = fence_match.group(1), line
+                elif line.startswith("#"):  # Header
+                    if body or (header and not part):
+                        yield self.markdown_chunk(header, body, part + 1 if part else 0, start_line, line_number - 1)
+                    header, body, body_words, part = line.strip(), [], 0, 0
+                    start_line = line_number
+                    continue
+            elif (
+                fence_match
+                and fence_match.group(1)[0] == fence[0]
+                and len(fence_match.group(1)) >= len(fence)
+                and not fence_match.group(2).strip()
+            ):
+                fence = None
+                if reopen is not None:
+                    # The previous part already ended with this fence
+                    reopen = None
+                    start_line = line_number + 1
+                    continue
+
+            if reopen is not None:
+                body.append(reopen)
+                body_words = len(reopen.split())
+                reopen = None
+            body.append(line)
+            if self.max_section_words:
+                body_words += len(line.split())
+                if body_words >= self.max_section_words and (
+                    (fence is None and not line.strip()) or body_words >= 2 * self.max_section_words
+                ):
+                    part += 1
+                    if fence is not None:
+                        body.append(("" if line.endswith("\n") else "\n") + fence + "\n")
+                    yield self.markdown_chunk(header, body, part, start_line, line_number)
+                    body, body_words = [], 0
+                    if fence is not None:
+                        reopen = fence_line if fence_line.endswith("\n") else fence_line + "\n"
+                    start_line = line_number + 1
+
+        if body or (header and not part):
+            yield self.markdown_chunk(header, body, part + 1 if part else 0, start_line, line_number)
+
+    def markdown_chunk(self, header: str, body: list, part: int = 0, start_line: int = None, end_line: int = None) -> Chunk:
+        """
+        Build a Markdown chunk from a header and the lines of its section, cleaning HTML from the content.
+        """
+
+        fields = {"part": part} if part else {}
+        return Chunk(
+            type="markdown",
+            header=header,
+            content=clean_html_content("".join(body)),
+            start_line=start_line,
+            end_line=end_line,
+            **fields
+        )
+
+    def chunk_file(self, file_path: Path, file_content: str = None) -> list:
         """
         Chunk a file into semantic sections based on its type.
 
@@ -360,6 +937,8 @@ class FileProcessor:
         ----------
         file_path : pathlib.Path
             The path to the file to be chunked.
+        file_content : str, optional
+            The already decoded content of the file. If omitted, the file is read from disk.
 
         Returns
         -------
@@ -373,124 +952,520 @@ class FileProcessor:
         """
 
         if file_path.suffix == ".py":
-            return self.chunk_python_file(file_path)
+            return self.chunk_python_file(file_path, file_content)
         elif file_path.suffix in [".md", ".markdown"]:
-            return self.chunk_markdown_file(file_path)
+            return self.chunk_markdown_file(file_path, file_content)
         else:
             try:
-                return [{
-                    "type": "file",
-                    "name": file_path.name,
-                    "content": file_path.read_text(encoding="utf-8")
-                }]
+                if file_content is None:
+                    file_content = file_path.read_text(encoding="utf-8")
+                return [Chunk(type="file", name=file_path.name, content=file_content)]
             except Exception as e:
                 logger.warning(f"Error reading file {file_path}: {e}")
                 return []
 
-class RepoContentProcessor:
-    """
-    Class for processing an entire repository.
+    def cache_key(self, file_path: Path, content_hash: str, algorithm: str) -> str:
+        """
+        Build the chunk cache key for a file with the given content.
 
-    This class orchestrates file-level processing, manages metadata, and saves the results to disk.
+        Parameters
+        ----------
+        file_path : pathlib.Path
+            The path to the file. Only the parts that influence chunking are used: the extension,
+            whether it is a generated Python file, and the file name for files chunked as a whole.
+        content_hash : str
+            The hash of the file content.
+        algorithm : str
+            The hashlib algorithm that produced `content_hash`.
 
-    Attributes
+        Notes
+        -----
+        A `fallback_encoding` is part of the key, since it changes how files that are not UTF-8 are decoded.
+
+        Returns
+        -------
+        str
+            The key under which the file's chunks are cached.
+        """
+
+        if file_path.suffix == ".py":
+            mode = "generated" if self.is_generated(file_path) else "auto"
+            chunker_key = f"python:{mode}:{self.fast_python_threshold}"
+        elif file_path.suffix in [".md", ".markdown"] or is_documentation_file(file_path):
+            chunker_key = f"markdown:{self.max_section_words}"
+        else:
+            chunker_key = f"file:{file_path.name}"
+        if self.fallback_encoding:
+            chunker_key += f":{self.fallback_encoding}"
+        return chunk_cache_key(content_hash, algorithm, chunker_key, CHUNKER_VERSION)
+
+def chunk_word_count(chunk: dict) -> int:
+    """
+    Count the words of a chunk.
+
+    Parameters
     ----------
-    repo_path : pathlib.Path
-        The path to the repository being processed.
-    output_dir : pathlib.Path
-        The directory where processed output will be saved.
-    max_words : int
-        The maximum number of words allowed per output chunk.
-    max_file_size : int
-        The maximum file size (in bytes) for processing.
-    skip_patterns : list of str
-        Patterns for files to skip.
-    skip_dirs : list of str
-        Directory names to skip.
-    ignore_patterns : pathspec.PathSpec
-        Compiled patterns for ignoring files.
-    current_word_count : int
-        The current word count for the current chunk.
-    content : str
-        The current content being accumulated for a chunk.
-    hashes : dict
-        Cached file hashes to avoid reprocessing unchanged files.
-    file_counter : collections.defaultdict
-        Counter for output files by type.
-    metadata : dict
-        Metadata about processed and skipped files.
+    chunk : pyragify.chunk.Chunk or dict
+        A chunk as produced by `FileProcessor`, or a plain dict with the same keys.
 
-    Methods
+    Returns
     -------
-    load_ignore_patterns()
-        Load ignore patterns from .gitignore and .dockerignore files.
-    should_skip(file_path)
-        Determine if a file or directory should be skipped.
-    save_chunk(chunk, subdir)
-        Save a chunk of content to a file.
-    save_content(subdir)
-        Save the accumulated content to a file.
-    process_file(file_path)
-        Process a single file, chunking and saving its content.
-    process_repo()
-        Process all files in the repository.
-    get_file_type_subdir(file_path)
-        Determine the output subdirectory for a file based on its type.
+    int
+        The number of whitespace-separated words in the chunk's code, content or comment texts.
+        Precomputed for `Chunk` records.
     """
 
-    def __init__(self, repo_path: Path, output_dir: Path, max_words: int = 200000, max_file_size: int = 10 * 1024 * 1024, skip_patterns: list = None, skip_dirs: list = None, split_on_files: bool = False):
-        self.repo_path = repo_path.resolve()
-        self.output_dir = output_dir.resolve()
-        self.max_words = max_words
-        self.max_file_size = max_file_size
-        self.skip_patterns = skip_patterns or [".git"]
+    if isinstance(chunk, Chunk):
+        return chunk.word_count
+    chunk_type = chunk.get("type", "unknown")
+    if chunk_type == "comments":
+        return sum(len(c["text"].split()) for c in chunk.get("comments", []))
+    elif chunk_type == "function" or chunk_type == "class":
+        return len(chunk.get("code", "").split())
+    elif chunk_type == "file" or chunk_type == "markdown" or chunk_type == "duplicate":
+        return len(chunk.get("content", "").split())
+    else:
+        return 0
+
+def chunk_token_count(chunk: dict) -> int:
+    """
+    Get the approximate token count of a chunk, see `pyragify.chunk.approximate_token_count`.
+    """
+
+    if isinstance(chunk, Chunk):
+        return chunk.token_count
+    return Chunk.from_dict(chunk).token_count
+
+def chunk_line_span(chunk: dict) -> tuple:
+    """
+    Get the line span of a chunk in its source file.
+
+    Parameters
+    ----------
+    chunk : dict
+        A chunk as produced by `FileProcessor`.
+
+    Returns
+    -------
+    tuple of (int, int)
+        The 1-based first and last line of the chunk, or (None, None) if unknown.
+    """
+
+    chunk_type = chunk.get("type", "unknown")
+    if chunk_type == "comments":
+        lines = [c["line"] for c in chunk.get("comments", [])]
+        return (min(lines), max(lines)) if lines else (None, None)
+    elif chunk_type == "file":
+        return 1, max(1, count_lines(chunk.get("content", "")))
+    return chunk.get("start_line"), chunk.get("end_line")
+
+def analyze_file(file_processor: "FileProcessor", file_path: Path, known_hash: str = None, documentation: bool = False, algorithm: str = "md5", cache_dir: Path = None) -> dict:
+    """
+    Hash and chunk a single file without touching any shared state.
+
+    Parameters
+    ----------
+    file_processor : FileProcessor
+        The file processor used to chunk the file.
+    file_path : pathlib.Path
+        The path to the file to analyze.
+    known_hash : str, optional
+        The hash recorded for this file by a previous run. Without a chunk cache, the file is not chunked
+        if the current hash matches.
+    documentation : bool, optional
+        If true, the file is chunked as Markdown whatever its extension.
+    algorithm : str, optional
+        The hashlib algorithm used for the content hash. Default is "md5".
+    cache_dir : pathlib.Path, optional
+        The chunk cache directory. If the file's content is cached there, its chunks are loaded instead
+        of parsing the file, and the result has 'cached' set to True.
+
+    Returns
+    -------
+    dict
+        A result with the keys 'chunks' and, for non-documentation files, 'hash', 'size', 'lines', 'encoding' and
+        'error' when they could be determined, or 'rejected' if the file is not text.
+
+    Notes
+    -----
+    This function is the unit of work for parallel processing: it is picklable, runs in worker processes,
+    and leaves all output and metadata bookkeeping to `RepoContentProcessor.record_file`.
+
+    Only the first `SNIFF_SIZE` bytes are read before `sniff_encoding` decides whether the file is text; binary
+    files and text in an unsupported encoding are rejected with the reason under 'rejected', without being read
+    in full or hashed. Text files are read once; hashing, decoding, line counting and chunking all work on
+    that single buffer (see `analyze_data`). Files of at least `file_processor.mmap_threshold` bytes are
+    memory-mapped rather than read, so hashing and decoding work on the page cache directly and the file
+    is never copied into a bytes object. The mapping is closed before returning. The time spent in each of
+    these stages is returned under 'timings' so the parent process can add it to the run's `StageMetrics`.
+    """
+
+    timings = {}
+    start = time.perf_counter()
+    try:
+        with open(file_path, "rb") as f:
+            sample = f.read(SNIFF_SIZE)
+            timings["reading"] = time.perf_counter() - start
+            start = time.perf_counter()
+            encoding, reason = sniff_encoding(sample, file_processor.fallback_encoding, complete=len(sample) < SNIFF_SIZE)
+            timings["sniffing"] = time.perf_counter() - start
+            if encoding is None:
+                return {"chunks": [], "timings": timings, "hash": None, "rejected": reason}
+            start = time.perf_counter()
+            mapping = None
+            if len(sample) < SNIFF_SIZE:
+                data = sample
+            else:
+                mmap_threshold = file_processor.mmap_threshold
+                if mmap_threshold and os.fstat(f.fileno()).st_size >= mmap_threshold:
+                    mapping = map_file(f)
+                if mapping is None:
+                    f.seek(0)
+                    data = f.read()
+                else:
+                    data = mapping
+    except Exception as e:
+        logger.error(f"Error computing hash for {file_path}: {e}")
+        return {"chunks": [], "timings": {}, "hash": None}
+    timings["reading"] += time.perf_counter() - start
+
+    try:
+        result = analyze_data(file_processor, file_path, data, known_hash, documentation, algorithm, cache_dir, encoding=encoding)
+    finally:
+        if mapping is not None:
+            mapping.close()
+    result["timings"].update(timings)
+    return result
+
+def analyze_data(file_processor: "FileProcessor", file_path: Path, data: bytes, known_hash: str = None, documentation: bool = False, algorithm: str = "md5", cache_dir: Path = None, content_hash: str = None, encoding: str = None) -> dict:
+    """
+    Hash and chunk the content of a file that was already read.
+
+    Parameters
+    ----------
+    file_processor : FileProcessor
+        The file processor used to chunk the file.
+    file_path : pathlib.Path
+        The path of the file, which decides how it is chunked. It is not read.
+    data : bytes or mmap.mmap
+        The raw content of the file.
+    known_hash, documentation, algorithm, cache_dir
+        See `analyze_file`.
+    content_hash : str, optional
+        The hash of `data` if it is already known, such as a git blob id. The data is then not hashed again.
+    encoding : str, optional
+        The encoding of `data` if it was already sniffed. Otherwise `sniff_encoding` checks its first bytes first.
+
+    Returns
+    -------
+    dict
+        The same result as `analyze_file`, without the 'reading' timing.
+
+    Notes
+    -----
+    `sniff_encoding` only sees the first `SNIFF_SIZE` bytes. If a file sniffed as UTF-8 turns out not to be
+    UTF-8 further on, it is decoded with `file_processor.fallback_encoding`, or rejected as 'Not UTF-8 text'
+    if none is set. The encoding actually used is returned under 'encoding'.
+    """
+
+    timings = {}
+    result = {"chunks": [], "timings": timings}
+    if encoding is None:
+        start = time.perf_counter()
+        encoding, reason = sniff_encoding(data[:SNIFF_SIZE], file_processor.fallback_encoding, complete=len(data) <= SNIFF_SIZE)
+        timings["sniffing"] = time.perf_counter() - start
+        if encoding is None:
+            result.update(hash=None, rejected=reason)
+            return result
+    try:
+        start = time.perf_counter()
+        current_hash = content_hash or hashlib.new(algorithm, data).hexdigest()
+        result["hash"] = current_hash
+        if content_hash is None:
+            timings["hashing"] = time.perf_counter() - start
+        if cache_dir is not None:
+            start = time.perf_counter()
+            cached = load_entry(cache_dir, file_processor.cache_key(file_path, current_hash, algorithm))
+            timings["cache"] = time.perf_counter() - start
+            if cached is not None:
+                result.update(cached, cached=True)
+                return result
+        elif current_hash == known_hash and not documentation:
+            return result
+
+        start = time.perf_counter()
+        try:
+            text = decode_text(data, encoding)
+        except UnicodeDecodeError:
+            # Only the start of the file was sniffed, so invalid UTF-8 may come later
+            if encoding != "utf-8":
+                raise
+            if not file_processor.fallback_encoding:
+                timings["decoding"] = time.perf_counter() - start
+                result["rejected"] = "Not UTF-8 text"
+                return result
+            encoding = file_processor.fallback_encoding
+            text = decode_text(data, encoding)
+        timings["decoding"] = time.perf_counter() - start
+        result["encoding"] = encoding
+        start = time.perf_counter()
+        if documentation:
+            result["chunks"] = file_processor.chunk_markdown_file(file_path, text)
+        else:
+            result["chunks"] = file_processor.chunk_file(file_path, text)
+        timings["chunking"] = time.perf_counter() - start
+        result["size"] = len(data)
+        result["lines"] = count_lines(text)
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+class RepoContentProcessor:
+    """
+    Class for processing an entire repository.
+
+    This class orchestrates file-level processing, manages metadata, and saves the results to disk.
+
+    Attributes
+    ----------
+    repo_path : pathlib.Path
+        The path to the repository being processed.
+    output_dir : pathlib.Path or None
+        The directory where processed output will be saved. May be None when chunks are only consumed
+        through `iter_chunks`, in which case nothing is written to disk.
+    max_words : int
+        The maximum number of words allowed per output chunk.
+    max_tokens : int
+        The maximum approximate number of tokens allowed per output chunk, checked alongside `max_words`.
+        0 disables the token budget.
+    max_file_size : int
+        The maximum file size (in bytes) for processing.
+    skip_patterns : list of str
+        Patterns for files to skip.
+    skip_dirs : list of str
+        Directory names to skip.
+    binary_extensions : set of str
+        Lowercase extensions of binary files, which are skipped without being opened. Defaults to `BINARY_EXTENSIONS`.
+    split_on_files : bool
+        If true, each source file is saved to its own output file.
+    workers : int
+        Number of worker processes used to hash and chunk files. 1 processes files serially.
+    hash_algorithm : str
+        The hashlib algorithm used for content hashes in `hashes.json`, or `GIT_HASH_ALGORITHM` in git mode.
+    git : pyragify.git.GitRepository or None
+        In git mode, reads the files of `git_rev` from the object database instead of the working tree.
+    git_rev : str or None
+        The commit whose files are processed in git mode. None processes the working tree.
+    git_base_rev : str or None
+        In git mode, only files changed between this commit and `git_rev` are processed.
+    paranoid : bool
+        If true, files are always hashed, even when their stat signature is unchanged.
+    chunk_cache : pyragify.cache.ChunkCache or None
+        Cache of chunks keyed by file content, so unchanged files are emitted without being parsed.
+        None if the cache is disabled, in which case unchanged files are left out of the output. A cache
+        passed to the constructor may be shared with other processors, e.g. in a batch, and is saved by its owner.
+    executor : concurrent.futures.ProcessPoolExecutor or None
+        A process pool shared with other processors, used instead of starting one per run when `workers`
+        is above 1. It is left running at the end of a run.
+    stable_output : bool
+        If true, the walk is sorted and source files keep their output file across runs (see
+        `save_stable_output`), so only output files whose members changed are rewritten.
+    deduplicate : bool
+        If true, a file whose content was already emitted in this run, and a function or class whose code was,
+        is replaced by a short 'duplicate' chunk referring to its first occurrence, see `deduplicate_chunks`.
+        Not supported with `stable_output`.
+    seen_files : dict
+        With `deduplicate`, the relative path of the first file emitted with each content hash.
+    seen_definitions : dict
+        With `deduplicate`, the path and name of the first function or class emitted with each code digest.
+    file_processor : FileProcessor
+        Chunks individual files. `fast_python_threshold`, `generated_patterns`, `max_section_words`,
+        `fallback_encoding` and `mmap_threshold` are passed on to it. Files that are not text are rejected by it, see `sniff_encoding`.
+    stable_files : dict
+        In stable packing mode, the subdirectory, hash and word count of every source file seen in this run.
+    output_format : str
+        'text' writes formatted `chunk_N.txt` files. 'jsonl' writes `chunk_N.jsonl` files with one chunk record
+        per line and a `chunk_index.json` mapping each chunk id to its output file, byte offset and length.
+    chunk_index : dict
+        In JSONL mode, the location of every chunk written so far, keyed by chunk id.
+    metrics : pyragify.metrics.StageMetrics
+        Time spent in each stage of the run (walk, ignore matching, reading, sniffing, hashing, decoding, chunking,
+        formatting, writing, flushing), saved in the 'metrics' section of `metadata.json`.
+    profile : bool
+        If true, `process_repo` runs under cProfile and saves the statistics to `profile.pstats` in the output directory.
+    ignore_patterns : pyragify.ignore.IgnoreRules
+        Hierarchical ignore rules from the `.gitignore` files of the repository, `.dockerignore` and `skip_patterns`.
+    current_word_count : int
+        The current word count for the current chunk.
+    writer : pyragify.writer.ChunkWriter or pyragify.pack.PackWriter
+        Streams the content of the current output file to disk as it is accumulated. With `pack_output`, output
+        files are members of a single pack file compressed with `pack_compression` ('none', 'gzip' or 'lzma'),
+        listed with their source files in `pack_index.json`, instead of separate files.
+    background_writer : pyragify.writer.BackgroundWriter
+        Writes output files, `hashes.json` and `metadata.json` on a separate thread, so chunking overlaps with
+        disk writes. Its queue holds at most `write_queue_size` batches; with 0, writes are synchronous. With
+        `fsync_output`, the written files are fsynced once at the end of the run.
+    hashes : dict
+        Manifest of file hashes and stat signatures from the previous run, keyed by relative path.
+        Used to avoid reading and reprocessing unchanged files.
+    file_counter : collections.defaultdict
+        Counter for output files by type.
+    metadata : dict
+        Metadata about processed and skipped files.
+
+    Methods
+    -------
+    load_ignore_patterns()
+        Load ignore rules from .gitignore and .dockerignore files.
+    should_skip(file_path, entry, relative_path)
+        Determine if a file or directory should be skipped.
+    walk_repo()
+        Walk the repository once, without entering skipped directories.
+    iter_git_files()
+        List the files of `git_rev` that are not skipped, in git mode.
+    save_chunk(chunk, subdir)
+        Save a chunk of content to a file.
+    save_content(subdir)
+        Save the accumulated content to a file.
+    process_file(file_path)
+        Process a single file, chunking and saving its content.
+    record_file(file_path, result, documentation)
+        Save the chunks of an analyzed file and update metadata and hashes.
+    process_repo()
+        Process all files in the repository, optionally under cProfile.
+    run_pipeline()
+        Run the steps of `process_repo`.
+    update_files(paths)
+        Re-chunk only the given files and rewrite the output files that contain them.
+    iter_chunks()
+        Lazily yield a record for every chunk of the repository, without writing output.
+    save_stable_output()
+        Write the output files of a stable packing run.
+    deduplicate_chunks(relative_path, content_hash, chunks)
+        Replace the chunks of a file that were already emitted in this run by references.
+    get_file_type_subdir(file_path)
+        Determine the output subdirectory for a file based on its type.
+    """
+
+    def __init__(self, repo_path: Path, output_dir: Path, max_words: int = 200000, max_file_size: int = 10 * 1024 * 1024, skip_patterns: list = None, skip_dirs: list = None, split_on_files: bool = False, workers: int = 1, hash_algorithm: str = "md5", paranoid: bool = False, chunk_cache_size: int = 256 * 1024 * 1024, stable_output: bool = False, fast_python_threshold: int = 1024 * 1024, generated_patterns: list = None, max_section_words: int = 0, output_format: str = "text", max_tokens: int = 0, profile: bool = False, git_rev: str = None, git_base_rev: str = None, binary_extensions: list = None, fallback_encoding: str = None, mmap_threshold: int = MMAP_THRESHOLD, write_queue_size: int = 64, fsync_output: bool = False, pack_output: bool = False, pack_compression: str = "gzip", executor: ProcessPoolExecutor = None, chunk_cache: ChunkCache = None, deduplicate: bool = False):
+        self.repo_path = repo_path.resolve()
+        self.output_dir = output_dir.resolve() if output_dir is not None else None
+        self.max_words = max_words
+        self.max_tokens = max_tokens or 0
+        self.max_file_size = max_file_size
+        self.skip_patterns = skip_patterns or [".git"]
         self.skip_dirs = skip_dirs or ["node_modules", "__pycache__"]
+        self.binary_extensions = {
+            extension.lower() for extension in (BINARY_EXTENSIONS if binary_extensions is None else binary_extensions)
+        }
         self.split_on_files = split_on_files
+        self.workers = max(1, workers or 1)
+        if hash_algorithm not in HASH_ALGORITHMS:
+            raise ValueError(f"Unsupported hash algorithm {hash_algorithm!r}, expected one of {HASH_ALGORITHMS}")
+        self.hash_algorithm = hash_algorithm
+        self.git = GitRepository(self.repo_path) if git_rev else None
+        if git_base_rev and self.git is None:
+            raise ValueError("git_base_rev requires git_rev")
+        self.git_rev = self.git.resolve_revision(git_rev) if self.git is not None else None
+        self.git_base_rev = self.git.resolve_revision(git_base_rev) if git_base_rev else None
+        if self.git is not None:
+            self.hash_algorithm = GIT_HASH_ALGORITHM
+        self.skipped_git_dirs = {}
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format {output_format!r}, expected one of {OUTPUT_FORMATS}")
+        self.output_format = output_format
+        self.chunk_index = {}
+        self.pending_index = []
+        self.pending_sources = {}
+        self.index_files = {}
+        self.metrics = StageMetrics()
+        self.profile = profile
+        self.record_path = None
+        self.record_number = 0
+        self.paranoid = paranoid
         self.ignore_patterns = self.load_ignore_patterns()
         self.current_word_count = 0
-        self.content = ""
+        self.current_token_count = 0
+        self.background_writer = BackgroundWriter(write_queue_size, fsync_output)
+        if self.output_dir is None:
+            self.writer = None
+        elif pack_output:
+            self.writer = PackWriter(self.output_dir, pack_compression, append=stable_output, background=self.background_writer)
+        else:
+            self.writer = ChunkWriter(self.output_dir, background=self.background_writer)
         self.current_file_path = None  # Track current file being processed
-        self.hashes = load_json(self.output_dir / "hashes.json", "hashes")
+        self.hashes, self.previous_run_ns = (
+            load_hash_manifest(self.output_dir / "hashes.json", self.hash_algorithm)
+            if self.output_dir is not None else ({}, 0)
+        )
+        self.run_started_ns = time.time_ns()
         self.file_counter = defaultdict(int)
         self.metadata = {
             "processed_files": [],
             "skipped_files": [],
-            "summary": {"total_files_processed": 0, "total_words": 0}
+            "summary": {"total_files_processed": 0, "total_words": 0, "total_tokens": 0, "cached_files": 0}
         }
-        self.file_processor = FileProcessor(self.repo_path, self.output_dir)
-        validate_directory(self.output_dir)
-
-    def load_ignore_patterns(self) -> pathspec.PathSpec:
+        self.file_processor = FileProcessor(
+            self.repo_path, self.output_dir, fast_python_threshold, generated_patterns, max_section_words, fallback_encoding,
+            mmap_threshold
+        )
+        if self.output_dir is not None:
+            validate_directory(self.output_dir)
+        self.stable_output = stable_output
+        self.stable_files = {}
+        if deduplicate and stable_output:
+            raise ValueError("deduplicate is not supported with stable_output")
+        self.deduplicate = deduplicate
+        self.seen_files = {}
+        self.seen_definitions = {}
+        if deduplicate:
+            self.metadata["summary"]["deduplication"] = {
+                "duplicate_files": 0, "duplicate_definitions": 0, "words_saved": 0, "tokens_saved": 0
+            }
+        self.shared_chunk_cache = chunk_cache is not None
+        self.chunk_cache = chunk_cache if chunk_cache is not None else (
+            ChunkCache(self.output_dir / ".cache" / "chunks", chunk_cache_size)
+            if chunk_cache_size and self.output_dir is not None else None
+        )
+        self.executor = executor
+
+    def load_ignore_patterns(self) -> IgnoreRules:
         """
         Load patterns from .gitignore and .dockerignore files if they exist.
 
         Returns
         -------
-        pathspec.PathSpec
-            A compiled PathSpec object containing all ignore patterns.
+        pyragify.ignore.IgnoreRules
+            The hierarchical ignore rules of the repository. The top-level ignore files are read now, and the
+            `.gitignore` files of subdirectories are read as the walk reaches them.
 
         Notes
         -----
-        Additional patterns provided via `skip_patterns` are also included. 
-        If the ignore files are missing, only the additional patterns are used.
+        Additional patterns provided via `skip_patterns` are also included, and take precedence over negated
+        patterns of the ignore files. If the ignore files are missing, only the additional patterns are used.
+        In git mode, files listed by git are tracked and therefore not ignored by `.gitignore`, so only
+        `.dockerignore` is read, from `git_rev` rather than from the working tree.
         """
 
         ignore_patterns = []
 
-        for ignore_file in [".gitignore", ".dockerignore"]:
+        if self.git is not None:
+            content = self.git.read_file(self.git_rev, ".dockerignore")
+            if content is not None:
+                logger.info(f"Loading ignore patterns from .dockerignore at {self.git_rev}")
+                ignore_patterns.extend(content.decode("utf-8", errors="replace").splitlines())
+
+        for ignore_file in ([".gitignore", ".dockerignore"] if self.git is None else []):
             file_path = self.repo_path / ignore_file
             if file_path.exists():
                 logger.info(f"Loading ignore patterns from {ignore_file}")
                 with open(file_path, "r", encoding="utf-8") as f:
                     ignore_patterns.extend(f.readlines())
 
-        # Add additional skip_patterns
-        ignore_patterns.extend(self.skip_patterns)
+        # Compile patterns, with skip_patterns checked first
+        return IgnoreRules(self.repo_path, ignore_patterns, self.skip_patterns, nested=self.git is None)
 
-        # Compile patterns using pathspec
-        return pathspec.PathSpec.from_lines("gitwildmatch", ignore_patterns)
-
-    def should_skip(self, file_path: Path) -> bool:
+    def should_skip(self, file_path: Path, entry: os.DirEntry = None, relative_path: str = None, record: bool = True) -> bool:
         """
         Determine if a file or directory should be skipped based on patterns.
 
@@ -498,6 +1473,14 @@ class RepoContentProcessor:
         ----------
         file_path : pathlib.Path
             The path to the file or directory to check.
+        entry : os.DirEntry, optional
+            The directory entry for `file_path`, as produced by `os.scandir`. When given, its cached
+            type and stat information are used instead of new system calls.
+        relative_path : str, optional
+            The POSIX path of `file_path` relative to the repository root. Computed if omitted.
+        record : bool, optional
+            If true (default), skipped binary and oversized files are added to `metadata["skipped_files"]`.
+            Checks that are not part of a run, such as the scans of watch mode, pass False.
 
         Returns
         -------
@@ -506,78 +1489,339 @@ class RepoContentProcessor:
 
         Notes
         -----
-        This method checks against ignore patterns and explicit directory or file size limits.
+        This method checks against ignore patterns, explicit directory or file size limits, and the extensions
+        of binary formats, so that such files are never opened.
+        Directories are matched with a trailing slash so that directory-only patterns such as `build/` apply.
+        Patterns come from the `.gitignore` of every directory above the path, the deepest matching one winning
+        as in git, and the decision for each directory is cached for its whole subtree.
         """
 
+        if relative_path is None:
+            relative_path = file_path.relative_to(self.repo_path).as_posix()
+        if entry is not None:
+            is_dir = entry.is_dir()
+            is_file = not is_dir and entry.is_file()
+        else:
+            is_dir = file_path.is_dir()
+            is_file = not is_dir and file_path.is_file()
+
         # Check if the path matches .gitignore or .dockerignore patterns
-        relative_path = file_path.relative_to(self.repo_path)
-        if self.ignore_patterns.match_file(str(relative_path)):
+        if self.ignore_patterns.is_ignored(relative_path, is_dir):
             logger.info(f"Skipping {relative_path} due to ignore pattern.")
             return True
 
         # Skip directories explicitly listed
-        if file_path.is_dir() and file_path.name in self.skip_dirs:
+        if is_dir and file_path.name in self.skip_dirs:
             logger.info(f"Skipped directory: {file_path}")
             return True
 
-        # Skip large files
-        if file_path.is_file() and file_path.stat().st_size > self.max_file_size:
+        # Skip large files and binary formats
+        if is_file:
+            if file_path.suffix.lower() in self.binary_extensions:
+                if not record:
+                    return True
+                self.metadata["skipped_files"].append({
+                    "path": str(file_path),
+                    "reason": "Binary file extension"
+                })
+                logger.info(f"Skipped binary file: {file_path}")
+                return True
+            size = entry.stat().st_size if entry is not None else file_path.stat().st_size
+            if size > self.max_file_size:
+                if not record:
+                    return True
+                self.metadata["skipped_files"].append({
+                    "path": str(file_path),
+                    "reason": "File exceeds size limit"
+                })
+                logger.info(f"Skipped file due to size: {file_path}")
+                return True
+
+        return False
+
+    def walk_repo(self, start: Path = None, record: bool = True):
+        """
+        Walk the repository in a single pass, pruning skipped directories.
+
+        Parameters
+        ----------
+        start : pathlib.Path, optional
+            A directory of the repository to walk instead of the whole repository. The caller is responsible
+            for checking that it is not itself skipped, see `is_excluded`.
+        record : bool, optional
+            If false, skipped files are not added to the metadata, see `should_skip`.
+
+        Yields
+        ------
+        tuple of (pathlib.Path, os.DirEntry)
+            The path and directory entry of every file that is not skipped.
+
+        Notes
+        -----
+        The walk is built on `os.scandir`, so entry types and stat results are cached on the `DirEntry`.
+        Directories rejected by `should_skip` (ignore patterns or `skip_dirs`) are never entered, and
+        symbolic links to directories are not followed. Directories are visited depth-first in the same
+        order as `Path.rglob`; with `stable_output`, entries are sorted by name so the order is deterministic.
+        """
+
+        if start is None or start == self.repo_path:
+            stack = [(self.repo_path, "")]
+        else:
+            stack = [(start, start.relative_to(self.repo_path).as_posix() + "/")]
+        while stack:
+            dir_path, prefix = stack.pop()
+            start = time.perf_counter()
+            try:
+                with os.scandir(dir_path) as it:
+                    entries = list(it)
+            except OSError as e:
+                logger.warning(f"Error reading directory {dir_path}: {e}")
+                continue
+            self.metrics.add("walk", time.perf_counter() - start, prefix or ".")
+
+            subdirs = []
+            if self.stable_output:
+                entries.sort(key=lambda e: e.name)
+            for entry in entries:
+                file_path = Path(entry.path)
+                relative_path = prefix + entry.name
+                start = time.perf_counter()
+                skip = self.should_skip(file_path, entry, relative_path, record)
+                self.metrics.add("ignore", time.perf_counter() - start, relative_path)
+                if skip:
+                    continue
+                if entry.is_dir():
+                    if not entry.is_symlink():
+                        subdirs.append((file_path, relative_path + "/"))
+                elif entry.is_file():
+                    yield file_path, entry
+            stack.extend(reversed(subdirs))
+
+    def is_excluded(self, file_path: Path, record: bool = True) -> bool:
+        """
+        Check whether `walk_repo` would leave a path out, because it or one of its parent directories is skipped.
+
+        Parameters
+        ----------
+        file_path : pathlib.Path
+            An absolute path inside the repository. It does not need to exist.
+        record : bool, optional
+            If false, a skipped file is not added to the metadata, see `should_skip`.
+
+        Returns
+        -------
+        bool
+            True if the path or one of its parents matches an ignore pattern or `skip_dirs`, or the file is too large.
+        """
+
+        parts = file_path.relative_to(self.repo_path).parts
+        current = self.repo_path
+        for index, name in enumerate(parts):
+            current = current / name
+            if self.should_skip(current, relative_path="/".join(parts[:index + 1]), record=record):
+                return True
+        return False
+
+    def should_skip_git_path(self, relative_path: str, size: int) -> bool:
+        """
+        Determine if a file listed by git should be skipped, the way `walk_repo` would skip it in a working tree.
+
+        Parameters
+        ----------
+        relative_path : str
+            The POSIX path of the file relative to the repository root.
+        size : int
+            The size of the file in bytes, as listed by git.
+
+        Returns
+        -------
+        bool
+            True if a parent directory matches an ignore pattern or `skip_dirs`, or the file itself matches an
+            ignore pattern, has a binary extension or exceeds `max_file_size`.
+
+        Notes
+        -----
+        Git lists files rather than directories, so the verdict for each directory is cached in
+        `skipped_git_dirs` and every directory is checked and logged only once.
+        """
+
+        parts = relative_path.split("/")
+        for index in range(1, len(parts)):
+            dir_path = "/".join(parts[:index])
+            skipped = self.skipped_git_dirs.get(dir_path)
+            if skipped is None:
+                skipped = self.skipped_git_dirs[dir_path] = self.ignore_patterns.is_ignored(dir_path, is_dir=True) or parts[index - 1] in self.skip_dirs
+                if skipped:
+                    logger.info(f"Skipping {dir_path} due to ignore pattern or skipped directory.")
+            if skipped:
+                return True
+
+        if self.ignore_patterns.is_ignored(relative_path):
+            logger.info(f"Skipping {relative_path} due to ignore pattern.")
+            return True
+        if os.path.splitext(relative_path)[1].lower() in self.binary_extensions:
             self.metadata["skipped_files"].append({
-                "path": str(file_path),
+                "path": str(self.repo_path / relative_path),
+                "reason": "Binary file extension"
+            })
+            logger.info(f"Skipped binary file: {relative_path}")
+            return True
+        if size > self.max_file_size:
+            self.metadata["skipped_files"].append({
+                "path": str(self.repo_path / relative_path),
                 "reason": "File exceeds size limit"
             })
-            logger.info(f"Skipped file due to size: {file_path}")
+            logger.info(f"Skipped file due to size: {relative_path}")
             return True
-
         return False
 
+    def iter_git_files(self):
+        """
+        List the files of `git_rev` that should be processed, in git mode.
+
+        Yields
+        ------
+        tuple of (pathlib.Path, bool, str, int)
+            The path of each file as it would be in a checkout, whether it is a documentation file, its blob id
+            and its size.
+
+        Notes
+        -----
+        With `git_base_rev`, only files added or modified since that revision are yielded. Files deleted since
+        then are listed under `metadata["git"]["deleted_files"]`.
+        """
+
+        start = time.perf_counter()
+        files = self.git.list_files(self.git_rev)
+        changed = self.git.changed_paths(self.git_base_rev, self.git_rev) if self.git_base_rev else None
+        self.metrics.add("walk", time.perf_counter() - start, ".")
+        self.metadata["git"] = {"rev": self.git_rev, "base_rev": self.git_base_rev}
+        if changed is not None:
+            deleted = changed.difference(relative_path for relative_path, _, _ in files)
+            self.metadata["git"]["deleted_files"] = sorted(deleted)
+            logger.info(f"{len(changed)} files changed between {self.git_base_rev} and {self.git_rev}, {len(deleted)} deleted")
+
+        file_count = 0
+        for relative_path, blob_id, size in files:
+            if changed is not None and relative_path not in changed:
+                continue
+            start = time.perf_counter()
+            skip = self.should_skip_git_path(relative_path, size)
+            self.metrics.add("ignore", time.perf_counter() - start, relative_path)
+            if skip:
+                continue
+            file_path = self.repo_path / relative_path
+            file_count += 1
+            logger.info(f"Processing file {file_count}: {file_path}")
+            yield file_path, is_documentation_file(file_path), blob_id, size
+
     def save_chunk(self, chunk: dict, subdir: Path, file_path: Path = None):
         """
         Save a chunk of content to a text file.
         """
-        chunk_type = chunk.get("type", "unknown")
-        if chunk_type == "comments":
-            # Count words in all comment texts
-            chunk_word_count = sum(len(c["text"].split()) for c in chunk.get("comments", []))
-        elif chunk_type == "function" or chunk_type == "class":
-            chunk_word_count = len(chunk.get("code", "").split())
-        elif chunk_type == "file" or chunk_type == "markdown":
-            chunk_word_count = len(chunk.get("content", "").split())
-        else:
-            chunk_word_count = 0
-        
+        words = chunk_word_count(chunk)
+        tokens = chunk_token_count(chunk)
+
         if self.split_on_files:
             # Check if we're starting a new file
             if file_path != self.current_file_path:
                 # Save previous file's content if any
-                if self.content:
+                if self.writer.has_content:
                     self.save_content(subdir)
                 # Start new file
                 self.current_file_path = file_path
-                self.content = ""
                 self.current_word_count = 0
-                # Add file header
-                if file_path:
+                self.current_token_count = 0
+                # Add file header, JSONL records carry their path instead
+                if file_path and self.output_format == "text":
                     relative_path = file_path.relative_to(self.repo_path)
                     repo_name = self.repo_path.name
-                    self.content += f"Repository: {repo_name}\nFile Path: {relative_path}\n{'='*50}\n\n"
-            
-            # Accumulate chunks for the current file
-            self.content += self.format_chunk(chunk) + "\n\n"
-            self.current_word_count += chunk_word_count
+                    self.writer.write(f"Repository: {repo_name}\nFile Path: {relative_path}\n{'='*50}\n\n")
+        elif self.current_word_count + words > self.max_words or (
+            self.max_tokens and self.current_token_count + tokens > self.max_tokens
+        ):
+            self.save_content(subdir)
+
+        # Stream the chunk into the current output file
+        self.write_chunk(chunk, str(file_path.relative_to(self.repo_path)))
+        self.current_word_count += words
+        self.current_token_count += tokens
+
+    def write_chunk(self, chunk: dict, relative_path: str):
+        """
+        Format a chunk for `output_format` and write it to the current output file, timing both steps.
+
+        Parameters
+        ----------
+        chunk : dict
+            A chunk as produced by `FileProcessor`.
+        relative_path : str
+            The path of the chunk's source file relative to the repository root.
+
+        Notes
+        -----
+        In JSONL mode the chunk is written as one record and its position is noted for the chunk index.
+        Records are written with `ensure_ascii`, so their length in characters is also their length in bytes
+        and the byte offset is the number of characters written so far. Chunk ids are `<path>#<n>`, where n
+        numbers the chunks of a source file from 0, so they are stable across runs.
+        """
+
+        start = time.perf_counter()
+        if self.output_format == "jsonl":
+            if relative_path != self.record_path:
+                self.record_path, self.record_number = relative_path, 0
+            chunk_id = f"{relative_path}#{self.record_number}"
+            self.record_number += 1
+            parts = (json.dumps({"id": chunk_id, **self.chunk_record(relative_path, chunk)}) + "\n",)
+            self.pending_index.append((chunk_id, self.writer.size, len(parts[0])))
         else:
-            if self.current_word_count + chunk_word_count > self.max_words:
-                self.save_content(subdir)
-            self.content += self.format_chunk(chunk) + "\n\n"
-            self.current_word_count += chunk_word_count
+            parts = (self.format_chunk(chunk), "\n\n")
+        formatted = time.perf_counter()
+        self.pending_sources[relative_path] = None
+        for part in parts:
+            self.writer.write(part)
+        self.metrics.add("formatting", formatted - start, relative_path)
+        self.metrics.add("writing", time.perf_counter() - formatted, relative_path)
+
+    def commit_output(self, file_path: Path) -> dict:
+        """
+        Move the content streamed since the last commit to `file_path` and add its chunks to the chunk index.
+
+        Returns
+        -------
+        dict
+            The index entries of the chunks in the file, keyed by chunk id.
+
+        Notes
+        -----
+        The file is moved by `background_writer`, which logs the error and discards the content if it fails.
+        """
+
+        relative_file = file_path.relative_to(self.output_dir).as_posix()
+        entries = {
+            chunk_id: {"file": relative_file, "offset": offset, "length": length}
+            for chunk_id, offset, length in self.pending_index
+        }
+        self.pending_index = []
+        sources, self.pending_sources = list(self.pending_sources), {}
+        start = time.perf_counter()
+        self.writer.commit(file_path, sources)
+        self.metrics.add("writing", time.perf_counter() - start, relative_file)
+        # Forget the chunks of an earlier file written to the same path in this run
+        for chunk_id in self.index_files.pop(relative_file, []):
+            if self.chunk_index.get(chunk_id, {}).get("file") == relative_file:
+                del self.chunk_index[chunk_id]
+        self.index_files[relative_file] = list(entries)
+        self.chunk_index.update(entries)
+        return entries
 
 
     def save_content(self, subdir: Path):
         """
         Save the accumulated content to a file.
 
-        This method writes the currently accumulated content to a file in the specified subdirectory.
-        After saving, the content and word count are reset for the next chunk.
+        This method moves the content streamed by `self.writer` since the last save to a file in the specified
+        subdirectory. After saving, the word and token counts are reset for the next chunk.
 
         Parameters
         ----------
@@ -586,34 +1830,38 @@ class RepoContentProcessor:
 
         Notes
         -----
-        - The file is named `chunk_<counter>.json`, where `<counter>` is an incrementing number for the subdirectory.
+        - The file is named `chunk_<counter>.txt`, or `chunk_<counter>.jsonl` in JSONL mode, where `<counter>` is an incrementing number for the subdirectory.
         - If the subdirectory does not exist, it is created automatically.
-        - Once the content is saved, the internal buffer (`self.content`) and the current word count (`self.current_word_count`) are reset to prepare for the next chunk.
+        - The content is never held in memory as a whole: chunks are written to a pending file as they are saved
+          and the pending file is renamed here, so memory use does not grow with `max_words`. Both happen on
+          the thread of `background_writer`, which logs any error.
+        - Once the content is saved, the current word count (`self.current_word_count`) is reset to prepare for the next chunk.
 
         Examples
         --------
         To save the current content to a subdirectory:
             >>> processor = RepoContentProcessor(repo_path=Path("repo"), output_dir=Path("output"))
-            >>> processor.content = "This is some chunked content."
+            >>> processor.writer.write("This is some chunked content.")
             >>> processor.current_word_count = 5
             >>> processor.save_content(Path("python"))
 
-        Raises
-        ------
-        OSError
-            If the file cannot be created or written, an error is logged.
         """
 
-        if self.content:
-            file_path = self.output_dir / subdir / f"chunk_{self.file_counter[subdir]}.txt"
-            file_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(self.content)
+        if self.writer.has_content:
+            file_path = self.output_dir / subdir / f"chunk_{self.file_counter[subdir]}.{self.output_extension}"
+            self.commit_output(file_path)
             logger.info(f"Saved chunk to {file_path}")
             self.file_counter[subdir] += 1
-            self.content = ""
             self.current_word_count = 0
+            self.current_token_count = 0
             
+    @property
+    def output_extension(self) -> str:
+        """
+        The extension of the output files for `output_format`.
+        """
+        return "jsonl" if self.output_format == "jsonl" else "txt"
+
     def format_chunk(self, chunk: dict) -> str:
         """
         Format a chunk into plain text for saving.
@@ -629,59 +1877,243 @@ class RepoContentProcessor:
         elif chunk_type == "file":
             return f"File: {chunk.get('name')}\nContent:\n{chunk.get('content', '')}"
         elif chunk_type == "markdown":
-            return f"Header: {chunk.get('header', '')}\nContent:\n{chunk.get('content', '')}"
+            part = f" (part {chunk['part']})" if chunk.get("part") else ""
+            return f"Header: {chunk.get('header', '')}{part}\nContent:\n{chunk.get('content', '')}"
+        elif chunk_type == "duplicate":
+            return f"Duplicate: {chunk.get('name')}\n{chunk.get('content', '')}"
         else:
             return f"Unknown chunk type:\n{chunk}"
 
 
 
-    def process_file(self, file_path: Path):
+    def process_file(self, file_path: Path, stat_result: os.stat_result = None):
         """
         Process a single file.
+
+        If `stat_result` is omitted the file is stat'ed to check whether it changed since the last run.
+        """
+        try:
+            if stat_result is None:
+                stat_result = file_path.stat()
+            relative_path = str(file_path.relative_to(self.repo_path))
+        except (OSError, ValueError):
+            relative_path = None
+        result = None
+        if relative_path is not None and self.is_unchanged(relative_path, stat_result):
+            result = self.unchanged_result(file_path, relative_path)
+        if result is None:
+            known = self.hashes.get(relative_path, {})
+            result = analyze_file(
+                self.file_processor, file_path, known.get("hash"), algorithm=self.hash_algorithm, cache_dir=self.cache_dir
+            )
+        self.record_file(file_path, result, stat_result=stat_result)
+
+    @property
+    def cache_dir(self) -> Path:
+        """
+        The chunk cache directory passed to `analyze_file`, or None if the cache is disabled.
+        """
+        return self.chunk_cache.cache_dir if self.chunk_cache is not None else None
+
+    def unchanged_result(self, file_path: Path, relative_path: str) -> dict:
+        """
+        Build the result for a file whose stat signature is unchanged, without reading the file.
+
+        Parameters
+        ----------
+        file_path : pathlib.Path
+            The path to the file.
+        relative_path : str
+            The path of the file relative to the repository root.
+
+        Returns
+        -------
+        dict or None
+            The cached chunks of the file, a result marking it as skipped if the chunk cache is disabled,
+            or None if its chunks are not cached and the file has to be analyzed.
+        """
+
+        known_hash = self.hashes[relative_path]["hash"]
+        if self.chunk_cache is None:
+            return {"hash": known_hash, "chunks": [], "stat_match": True}
+        cached = self.chunk_cache.get(self.file_processor.cache_key(file_path, known_hash, self.hash_algorithm))
+        if cached is None:
+            return None
+        return {"hash": known_hash, **cached, "cached": True}
+
+    def is_unchanged(self, relative_path: str, stat_result: os.stat_result) -> bool:
+        """
+        Check whether a file can be skipped from its stat signature alone, without opening it.
+
+        Parameters
+        ----------
+        relative_path : str
+            The path of the file relative to the repository root.
+        stat_result : os.stat_result
+            The current stat result of the file.
+
+        Returns
+        -------
+        bool
+            True if the size, modification time and inode match the manifest of the previous run.
+
+        Notes
+        -----
+        Always False in paranoid mode. Files modified within two seconds of the previous run's start
+        are not trusted, since a later write could have kept the same timestamp on coarse-grained
+        filesystems.
+        """
+
+        if self.paranoid or stat_result is None:
+            return False
+        known = self.hashes.get(relative_path)
+        if not known or "mtime_ns" not in known:
+            return False
+        if known["mtime_ns"] + 2_000_000_000 >= self.previous_run_ns:
+            return False
+        return stat_signature(stat_result) == {key: known[key] for key in ("size", "mtime_ns", "inode")}
+
+    def record_file(self, file_path: Path, result: dict, documentation: bool = False, stat_result: os.stat_result = None):
+        """
+        Save the chunks of an analyzed file and record it in the metadata and hashes.
+
+        Parameters
+        ----------
+        file_path : pathlib.Path
+            The path to the analyzed file.
+        result : dict
+            The result returned by `analyze_file` for this file.
+        documentation : bool, optional
+            If true, the chunks are saved to the markdown subdirectory and no metadata is recorded.
+        stat_result : os.stat_result, optional
+            The stat result taken when the file was walked, stored in the hash manifest.
+
+        Notes
+        -----
+        Results must be recorded in walk order so that output files are identical regardless of
+        how many workers produced them.
         """
+
+        self.record_metrics(file_path, result)
+        if result.get("rejected"):
+            self.metadata["skipped_files"].append({
+                "path": str(file_path.relative_to(self.repo_path)),
+                "reason": result["rejected"]
+            })
+            logger.info(f"Skipped file ({result['rejected']}): {file_path}")
+            return
+        if documentation:
+            if self.stable_output:
+                if result.get("hash"):
+                    self.stable_files[str(file_path.relative_to(self.repo_path))] = {
+                        "subdir": "markdown",
+                        "hash": result["hash"],
+                        "words": sum(chunk_word_count(chunk) for chunk in result["chunks"]),
+                        "tokens": sum(chunk_token_count(chunk) for chunk in result["chunks"])
+                    }
+            else:
+                chunks = result["chunks"]
+                if self.deduplicate and result.get("hash") and "error" not in result:
+                    chunks = self.deduplicate_chunks(str(file_path.relative_to(self.repo_path)), result["hash"], chunks)
+                for chunk in chunks:
+                    self.save_chunk(chunk, Path("markdown"), file_path)
+            if result.get("hash") and "error" not in result:
+                self.cache_result(file_path, result)
+            return
+
         try:
-            current_hash = compute_file_hash(file_path)
+            current_hash = result.get("hash")
             if not current_hash:
                 self.metadata["skipped_files"].append({"path": str(file_path), "reason": "Error computing file hash"})
                 logger.warning(f"Skipped file due to hash error: {file_path}")
                 return
 
             relative_path = str(file_path.relative_to(self.repo_path))
-            if relative_path in self.hashes and self.hashes[relative_path] == current_hash:
-                self.metadata["skipped_files"].append({"path": relative_path, "reason": "Unchanged file (hash match)"})
+            subdir = self.get_file_type_subdir(file_path)
+            entry = {"hash": current_hash}
+            if stat_result is not None:
+                entry.update(stat_signature(stat_result))
+            unchanged = result.get("stat_match") or (
+                self.chunk_cache is None and relative_path in self.hashes and self.hashes[relative_path]["hash"] == current_hash
+            )
+            if unchanged:
+                if self.stable_output:
+                    self.stable_files[relative_path] = {"subdir": subdir, "hash": current_hash, "words": None, "tokens": None}
+                match = "stat match" if result.get("stat_match") else "hash match"
+                self.hashes[relative_path] = entry
+                self.metadata["skipped_files"].append({"path": relative_path, "reason": f"Unchanged file ({match})"})
                 logger.info(f"Skipped unchanged file: {file_path}")
                 return
 
-            subdir = self.get_file_type_subdir(file_path)
-            chunks = self.file_processor.chunk_file(file_path)
-            for chunk in chunks:
-                self.save_chunk(chunk, subdir, file_path)
-
-            def chunk_word_count(chunk):
-                chunk_type = chunk.get("type", "unknown")
-                if chunk_type == "comments":
-                    return sum(len(c["text"].split()) for c in chunk.get("comments", []))
-                elif chunk_type == "function" or chunk_type == "class":
-                    return len(chunk.get("code", "").split())
-                elif chunk_type == "file" or chunk_type == "markdown":
-                    return len(chunk.get("content", "").split())
-                else:
-                    return 0
+            chunks = result["chunks"]
+            if self.deduplicate and "error" not in result:
+                chunks = self.deduplicate_chunks(relative_path, current_hash, chunks)
+            if not self.stable_output:
+                for chunk in chunks:
+                    self.save_chunk(chunk, subdir, file_path)
 
-            self.metadata["processed_files"].append({
+            if "error" in result:
+                raise RuntimeError(result["error"])
+
+            words = sum(chunk_word_count(chunk) for chunk in chunks)
+            tokens = sum(chunk_token_count(chunk) for chunk in chunks)
+            if self.stable_output:
+                self.stable_files[relative_path] = {"subdir": subdir, "hash": current_hash, "words": words, "tokens": tokens}
+            file_entry = {
                 "path": relative_path,
                 "chunks": len(chunks),
-                "size": file_path.stat().st_size,
-                "lines": sum(1 for _ in open(file_path, encoding="utf-8")),
-                "words": sum(chunk_word_count(chunk) for chunk in chunks)
-            })
+                "size": result["size"],
+                "lines": result["lines"],
+                "words": words,
+                "tokens": tokens
+            }
+            if result.get("encoding") not in (None, "utf-8"):
+                file_entry["encoding"] = result["encoding"]
+            if self.deduplicate and self.seen_files.get(current_hash, relative_path) != relative_path:
+                file_entry["duplicate_of"] = self.seen_files[current_hash]
+            self.metadata["processed_files"].append(file_entry)
             self.metadata["summary"]["total_files_processed"] += 1
-            self.metadata["summary"]["total_words"] += sum(chunk_word_count(chunk) for chunk in chunks)
-            self.hashes[relative_path] = current_hash
+            self.metadata["summary"]["total_words"] += words
+            self.metadata["summary"]["total_tokens"] += tokens
+            self.hashes[relative_path] = entry
+            if result.get("cached"):
+                self.metadata["summary"]["cached_files"] += 1
+            self.cache_result(file_path, result)
         except Exception as e:
             logger.warning(f"Error processing file {file_path}: {e}")
             self.metadata["skipped_files"].append({"path": str(file_path), "reason": f"Error processing file: {e}"})
 
+    def record_metrics(self, file_path: Path, result: dict):
+        """
+        Add the stage timings and size of an analyzed file to `metrics`.
+        """
+
+        try:
+            relative_path = file_path.relative_to(self.repo_path).as_posix()
+        except ValueError:
+            relative_path = str(file_path)
+        self.metrics.add_timings(result.get("timings"), relative_path)
+        if "size" in result:
+            self.metrics.files += 1
+            self.metrics.bytes += result["size"]
+
+    def cache_result(self, file_path: Path, result: dict):
+        """
+        Store the chunks of an analyzed file in the chunk cache, or mark them as used if they came from it.
+
+        Does nothing if the chunk cache is disabled.
+        """
+
+        if self.chunk_cache is None:
+            return
+        key = self.file_processor.cache_key(file_path, result["hash"], self.hash_algorithm)
+        if result.get("cached"):
+            self.chunk_cache.touch(key)
+        else:
+            self.chunk_cache.put(key, {
+                "chunks": result["chunks"], "size": result["size"], "lines": result["lines"], "encoding": result.get("encoding")
+            })
+
     def process_repo(self):
         """
         Process all files in the repository.
@@ -693,9 +2125,18 @@ class RepoContentProcessor:
         Notes
         -----
         - Files are processed based on their type (e.g., Python files, Markdown files).
+        - With `workers` greater than 1, hashing and chunking run in a process pool while results are
+          saved in walk order, so the output files are identical to a serial run.
         - Skipped files and directories are logged in the `metadata['skipped_files']`.
         - Processed files are chunked, and their metadata is updated in `metadata['processed_files']`.
         - All metadata and hash information is saved to the output directory at the end of processing.
+        - Unchanged files are emitted from the chunk cache, so the output is complete on incremental runs.
+        - With `git_rev`, files are listed and read from the git object database instead of the working tree,
+          so no checkout is needed and bare repositories work. Blob ids serve as content hashes, and with
+          `git_base_rev` only the files changed between the two revisions are processed.
+        - Cumulative time, call counts and the slowest files of each stage are saved in `metadata['metrics']`.
+          Stages run in worker processes are measured there and added up in the parent, and with `profile`
+          the run is also profiled with cProfile (worker processes are not covered by the profile).
 
         Parameters
         ----------
@@ -721,7 +2162,8 @@ class RepoContentProcessor:
                         "chunks": 3,
                         "size": 2048,
                         "lines": 50,
-                        "words": 300
+                        "words": 300,
+                        "tokens": 420
                     }
                 ],
                 "skipped_files": [
@@ -732,38 +2174,661 @@ class RepoContentProcessor:
                 ],
                 "summary": {
                     "total_files_processed": 10,
-                    "total_words": 5000
+                    "total_words": 5000,
+                    "total_tokens": 7000,
+                    "cached_files": 8
+                },
+                "metrics": {
+                    "wall_seconds": 0.42,
+                    "files": 2,
+                    "bytes": 9000,
+                    "files_per_s": 4.76,
+                    "mb_per_s": 0.021,
+                    "stages": {
+                        "chunking": {
+                            "seconds": 0.12,
+                            "calls": 2,
+                            "slowest": [{"path": "example.py", "seconds": 0.1}]
+                        }
+                    }
                 }
             }
         """
 
+        if self.output_dir is None:
+            raise ValueError("An output directory is required to process a repository, use iter_chunks instead")
+        if not self.profile:
+            self.run_pipeline()
+            return
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.runcall(self.run_pipeline)
+        finally:
+            profile_path = self.output_dir / "profile.pstats"
+            profiler.dump_stats(profile_path)
+            logger.info(f"Saved profile to {profile_path}")
+
+    def run_pipeline(self):
+        """
+        Run the steps of `process_repo`: walk, chunk and save the files, then write the metadata, hashes and caches.
+        """
+
         logger.info(f"Processing repository: {self.repo_path}")
-        total_files = sum(1 for _ in self.repo_path.rglob("*"))
-        file_count = 0
+        self.run_started_ns = time.time_ns()
+        self.metrics.reset()
+
+        if self.git is not None:
+            for file_path, documentation, result in self.iter_git_results():
+                self.record_file(file_path, result, documentation)
+        elif self.workers > 1:
+            self.process_parallel(self.iter_candidates())
+        else:
+            for file_path, documentation, stat_result in self.iter_candidates():
+                if documentation:
+                    result = analyze_file(
+                        self.file_processor, file_path, documentation=True,
+                        algorithm=self.hash_algorithm, cache_dir=self.cache_dir
+                    )
+                    self.record_file(file_path, result, documentation=True, stat_result=stat_result)
+                else:
+                    self.process_file(file_path, stat_result)
 
-        for file_path in self.repo_path.rglob("*"):
-            file_count += 1
-            logger.info(f"Processing file {file_count}/{total_files}: {file_path}")
-            if self.should_skip(file_path):
-                continue
+        if self.stable_output:
+            self.save_stable_output()
+        self.finish_run()
+        if self.git is not None:
+            self.git.close()
 
-            if is_documentation_file(file_path):
-                chunks = self.file_processor.chunk_markdown_file(file_path)
-                for chunk in chunks:
-                    self.save_chunk(chunk, Path("markdown"), file_path)
-            elif file_path.suffix == ".py":
-                self.process_file(file_path)
-            elif file_path.is_file():
-                self.process_file(file_path)
+    def finish_run(self):
+        """
+        Flush the last output file, then save the hashes, the chunk index, the metadata with the run's metrics
+        and the chunk cache.
+
+        Notes
+        -----
+        The JSON files are written by `background_writer` while the chunk cache is saved. The time spent waiting
+        for queued writes to land is recorded as the 'flushing' stage, and the writer thread is stopped before
+        returning, so all output is on disk (and fsynced with `fsync_output`) once the run is complete.
+        """
 
-        save_json(self.metadata, self.output_dir / "metadata.json", "Metadata")
-        save_json(self.hashes, self.output_dir / "hashes.json", "Hashes")
+        self.submit_json(
+            {"version": 2, "algorithm": self.hash_algorithm, "started_ns": self.run_started_ns, "files": self.hashes},
+            self.output_dir / "hashes.json",
+            "Hashes"
+        )
 
-        if self.content:
+        if self.writer.has_content:
             self.save_content(Path("remaining"))
+        self.pending_sources = {}
+        self.writer.close()
+
+        if self.output_format == "jsonl":
+            self.submit_json({"version": 1, "chunks": self.chunk_index}, self.output_dir / "chunk_index.json", "Chunk index")
+
+        start = time.perf_counter()
+        self.background_writer.flush()
+        self.metrics.add("flushing", time.perf_counter() - start)
+        self.metadata["metrics"] = self.metrics.as_dict()
+        self.submit_json(self.metadata, self.output_dir / "metadata.json", "Metadata")
+
+        if self.chunk_cache is not None and not self.shared_chunk_cache:
+            self.chunk_cache.save()
+        self.background_writer.close()
 
         logger.info("Repository processing complete.")
 
+    def submit_json(self, data: dict, file_path: Path, description: str):
+        """
+        Save a JSON file with `background_writer`, see the module-level `save_json`.
+
+        `data` is written later on the writer thread, so it must not be modified until the run is finished.
+        """
+
+        self.background_writer.submit(save_json, data, file_path, description, output_path=file_path)
+
+    def update_files(self, paths):
+        """
+        Re-chunk only the given files and rewrite the output files that contain them.
+
+        Parameters
+        ----------
+        paths : iterable of pathlib.Path
+            Files or directories that were modified, added or deleted, absolute or relative to the repository.
+
+        Raises
+        ------
+        ValueError
+            If `stable_output` is disabled, since only stable packing can rewrite individual output files,
+            or in git mode.
+
+        Notes
+        -----
+        This is the incremental counterpart of `process_repo`, used by watch mode. The processor must have run
+        `process_repo` first, so that `stable_files` and `hashes` describe the whole repository. Directories are
+        expanded to the files under them, both on disk and recorded by earlier runs, so renamed and deleted
+        directories are handled. A changed ignore file reloads the ignore rules and updates its whole directory. The metadata, hashes, chunk index and output files are updated in place;
+        other output files are left untouched.
+        """
+
+        if not self.stable_output:
+            raise ValueError("update_files requires stable_output")
+        if self.git is not None:
+            raise ValueError("update_files reads the working tree and cannot be used with git_rev")
+        self.metrics.reset()
+        self.run_started_ns = time.time_ns()
+
+        paths = [Path(path) if Path(path).is_absolute() else self.repo_path / path for path in paths]
+        ignore_files = [path for path in paths if path.name in (".gitignore", ".dockerignore")]
+        if ignore_files:
+            # Files anywhere below a changed ignore file may now be ignored or included
+            logger.info("Ignore files changed, reloading the ignore rules.")
+            self.ignore_patterns = self.load_ignore_patterns()
+            paths.extend(path.parent for path in ignore_files)
+
+        known = set(self.stable_files) | set(self.hashes)
+        relative_paths = set()
+        for path in paths:
+            try:
+                relative_path = path.relative_to(self.repo_path).as_posix()
+            except ValueError:
+                continue
+            if path == self.output_dir or self.output_dir in path.parents:
+                continue
+            prefix = "" if relative_path == "." else relative_path + "/"
+            if path.is_dir():
+                if not self.is_excluded(path, record=False):
+                    # The walk records the skipped files below the directory again
+                    below = (prefix, os.path.join(str(path), ""))
+                    self.metadata["skipped_files"] = [
+                        entry for entry in self.metadata["skipped_files"] if not entry["path"].startswith(below)
+                    ]
+                    relative_paths.update(
+                        file_path.relative_to(self.repo_path).as_posix() for file_path, _ in self.walk_repo(path)
+                    )
+                relative_paths.update(known_path for known_path in known if known_path.startswith(prefix))
+            elif path.exists() or relative_path in known:
+                relative_paths.add(relative_path)
+            else:
+                # A deleted directory, or a file that was never recorded
+                relative_paths.update(known_path for known_path in known if known_path.startswith(prefix))
+
+        forgotten = relative_paths | {str(self.repo_path / relative_path) for relative_path in relative_paths}
+        for key in ("processed_files", "skipped_files"):
+            self.metadata[key] = [entry for entry in self.metadata[key] if entry["path"] not in forgotten]
+        for relative_path in sorted(relative_paths):
+            self.stable_files.pop(relative_path, None)
+            self.hashes.pop(relative_path, None)
+            file_path = self.repo_path / relative_path
+            try:
+                stat_result = file_path.stat()
+            except OSError:
+                logger.info(f"Removed file: {relative_path}")
+                continue
+            if not file_path.is_file() or self.is_excluded(file_path):
+                continue
+            logger.info(f"Updating file: {relative_path}")
+            documentation = is_documentation_file(file_path)
+            result = analyze_file(
+                self.file_processor, file_path, documentation=documentation,
+                algorithm=self.hash_algorithm, cache_dir=self.cache_dir
+            )
+            self.record_file(file_path, result, documentation, stat_result)
+
+        summary = self.metadata["summary"]
+        summary["total_files_processed"] = len(self.metadata["processed_files"])
+        summary["total_words"] = sum(entry["words"] for entry in self.metadata["processed_files"])
+        summary["total_tokens"] = sum(entry["tokens"] for entry in self.metadata["processed_files"])
+        self.save_stable_output()
+        self.finish_run()
+
+    def save_stable_output(self):
+        """
+        Write the output files of a stable packing run, rewriting only those whose members changed.
+
+        Notes
+        -----
+        Source files are assigned to output files by `pyragify.packing.assign_output_files`, starting from
+        the assignment saved in `assignments.json` by the previous run. Output files whose members and
+        member hashes are unchanged are not opened, so their content and modification time are preserved.
+        The chunks of members of rewritten output files are loaded from the chunk cache, or re-analyzed
+        if they are not cached.
+        """
+
+        self.chunk_index, self.index_files = {}, {}
+        assignments_path = self.output_dir / "assignments.json"
+        previous = load_json(assignments_path, "assignments")
+        previous_groups = previous.get("groups", [])
+        if previous and (
+            previous.get("max_words") != self.max_words
+            or previous.get("max_tokens", 0) != self.max_tokens
+            or previous.get("split_on_files") != self.split_on_files
+            or previous.get("output_format", "text") != self.output_format
+        ):
+            logger.info("Packing settings changed, all output files will be reassigned.")
+            for group in previous_groups:
+                self.writer.remove(self.output_dir / group["file"])
+            previous_groups = []
+
+        previous_words = {member["path"]: member for group in previous_groups for member in group["members"]}
+        for relative_path, info in self.stable_files.items():
+            if info["words"] is None:
+                member = previous_words.get(relative_path)
+                if member is not None and member["hash"] == info["hash"] and "tokens" in member:
+                    info["words"], info["tokens"] = member["words"], member["tokens"]
+                else:
+                    chunks = self.load_member_chunks(relative_path, info["hash"])
+                    info["words"] = sum(chunk_word_count(chunk) for chunk in chunks)
+                    info["tokens"] = sum(chunk_token_count(chunk) for chunk in chunks)
+
+        groups = assign_output_files(
+            previous_groups, self.stable_files, self.max_words, self.split_on_files, self.output_extension, self.max_tokens
+        )
+        previous_chunks = {(group["subdir"], group["id"]): group.get("chunks", {}) for group in previous_groups}
+        written = unchanged = 0
+        for group in groups:
+            file_path = self.output_dir / group["file"]
+            if not group["members"]:
+                self.writer.remove(file_path)
+                logger.info(f"Removed empty output file {file_path}")
+                continue
+            if not group["dirty"] and self.writer.exists(file_path):
+                group["chunks"] = previous_chunks.get((group["subdir"], group["id"]), {})
+                self.chunk_index.update(group["chunks"])
+                unchanged += 1
+                continue
+
+            for member in group["members"]:
+                if self.split_on_files and self.output_format == "text":
+                    self.writer.write(f"Repository: {self.repo_path.name}\nFile Path: {member['path']}\n{'='*50}\n\n")
+                for chunk in self.load_member_chunks(member["path"], member["hash"]):
+                    self.write_chunk(chunk, member["path"])
+            group["chunks"] = self.commit_output(file_path)
+            logger.info(f"Saved chunk to {file_path}")
+            written += 1
+
+        self.metadata["summary"]["output_files_written"] = written
+        self.metadata["summary"]["output_files_unchanged"] = unchanged
+        self.submit_json(
+            {
+                "version": 1,
+                "max_words": self.max_words,
+                "max_tokens": self.max_tokens,
+                "split_on_files": self.split_on_files,
+                "output_format": self.output_format,
+                "groups": [
+                    {
+                        "id": group["id"],
+                        "subdir": group["subdir"],
+                        "file": group["file"],
+                        "members": group["members"],
+                        **({"chunks": group["chunks"]} if self.output_format == "jsonl" else {})
+                    }
+                    for group in groups if group["members"]
+                ]
+            },
+            assignments_path,
+            "Assignments"
+        )
+
+    def load_member_chunks(self, relative_path: str, content_hash: str) -> list:
+        """
+        Get the chunks of a source file for stable packing, preferably from the chunk cache.
+
+        Parameters
+        ----------
+        relative_path : str
+            The path of the source file relative to the repository root.
+        content_hash : str
+            The hash of the file content recorded during this run.
+
+        Returns
+        -------
+        list of dict
+            The chunks of the file.
+        """
+
+        file_path = self.repo_path / relative_path
+        if self.chunk_cache is not None:
+            cached = self.chunk_cache.get(self.file_processor.cache_key(file_path, content_hash, self.hash_algorithm))
+            if cached is not None:
+                return cached["chunks"]
+        if self.git is not None:
+            data = self.git.read_blob(content_hash) or b""
+            return analyze_data(
+                self.file_processor, file_path, data, documentation=is_documentation_file(file_path),
+                algorithm=self.hash_algorithm, content_hash=content_hash
+            )["chunks"]
+        result = analyze_file(
+            self.file_processor, file_path, documentation=is_documentation_file(file_path), algorithm=self.hash_algorithm
+        )
+        if result.get("hash") != content_hash:
+            logger.warning(f"File changed during processing: {file_path}")
+        return result["chunks"]
+
+    def iter_candidates(self):
+        """
+        Walk the repository and yield the files that should be processed.
+
+        Yields
+        ------
+        tuple of (pathlib.Path, bool, os.stat_result)
+            The path of each file to process, whether it is a documentation file, and its stat result
+            as cached by the walk.
+
+        Notes
+        -----
+        Paths rejected by `should_skip` are recorded in the metadata as the walk progresses.
+        """
+
+        file_count = 0
+        for file_path, entry in self.walk_repo():
+            file_count += 1
+            logger.info(f"Processing file {file_count}: {file_path}")
+            yield file_path, is_documentation_file(file_path), entry.stat()
+
+    def process_parallel(self, candidates):
+        """
+        Hash and chunk files in a process pool, recording the results in walk order.
+
+        Parameters
+        ----------
+        candidates : iterable of tuple of (pathlib.Path, bool, os.stat_result)
+            The files to process, as yielded by `iter_candidates`.
+
+        Notes
+        -----
+        At most a few tasks per worker are in flight at once, so memory stays bounded and results
+        are recorded as soon as the file at the head of the queue is done. Files whose stat signature
+        is unchanged and whose chunks are cached are resolved in the parent without being sent to a worker.
+        """
+
+        for file_path, documentation, stat_result, result in self.iter_parallel_results(candidates):
+            self.record_file(file_path, result, documentation, stat_result)
+
+    def iter_parallel_results(self, candidates, incremental: bool = True):
+        """
+        Analyze files in a process pool and yield their results in walk order.
+
+        Parameters
+        ----------
+        candidates : iterable of tuple of (pathlib.Path, bool, os.stat_result)
+            The files to process, as yielded by `iter_candidates`.
+        incremental : bool, optional
+            If true, files that are unchanged since the previous run are resolved from their stat signature
+            and the manifest. If false, every file is analyzed or read from the chunk cache.
+
+        Yields
+        ------
+        tuple of (pathlib.Path, bool, os.stat_result, dict)
+            Each candidate followed by its `analyze_file` result.
+        """
+
+        max_pending = self.workers * 4
+        pending = deque()
+        with self.open_pool() as executor:
+            for file_path, documentation, stat_result in candidates:
+                relative_path = str(file_path.relative_to(self.repo_path))
+                result = None
+                if incremental and not documentation and self.is_unchanged(relative_path, stat_result):
+                    result = self.unchanged_result(file_path, relative_path)
+                if result is not None:
+                    future = Future()
+                    future.set_result(result)
+                else:
+                    known_hash = self.hashes.get(relative_path, {}).get("hash") if incremental else None
+                    future = executor.submit(
+                        analyze_file, self.file_processor, file_path, known_hash, documentation,
+                        self.hash_algorithm, self.cache_dir
+                    )
+                pending.append((file_path, documentation, stat_result, future))
+                if len(pending) >= max_pending:
+                    file_path, documentation, stat_result, future = pending.popleft()
+                    yield file_path, documentation, stat_result, future.result()
+            while pending:
+                file_path, documentation, stat_result, future = pending.popleft()
+                yield file_path, documentation, stat_result, future.result()
+
+    def git_known_result(self, file_path: Path, documentation: bool, blob_id: str, incremental: bool = True) -> dict:
+        """
+        Build the result for a file of `git_rev` without reading its blob, when possible.
+
+        Returns
+        -------
+        dict or None
+            The cached chunks of the blob, a result marking the file as unchanged if the chunk cache is disabled
+            and the previous run recorded the same blob id, or None if the blob has to be read and analyzed.
+        """
+
+        if self.chunk_cache is not None:
+            cached = self.chunk_cache.get(self.file_processor.cache_key(file_path, blob_id, self.hash_algorithm))
+            if cached is not None:
+                return {"hash": blob_id, **cached, "cached": True}
+        elif incremental and not documentation:
+            if self.hashes.get(str(file_path.relative_to(self.repo_path)), {}).get("hash") == blob_id:
+                return {"hash": blob_id, "chunks": []}
+        return None
+
+    def open_pool(self):
+        """
+        Return the process pool of a run as a context manager: the shared `executor`, which is left running,
+        or a new pool of `workers` processes that is shut down on exit.
+        """
+
+        if self.executor is not None:
+            return nullcontext(self.executor)
+        return ProcessPoolExecutor(max_workers=self.workers)
+
+    def iter_git_results(self, incremental: bool = True):
+        """
+        Analyze the files of `git_rev` and yield their results in listing order, in git mode.
+
+        Parameters
+        ----------
+        incremental : bool, optional
+            If true, files whose blob id matches the previous run are not read when the chunk cache is disabled.
+
+        Yields
+        ------
+        tuple of (pathlib.Path, bool, dict)
+            The path of each file, whether it is a documentation file, and its `analyze_data` result.
+
+        Notes
+        -----
+        Blob ids are content hashes, so files are never hashed: unchanged and cached files are resolved from
+        the listing alone. Other blobs are read in this process through `git cat-file` and, with `workers`
+        above 1, chunked in a process pool with at most a few tasks per worker in flight.
+        """
+
+        max_pending = self.workers * 4 if self.workers > 1 else 1
+        pending = deque()
+        executor = (self.executor or ProcessPoolExecutor(max_workers=self.workers)) if self.workers > 1 else None
+        try:
+            for file_path, documentation, blob_id, _ in self.iter_git_files():
+                result = self.git_known_result(file_path, documentation, blob_id, incremental)
+                reading = None
+                if result is None:
+                    start = time.perf_counter()
+                    data = self.git.read_blob(blob_id)
+                    reading = time.perf_counter() - start
+                    if data is None:
+                        logger.error(f"Error reading blob {blob_id} of {file_path}")
+                        result = {"chunks": [], "timings": {}, "hash": None}
+                if result is not None:
+                    future = Future()
+                    future.set_result(result)
+                elif executor is None:
+                    future = Future()
+                    future.set_result(analyze_data(
+                        self.file_processor, file_path, data, documentation=documentation,
+                        algorithm=self.hash_algorithm, content_hash=blob_id
+                    ))
+                else:
+                    future = executor.submit(
+                        analyze_data, self.file_processor, file_path, data, None, documentation,
+                        self.hash_algorithm, None, blob_id
+                    )
+                pending.append((file_path, documentation, reading, future))
+                if len(pending) >= max_pending:
+                    yield self.git_pending_result(pending.popleft())
+            while pending:
+                yield self.git_pending_result(pending.popleft())
+        finally:
+            if executor is not None and executor is not self.executor:
+                executor.shutdown(cancel_futures=True)
+            self.git.close()
+
+    def git_pending_result(self, item: tuple) -> tuple:
+        """
+        Wait for a result queued by `iter_git_results` and add the time spent reading its blob.
+        """
+
+        file_path, documentation, reading, future = item
+        result = future.result()
+        if reading is not None:
+            result.setdefault("timings", {})["reading"] = reading
+        return file_path, documentation, result
+
+    def iter_chunks(self):
+        """
+        Walk the repository and lazily yield a record for every chunk, without writing any output.
+
+        Yields
+        ------
+        dict
+            A chunk record with the keys:
+            - 'path': The path of the source file relative to the repository root.
+            - 'type': The chunk type ('function', 'class', 'comments', 'markdown', 'file' or, with `deduplicate`,
+              'duplicate').
+            - 'name': The function or class name, Markdown header or file name; None for comments.
+            - 'start_line', 'end_line': The 1-based line span of the chunk in the source file.
+            - 'text': The chunk formatted as in the output files.
+            - 'words': The word count of the chunk, as used for `max_words`.
+            - 'tokens': The approximate token count of the chunk, as used for `max_tokens`.
+
+        Notes
+        -----
+        Files are walked, skipped and chunked exactly as in `process_repo`, and the chunks of each file are
+        yielded as soon as it is analyzed, so consumers can start before the walk finishes. Unchanged files
+        are not left out: their chunks are read from the chunk cache or the file is chunked again. Files that
+        fail to process are recorded in `metadata["skipped_files"]`. With `workers` above 1, files are
+        analyzed in a process pool and still yielded in walk order. In git mode, the files of `git_rev` are
+        yielded in git's listing order.
+        """
+
+        if self.git is not None:
+            results = (
+                (file_path, documentation, None, result)
+                for file_path, documentation, result in self.iter_git_results(incremental=False)
+            )
+        elif self.workers > 1:
+            results = self.iter_parallel_results(self.iter_candidates(), incremental=False)
+        else:
+            results = (
+                (file_path, documentation, stat_result, analyze_file(
+                    self.file_processor, file_path, documentation=documentation,
+                    algorithm=self.hash_algorithm, cache_dir=self.cache_dir
+                ))
+                for file_path, documentation, stat_result in self.iter_candidates()
+            )
+
+        for file_path, documentation, stat_result, result in results:
+            relative_path = str(file_path.relative_to(self.repo_path))
+            if result.get("rejected"):
+                self.metadata["skipped_files"].append({"path": relative_path, "reason": result["rejected"]})
+                continue
+            error = result.get("error") or (None if result.get("hash") else "Unreadable file")
+            if error:
+                logger.error(f"Error processing file {file_path}: {error}")
+                self.metadata["skipped_files"].append({"path": relative_path, "reason": f"Error: {error}"})
+                continue
+            chunks = result["chunks"]
+            if self.deduplicate:
+                chunks = self.deduplicate_chunks(relative_path, result["hash"], chunks)
+            for chunk in chunks:
+                yield self.chunk_record(relative_path, chunk)
+
+    def deduplicate_chunks(self, relative_path: str, content_hash: str, chunks: list) -> list:
+        """
+        Replace the chunks of a file that were already emitted in this run by references to their first occurrence.
+
+        Parameters
+        ----------
+        relative_path : str
+            The path of the file relative to the repository root.
+        content_hash : str
+            The content hash of the file, as recorded in `hashes.json`.
+        chunks : list
+            The chunks of the file.
+
+        Returns
+        -------
+        list
+            A single 'duplicate' chunk if a file with the same content was emitted before, otherwise the chunks with
+            every function and class whose code was emitted before replaced by a 'duplicate' chunk. The
+            replacements are counted in the 'deduplication' section of the metadata summary.
+
+        Notes
+        -----
+        Files are keyed by their content hash and definitions by a digest of their code, so only byte-identical
+        content is replaced. A definition is only replaced if its reference is shorter. Files are recorded in walk
+        order, so the first occurrence is the same whatever the number of workers.
+        """
+
+        if not chunks:
+            return chunks
+        stats = self.metadata["summary"]["deduplication"]
+        first_path = self.seen_files.setdefault(content_hash, relative_path)
+        if first_path != relative_path:
+            reference = Chunk(
+                type="duplicate", name=Path(relative_path).name, content=f"Identical to {first_path}",
+                start_line=1, end_line=max(chunk_line_span(chunk)[1] or 1 for chunk in chunks)
+            )
+            stats["duplicate_files"] += 1
+            stats["words_saved"] += sum(chunk_word_count(chunk) for chunk in chunks) - reference.word_count
+            stats["tokens_saved"] += sum(chunk_token_count(chunk) for chunk in chunks) - reference.token_count
+            return [reference]
+
+        deduplicated = []
+        for chunk in chunks:
+            chunk_type = chunk.get("type")
+            if chunk_type == "function" or chunk_type == "class":
+                digest = hashlib.blake2b(chunk.get("code", "").encode("utf-8", "surrogatepass"), digest_size=16).digest()
+                first = self.seen_definitions.get(digest)
+                if first is None:
+                    self.seen_definitions[digest] = (relative_path, chunk.get("name"))
+                else:
+                    start_line, end_line = chunk_line_span(chunk)
+                    reference = Chunk(
+                        type="duplicate", name=chunk.get("name"), start_line=start_line, end_line=end_line,
+                        content=f"Identical to {chunk_type} {first[1]} in {first[0]}"
+                    )
+                    if reference.word_count < chunk_word_count(chunk):
+                        stats["duplicate_definitions"] += 1
+                        stats["words_saved"] += chunk_word_count(chunk) - reference.word_count
+                        stats["tokens_saved"] += chunk_token_count(chunk) - reference.token_count
+                        chunk = reference
+            deduplicated.append(chunk)
+        return deduplicated
+
+    def chunk_record(self, relative_path: str, chunk: dict) -> dict:
+        """
+        Build the record yielded by `iter_chunks` for a chunk of a source file.
+        """
+
+        start_line, end_line = chunk_line_span(chunk)
+        chunk_type = chunk.get("type", "unknown")
+        return {
+            "path": relative_path,
+            "type": chunk_type,
+            "name": chunk.get("header") if chunk_type == "markdown" else chunk.get("name"),
+            "start_line": start_line,
+            "end_line": end_line,
+            "text": self.format_chunk(chunk),
+            "words": chunk_word_count(chunk),
+            "tokens": chunk_token_count(chunk),
+        }
+
     def get_file_type_subdir(self, file_path: Path) -> str:
         """
         Determine the subdirectory for a file based on its type.
@@ -802,3 +2867,35 @@ class RepoContentProcessor:
         """
 
         return FILE_TYPE_MAP.get(file_path.suffix, "other")
+
+def iter_repo_chunks(repo_path: Path, output_dir: Path = None, **options):
+    """
+    Lazily yield a record for every chunk of a repository, for in-process consumers.
+
+    Parameters
+    ----------
+    repo_path : pathlib.Path or str
+        The path to the repository.
+    output_dir : pathlib.Path or str, optional
+        An output directory whose chunk cache is used to skip parsing unchanged files. No output files
+        are written to it. If omitted, nothing is read from or written to disk besides the repository.
+    **options
+        Further arguments of `RepoContentProcessor`, such as `skip_patterns`, `max_file_size` or `workers`.
+
+    Yields
+    ------
+    dict
+        One record per chunk, with the keys 'path', 'type', 'name', 'start_line', 'end_line', 'text' and
+        'words' (see `RepoContentProcessor.iter_chunks`).
+
+    Examples
+    --------
+    Feed chunks to an embedding pipeline as the repository is walked:
+        >>> for record in iter_repo_chunks("path/to/repo", skip_patterns=[".git", "*.lock"]):
+        ...     batch.append(record["text"])
+    """
+
+    processor = RepoContentProcessor(
+        Path(repo_path), Path(output_dir) if output_dir is not None else None, **options
+    )
+    yield from processor.iter_chunks()
@@ -0,0 +1,265 @@
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# inotify event flags, see inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR
+EVENT_HEADER = struct.Struct("iIII")
+
+class InotifyWatcher:
+    """
+    Report changed paths of a repository using Linux inotify, without polling.
+
+    Every directory that `RepoContentProcessor.walk_repo` would enter is watched. New directories are watched
+    as they appear and reported as a whole, so files written before their watch was added are not missed.
+
+    Parameters
+    ----------
+    processor : RepoContentProcessor
+        The processor whose repository is watched. Its `should_skip` decides which directories are watched.
+
+    Raises
+    ------
+    OSError
+        If inotify is not available, e.g. on another operating system or when the watch limit is reached.
+    """
+
+    def __init__(self, processor):
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+        self.processor = processor
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.watches = {}
+        self.add_tree(processor.repo_path)
+
+    def add_watch(self, dir_path: Path):
+        """
+        Watch a single directory.
+        """
+
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dir_path), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error == errno.ENOSPC:
+                raise OSError(error, "inotify watch limit reached, raise fs.inotify.max_user_watches or use polling")
+            logger.warning(f"Cannot watch {dir_path}: {os.strerror(error)}")
+            return
+        self.watches[wd] = dir_path
+
+    def add_tree(self, root: Path):
+        """
+        Watch a directory and all the subdirectories the processor does not skip.
+        """
+
+        stack = [root]
+        while stack:
+            dir_path = stack.pop()
+            self.add_watch(dir_path)
+            try:
+                with os.scandir(dir_path) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+            for entry in entries:
+                path = Path(entry.path)
+                if entry.is_dir(follow_symlinks=False) and not self.is_ignored(path):
+                    stack.append(path)
+
+    def is_ignored(self, path: Path) -> bool:
+        """
+        Whether events for a path are irrelevant: it is in the output directory or skipped by the processor.
+        """
+
+        output_dir = self.processor.output_dir
+        if path == output_dir or output_dir in path.parents:
+            return True
+        return self.processor.is_excluded(path, record=False)
+
+    def changes(self, timeout: float) -> set:
+        """
+        Wait up to `timeout` seconds for events and return the paths that changed.
+
+        Returns
+        -------
+        set of pathlib.Path
+            Changed files and directories. After a queue overflow, the repository root is returned so the
+            whole repository is checked.
+        """
+
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    logger.warning("inotify queue overflowed, rescanning the repository")
+                    changed.add(self.processor.repo_path)
+                    continue
+                if mask & IN_IGNORED:
+                    self.watches.pop(wd, None)
+                    continue
+                dir_path = self.watches.get(wd)
+                if dir_path is None or not name:
+                    continue
+                path = dir_path / os.fsdecode(name)
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and not self.is_ignored(path):
+                    self.add_tree(path)
+                changed.add(path)
+        return changed
+
+    def close(self):
+        """
+        Release the inotify file descriptor.
+        """
+
+        os.close(self.fd)
+
+class PollingWatcher:
+    """
+    Report changed paths of a repository by comparing stat signatures between walks.
+
+    Parameters
+    ----------
+    processor : RepoContentProcessor
+        The processor whose repository is watched. The walk uses its `walk_repo`, so skipped directories are
+        never entered and only one `scandir` and `stat` per directory and file is needed per poll.
+    interval : float
+        The minimum time between two walks in seconds.
+    """
+
+    def __init__(self, processor, interval: float = 0.5):
+        self.processor = processor
+        self.interval = interval
+        self.snapshot = self.scan()
+        self.scanned_at = time.monotonic()
+
+    def scan(self) -> dict:
+        """
+        Walk the repository and return the stat signature of every file, keyed by path.
+        """
+
+        output_dir = self.processor.output_dir
+        snapshot = {}
+        for file_path, entry in self.processor.walk_repo(record=False):
+            if output_dir in file_path.parents:
+                continue
+            try:
+                stat_result = entry.stat()
+            except OSError:
+                continue
+            snapshot[file_path] = (stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino)
+        return snapshot
+
+    def changes(self, timeout: float) -> set:
+        """
+        Wait until the next walk is due, at most `timeout` seconds, and return the paths that changed since the last walk.
+        """
+
+        delay = self.scanned_at + self.interval - time.monotonic()
+        if delay > timeout:
+            time.sleep(timeout)
+            return set()
+        if delay > 0:
+            time.sleep(delay)
+        snapshot = self.scan()
+        self.scanned_at = time.monotonic()
+        changed = {path for path, signature in snapshot.items() if self.snapshot.get(path) != signature}
+        changed.update(path for path in self.snapshot if path not in snapshot)
+        self.snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+def watch_repo(processor, debounce: float = 0.2, poll_interval: float = 0.5, polling: bool = False, should_stop=None):
+    """
+    Process a repository, then keep its output up to date as files change.
+
+    Parameters
+    ----------
+    processor : RepoContentProcessor
+        The processor to keep alive. It must use `stable_output`, so that only the output files containing
+        changed source files are rewritten.
+    debounce : float, optional
+        Changes are applied once no new change arrived for this many seconds, so bursts such as a git
+        checkout are handled in a single update.
+    poll_interval : float, optional
+        The time between two walks of the repository when polling.
+    polling : bool, optional
+        If true, always poll instead of using inotify.
+    should_stop : callable, optional
+        Called between waits; watching stops when it returns true. By default, watching runs until interrupted.
+
+    Notes
+    -----
+    inotify is used on Linux, with a fallback to polling when it is not available. Each update re-chunks
+    only the affected files with `RepoContentProcessor.update_files`, which rewrites their output files,
+    `hashes.json` and `metadata.json` in place.
+    """
+
+    if not processor.stable_output:
+        raise ValueError("Watch mode requires stable_output")
+
+    watcher = None
+    if not polling:
+        try:
+            watcher = InotifyWatcher(processor)
+            logger.info(f"Watching {processor.repo_path} with inotify")
+        except (OSError, AttributeError) as e:
+            logger.info(f"inotify is not available ({e}), falling back to polling")
+    if watcher is None:
+        watcher = PollingWatcher(processor, poll_interval)
+        logger.info(f"Watching {processor.repo_path} by polling every {poll_interval}s")
+
+    try:
+        processor.process_repo()
+        pending = set()
+        last_change = 0.0
+        while should_stop is None or not should_stop():
+            changed = watcher.changes(debounce if pending else max(poll_interval, 1.0))
+            if changed:
+                pending.update(changed)
+                last_change = time.monotonic()
+                continue
+            if pending and time.monotonic() - last_change >= debounce:
+                batch, pending = pending, set()
+                started = time.perf_counter()
+                processor.update_files(batch)
+                logger.info(f"Updated output for {len(batch)} changed paths in {time.perf_counter() - started:.3f}s")
+    finally:
+        watcher.close()
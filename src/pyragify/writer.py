@@ -0,0 +1,329 @@
+import logging
+import os
+import queue
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+class BackgroundWriter:
+    """
+    Run output writes on a separate thread, in the order they were submitted.
+
+    Parameters
+    ----------
+    queue_size : int, optional
+        The maximum number of writes waiting for the thread. `submit` blocks while the queue is full, so a slow
+        disk holds back the producer instead of letting pending output pile up in memory. 0 runs every write
+        immediately on the calling thread.
+    fsync : bool, optional
+        If true, `flush` fsyncs every file written since the previous flush, and their directories, so the
+        output survives a crash once the run is complete.
+
+    Attributes
+    ----------
+    errors : int
+        The number of writes that failed. Failures are logged when they happen and do not stop later writes.
+
+    Methods
+    -------
+    submit(function, *args, output_path=None)
+        Queue a call that writes output.
+    flush()
+        Wait for all queued writes, then fsync the files written so far if `fsync` is set.
+    close()
+        Flush, then stop the thread.
+
+    Notes
+    -----
+    The thread is started on the first `submit` and stopped by `close`, so no thread is left running between
+    runs, e.g. when a process pool is forked. Writes are I/O bound and release the GIL while they wait on the
+    disk, so formatting and chunking carry on meanwhile.
+    """
+
+    def __init__(self, queue_size: int = 64, fsync: bool = False):
+        self.queue_size = queue_size or 0
+        self.fsync = fsync
+        self.queue = queue.Queue(self.queue_size) if self.queue_size else None
+        self.thread = None
+        self.written = []
+        self.errors = 0
+
+    def submit(self, function, *args, output_path: Path = None):
+        """
+        Queue a call that writes output, blocking while the queue is full.
+
+        Parameters
+        ----------
+        function : callable
+            Called with `args` on the writer thread. Exceptions it raises are logged.
+        *args
+            The arguments of the call. They must not be modified until the call has run.
+        output_path : pathlib.Path, optional
+            The file the call writes, fsynced by the next `flush` if `fsync` is set.
+        """
+
+        if self.queue is None:
+            self.run_task(function, args, output_path)
+            return
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="pyragify-writer", daemon=True)
+            self.thread.start()
+        self.queue.put((function, args, output_path))
+
+    def run(self):
+        """
+        Run queued writes until `close` queues None.
+        """
+
+        while True:
+            task = self.queue.get()
+            try:
+                if task is None:
+                    return
+                self.run_task(*task)
+            finally:
+                self.queue.task_done()
+
+    def run_task(self, function, args: tuple, output_path: Path = None):
+        """
+        Run one write, logging its failure.
+        """
+
+        try:
+            function(*args)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Error writing {output_path or 'output'}: {e}")
+        else:
+            if self.fsync and output_path is not None:
+                self.written.append(output_path)
+
+    def sync_written(self):
+        """
+        Fsync the files written since the last call, then their directories so that renames are durable too.
+        """
+
+        directories = set()
+        for file_path in self.written:
+            try:
+                with open(file_path, "rb") as f:
+                    os.fsync(f.fileno())
+            except OSError as e:
+                logger.warning(f"Error syncing {file_path}: {e}")
+            directories.add(file_path.parent)
+        self.written = []
+        for directory in directories:
+            try:
+                fd = os.open(directory, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            except OSError:
+                pass  # Not all platforms and file systems can sync a directory
+
+    def flush(self):
+        """
+        Wait until all queued writes have run, then fsync the files they wrote if `fsync` is set.
+        """
+
+        if self.fsync:
+            self.submit(self.sync_written)
+        if self.thread is not None:
+            self.queue.join()
+
+    def close(self):
+        """
+        Flush the queue and stop the writer thread. A later `submit` starts a new one.
+        """
+
+        self.flush()
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+        if self.errors:
+            logger.warning(f"{self.errors} output writes failed")
+            self.errors = 0
+
+class ChunkWriter:
+    """
+    Stream formatted chunks into an output file without keeping its content in memory.
+
+    Text is collected into batches of `buffer_size` characters, which are appended to a pending file in the
+    output directory by `background`. When the output file is complete, `commit` moves the pending file to
+    its final name, so the destination can be chosen after the content was written.
+
+    Attributes
+    ----------
+    output_dir : pathlib.Path
+        The output directory. The pending file is kept there so that `commit` is a rename on the same file system.
+    buffer_size : int
+        The size in characters of the batches handed to `background`.
+    background : BackgroundWriter
+        Runs the file operations, on its own thread unless its queue size is 0.
+    pending_path : pathlib.Path
+        The path of the pending file.
+    size : int
+        The number of characters written since the last `commit` or `discard`. Line endings are written as is, on
+        every platform, so for ASCII text such as JSONL records this is also the size in bytes.
+
+    Methods
+    -------
+    write(text)
+        Append text to the pending file.
+    commit(file_path)
+        Close the pending file and move it to its final path.
+    discard()
+        Close and delete the pending file.
+    exists(file_path)
+        Whether an output file exists.
+    remove(file_path)
+        Delete an output file.
+
+    Notes
+    -----
+    `write`, `commit` and `discard` only queue work; the pending file is touched by the writer thread alone.
+    A failed write or commit is logged by `background`, and the content of that output file is dropped.
+    """
+
+    def __init__(self, output_dir: Path, buffer_size: int = 64 * 1024, background: BackgroundWriter = None):
+        self.output_dir = output_dir
+        self.buffer_size = buffer_size
+        self.background = background if background is not None else BackgroundWriter(0)
+        self.pending_path = output_dir / ".pending_chunk.txt"
+        self.file = None
+        self.failed = False
+        self.size = 0
+        self.batch = []
+        self.batch_size = 0
+
+    @property
+    def has_content(self) -> bool:
+        """
+        Whether any text was written since the last `commit` or `discard`.
+        """
+
+        return self.size > 0
+
+    def exists(self, file_path: Path) -> bool:
+        """
+        Whether the output file `file_path` exists.
+        """
+
+        return file_path.exists()
+
+    def write(self, text: str):
+        """
+        Append text to the pending file, handing it to `background` once a batch is full.
+        """
+
+        self.batch.append(text)
+        self.batch_size += len(text)
+        self.size += len(text)
+        if self.batch_size >= self.buffer_size:
+            self.submit_batch()
+
+    def submit_batch(self):
+        """
+        Hand the text collected so far to `background`.
+        """
+
+        if self.batch:
+            self.background.submit(self.write_batch, "".join(self.batch))
+            self.batch = []
+            self.batch_size = 0
+
+    def write_batch(self, text: str):
+        """
+        Append a batch to the pending file, opening it on first use. Runs on the writer thread.
+        """
+
+        if self.failed:
+            return
+        try:
+            if self.file is None:
+                self.output_dir.mkdir(parents=True, exist_ok=True)
+                self.file = open(self.pending_path, "w", encoding="utf-8", newline="")
+            self.file.write(text)
+        except OSError:
+            self.failed = True
+            raise
+
+    def commit(self, file_path: Path, sources: list = None):
+        """
+        Close the pending file and move it to `file_path`, replacing any existing file.
+
+        `sources`, the source files whose chunks the output file holds, are only recorded by `pyragify.pack.PackWriter`.
+        """
+
+        if not self.has_content:
+            return
+        self.submit_batch()
+        self.size = 0
+        self.background.submit(self.commit_file, file_path, output_path=file_path)
+
+    def commit_file(self, file_path: Path):
+        """
+        Close the pending file and move it to `file_path`. Runs on the writer thread.
+
+        Raises
+        ------
+        OSError
+            If the pending file cannot be written, flushed or moved. It is discarded.
+        """
+
+        try:
+            if self.failed:
+                raise OSError(f"writing {self.pending_path} failed")
+            self.file.close()
+            self.file = None
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(self.pending_path, file_path)
+        except OSError:
+            self.discard_file()
+            raise
+
+    def discard(self):
+        """
+        Close and delete the pending file, dropping anything written since the last `commit`.
+        """
+
+        self.batch = []
+        self.batch_size = 0
+        self.size = 0
+        self.background.submit(self.discard_file)
+
+    def discard_file(self):
+        """
+        Close and delete the pending file. Runs on the writer thread.
+        """
+
+        self.failed = False
+        if self.file is not None:
+            try:
+                self.file.close()
+            except OSError:
+                pass
+            self.file = None
+        try:
+            os.remove(self.pending_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Error removing pending output file {self.pending_path}: {e}")
+
+    def remove(self, file_path: Path):
+        """
+        Delete the output file `file_path`, if it exists, after the writes queued before.
+        """
+
+        self.background.submit(file_path.unlink, True)
+
+    def close(self):
+        """
+        Delete the pending file at the end of a run.
+        """
+
+        self.discard()
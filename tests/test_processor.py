@@ -0,0 +1,63 @@
+import json
+
+from pyragify.cache import ChunkCache, load_entry
+from pyragify.chunk import Chunk
+from pyragify.processor import SNIFF_SIZE, FileProcessor, RepoContentProcessor, analyze_file
+
+
+def test_invalid_utf8_after_sniff_uses_fallback_encoding(tmp_path):
+    file_path = tmp_path / "notes.txt"
+    file_path.write_bytes(b"a" * (SNIFF_SIZE + 808) + "café\n".encode("latin-1"))
+
+    result = analyze_file(FileProcessor(tmp_path, tmp_path, fallback_encoding="latin-1"), file_path)
+
+    assert "error" not in result and "rejected" not in result
+    assert result["encoding"] == "latin-1"
+    assert result["chunks"][0]["content"].endswith("café\n")
+
+
+def test_invalid_utf8_after_sniff_is_rejected_without_fallback(tmp_path):
+    file_path = tmp_path / "notes.txt"
+    file_path.write_bytes(b"a" * (SNIFF_SIZE + 808) + "café\n".encode("latin-1"))
+
+    result = analyze_file(FileProcessor(tmp_path, tmp_path), file_path)
+
+    assert result["rejected"] == "Not UTF-8 text"
+    assert not result["chunks"]
+
+
+def test_invalid_utf8_after_sniff_is_in_output(tmp_path):
+    repo_path, output_dir = tmp_path / "repo", tmp_path / "output"
+    repo_path.mkdir()
+    (repo_path / "notes.txt").write_bytes(b"a" * (SNIFF_SIZE + 808) + "café\n".encode("latin-1"))
+
+    processor = RepoContentProcessor(repo_path, output_dir, fallback_encoding="latin-1")
+    processor.process_repo()
+
+    assert [entry["path"] for entry in processor.metadata["processed_files"]] == ["notes.txt"]
+    assert processor.metadata["processed_files"][0]["encoding"] == "latin-1"
+    assert "café" in "".join(path.read_text(encoding="utf-8") for path in output_dir.rglob("chunk_*.txt"))
+
+
+def test_chunker_output_is_plain_dicts(tmp_path):
+    file_path = tmp_path / "module.py"
+    file_path.write_text("def greet(name):\n    # Say hello\n    return f'hello {name}'\n", encoding="utf-8")
+
+    chunks = FileProcessor(tmp_path, tmp_path).chunk_file(file_path)
+
+    assert chunks and all(isinstance(chunk, dict) for chunk in chunks)
+    assert json.loads(json.dumps(chunks)) == chunks
+    chunks[0]["code"] = "def greet(name): ..."
+    chunks[0].setdefault("language", "python")
+    assert chunks[0].copy() == {**chunks[0]}
+
+
+def test_chunk_cache_keeps_counts(tmp_path):
+    chunk = Chunk(type="function", name="f", code="def f():\n    return 1")
+    cache = ChunkCache(tmp_path, 1024 * 1024)
+
+    cache.put("key", {"chunks": [chunk], "size": 20, "lines": 2, "encoding": "utf-8"})
+
+    stored = json.loads(next(path for path in tmp_path.rglob("*") if path.is_file() and path.name != "index.json").read_text())
+    assert stored["chunks"][0]["word_count"] == chunk.word_count
+    assert load_entry(tmp_path, "key")["chunks"] == [chunk]